@@ -0,0 +1,2 @@
+# coding=utf-8
+"""Benchmarks for skrevo. Run a module with ``python -m benchmarks.<name>``."""
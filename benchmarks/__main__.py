@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Run the skrevo benchmark suite.
+
+    python -m benchmarks [--sizes 10KB,1MB,10MB] [--layouts short,long]
+                         [--only editor,render] [--json results.json]
+
+The JSON output holds the skrevo and Python versions and one entry per
+measurement, so runs of different versions can be compared.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import skrevo as SKR
+from benchmarks import corpus, editor, render
+from benchmarks.measure import describe
+
+SUITES = {'editor': editor, 'render': render}
+DEFAULT_SIZES = '10KB,1MB,10MB'
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    for suffix, factor in (('MB', corpus.MB), ('KB', corpus.KB)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the skrevo benchmark suite.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help="document sizes, up to 100MB (default: %(default)s)")
+    parser.add_argument('--layouts', default=','.join(corpus.LAYOUTS))
+    parser.add_argument('--only', default=','.join(SUITES))
+    parser.add_argument('--json', metavar='FILE', help="write the results to FILE")
+    options = parser.parse_args()
+
+    results = []
+    for name in options.only.split(','):
+        for size in [parse_size(size) for size in options.sizes.split(',')]:
+            for layout in options.layouts.split(','):
+                for result in SUITES[name].run(size, layout):
+                    result['suite'] = name
+                    print(describe(result))
+                    sys.stdout.flush()
+                    results.append(result)
+
+    if options.json:
+        with open(options.json, 'w') as json_file:
+            json.dump({
+                'skrevo': SKR.version,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
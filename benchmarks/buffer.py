@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Per-edit cost of the Skrevo text buffer for documents from 10 KB to 50 MB.
+
+    python -m benchmarks.buffer
+"""
+import random
+import time
+
+from skrevo.skrevo import Skrevo
+
+SIZES = [10 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+EDITS = 20000
+
+LINE = "the quick brown fox jumps over the lazy dog while writing every day\n"
+
+
+def make_document(size):
+    return (LINE * (size // len(LINE) + 1))[:size]
+
+
+def bench_edits(skrevo, edits):
+    rng = random.Random(42)
+    cursor = len(skrevo) // 2
+    started = time.perf_counter()
+    for i in range(edits):
+        if i % 200 == 0:
+            # jump somewhere else now and then, like moving the cursor
+            cursor = rng.randrange(len(skrevo))
+        if i % 10 == 9:
+            skrevo.delete(cursor - 1, 1)
+            cursor -= 1
+        else:
+            skrevo.insert(cursor, 'a')
+            cursor += 1
+    return (time.perf_counter() - started) / edits
+
+
+def bench_slices(skrevo, count, width=80 * 50):
+    rng = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(count):
+        start = rng.randrange(len(skrevo))
+        skrevo.slice(start, start + width)
+    return (time.perf_counter() - started) / count
+
+
+def bench_lines(skrevo, count):
+    # offset -> line and line -> offset, as moving the cursor does
+    buffer = skrevo.buffer
+    rng = random.Random(3)
+    lines = buffer.newlines()
+    started = time.perf_counter()
+    for _ in range(count):
+        buffer.line_of(rng.randrange(len(buffer)))
+        buffer.line_start(rng.randrange(lines))
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    print("{0:>10} {1:>14} {2:>14} {3:>14}".format("size", "edit (us)", "slice (us)", "line (us)"))
+    for size in SIZES:
+        skrevo = Skrevo(make_document(size), None)
+        edit = bench_edits(skrevo, EDITS)
+        view = bench_slices(skrevo, 2000)
+        line = bench_lines(skrevo, 20000)
+        print("{0:>10} {1:>14.2f} {2:>14.2f} {3:>14.2f}".format(size, edit * 1e6, view * 1e6, line * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Startup cost of the configuration, with a cold and a warm snapshot.
+
+Cold: there is no snapshot, the config file is parsed (importing
+configparser) and the snapshot written.  Warm: the snapshot is up to date
+and loaded with one read.  Measured in a fresh interpreter, from start to
+the key bindings being ready, and in process.
+
+    python -m benchmarks.config [--runs 20] [--user-keys 20]
+
+(at most one user key per action)
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.measure import describe, latency
+from skrevo.config import load_config
+from skrevo.keys import KeyBindings
+
+SETTINGS = """[settings]
+content-file = ~/skrevo.txt
+auto-save = true
+journal = true
+persist-undo = true
+undo-memory-mb = 32
+frame-budget-ms = 16
+spell-check = true
+"""
+
+SCRIPT = """import sys
+import time
+started = time.perf_counter()
+from skrevo.config import load_config
+load_config(sys.argv[1], sys.argv[2])
+print(time.perf_counter() - started)"""
+
+
+def write_config(path, user_keys):
+    actions = sorted(KeyBindings({}).key_bindings)
+    with open(path, 'w') as config_file:
+        config_file.write(SETTINGS + '\n[keys]\n')
+        for i, action in enumerate(actions[:user_keys]):
+            config_file.write("{0} = meta {1}, f{2}\n".format(action, chr(97 + i % 26), i % 12 + 1))
+
+
+def process_start(config_path, cache_path):
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT, config_path, cache_path],
+        stdout=subprocess.PIPE, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return float(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--user-keys', type=int, default=20)
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        config_path = os.path.join(directory, 'skrevorc')
+        cache_path = os.path.join(directory, 'config.cache')
+        write_config(config_path, options.user_keys)
+
+        cold, warm = [], []
+        for _ in range(options.runs):
+            if os.path.exists(cache_path):
+                os.unlink(cache_path)
+            cold.append(process_start(config_path, cache_path))
+            warm.append(process_start(config_path, cache_path))
+        print(describe(latency('process start, cold', cold)))
+        print(describe(latency('process start, warm', warm)))
+
+        cold, warm = [], []
+        for _ in range(options.runs * 10):
+            os.unlink(cache_path)
+            started = time.perf_counter()
+            load_config(config_path, cache_path)
+            cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            load_config(config_path, cache_path)
+            warm.append(time.perf_counter() - started)
+        print(describe(latency('in process, cold', cold)))
+        print(describe(latency('in process, warm', warm)))
+
+        # touched: the size or mtime differ but the content doesn't
+        touched = []
+        for _ in range(options.runs * 10):
+            os.utime(config_path, ns=(time.time_ns(), time.time_ns()))
+            started = time.perf_counter()
+            load_config(config_path, cache_path)
+            touched.append(time.perf_counter() - started)
+        print(describe(latency('in process, touched', touched)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Synthetic documents for the benchmarks.
+
+Prose-like text built from a fixed vocabulary (with some non-ASCII words),
+in two layouts: 'short' lines wrapped at about 72 columns, as written in
+a plain editor, and 'long' lines holding a whole paragraph each, as written
+with word wrap on.  Generation is seeded, so a given size and layout is
+always the same document.
+"""
+import os
+import random
+import tempfile
+
+WORDS = (
+    "the a of and to in is it that was for on are with as his they be at one "
+    "have this from or had by word but what some we can out other were all "
+    "there when up use your how said an each she which do their time if will "
+    "way about many then them write would like so these her long make thing "
+    "see him two has look more day could go come did number sound no most "
+    "people my over know water than call first who may down side been now "
+    "find breath quiet morning practice attention notice return page silence"
+).split()
+
+NON_ASCII = (
+    "café naïve über façade déjà año coração ação skrevo pensão "
+    "Übung straße žluť čaj łódź søster ζωή мир дыхание 書く 静か 空気 ✓ —"
+).split()
+
+UNIQUE_BLOCKS = 16
+BLOCK_SIZE = 64 * 1024
+
+KB = 1024
+MB = 1024 * KB
+SIZES = [10 * KB, 1 * MB, 10 * MB, 100 * MB]
+LAYOUTS = ['short', 'long']
+
+
+def _sentence(rng):
+    words = [rng.choice(NON_ASCII) if rng.random() < 0.03 else rng.choice(WORDS)
+             for _ in range(rng.randint(4, 24))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice('...?!')
+
+
+def _paragraph(rng, layout):
+    text = " ".join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+    if layout == 'long':
+        return text + "\n\n"
+    lines, line = [], []
+    width = 0
+    for word in text.split(' '):
+        if width + len(word) > 72 and line:
+            lines.append(" ".join(line))
+            line, width = [], 0
+        line.append(word)
+        width += len(word) + 1
+    lines.append(" ".join(line))
+    return "\n".join(lines) + "\n\n"
+
+
+def _block(seed, layout):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < BLOCK_SIZE:
+        paragraph = _paragraph(rng, layout)
+        parts.append(paragraph)
+        size += len(paragraph)
+    return "".join(parts)
+
+
+def generate(size, layout='short'):
+    # A document of `size` characters: up to UNIQUE_BLOCKS distinct blocks,
+    # cycled for larger sizes.
+    blocks = [_block(seed, layout) for seed in range(min(UNIQUE_BLOCKS, size // BLOCK_SIZE + 1))]
+    parts, total, index = [], 0, 0
+    while total < size:
+        block = blocks[index % len(blocks)]
+        parts.append(block)
+        total += len(block)
+        index += 1
+    text = "".join(parts)[:size]
+    return text[:text.rfind('\n') + 1] if '\n' in text else text
+
+
+def write(text, directory=None):
+    fd, path = tempfile.mkstemp(prefix='skrevo-bench-', suffix='.txt', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as corpus_file:
+        corpus_file.write(text)
+    return path
+
+
+def label(size):
+    if size >= MB:
+        return "{0}MB".format(size // MB)
+    return "{0}KB".format(size // KB)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Benchmarks of the Skrevo document operations.
+
+load (eager and lazy), reload_from_file, save, update, single-character
+insert/delete at random positions, and the header counters.
+"""
+import os
+import random
+import time
+
+from benchmarks import corpus
+from benchmarks.measure import latency, throughput, timed
+from skrevo.skrevo import Skrevo
+
+EDITS = 2000
+RUNS = 3
+
+
+def run(size, layout, directory=None):
+    text = corpus.generate(size, layout)
+    path = corpus.write(text, directory)
+    details = {'size': size, 'size_label': corpus.label(size), 'layout': layout}
+    results = []
+    try:
+        for lazy in (False, True):
+            seconds = []
+            for _ in range(RUNS):
+                skrevo = Skrevo('', path)
+                seconds.append(timed(skrevo.load, lazy))
+            results.append(throughput('load' + (' (lazy)' if lazy else ''), seconds, size, **details))
+
+        skrevo = Skrevo('', path)
+        skrevo.load()
+        results.append(throughput('reload_from_file',
+                                  [timed(skrevo.reload_from_file) for _ in range(RUNS)], size, **details))
+        results.append(throughput('update', [timed(skrevo.update, text) for _ in range(RUNS)], size, **details))
+        results.append(throughput('save', [timed(skrevo.save) for _ in range(RUNS)], size, **details))
+
+        rng = random.Random(size)
+        inserts, deletes, counters = [], [], []
+        for _ in range(EDITS):
+            offset = rng.randrange(len(skrevo))
+            started = time.perf_counter()
+            skrevo.insert(offset, 'x')
+            inserts.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            skrevo.delete(offset, 1)
+            deletes.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            skrevo.word_count(), len(skrevo), skrevo.line_count()
+            counters.append(time.perf_counter() - started)
+        results.append(latency('insert', inserts, **details))
+        results.append(latency('delete', deletes, **details))
+        results.append(latency('counters', counters, **details))
+    finally:
+        os.unlink(path)
+    return results
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Per-key dispatch overhead of UrwidUI.keystroke.
+
+Measures keys that are not bound to anything (every typed character) and
+bound keys, with the default bindings and with a set of user bindings.
+
+    python -m benchmarks.keys
+"""
+import string
+import timeit
+
+from skrevo.keys import KeyBindings
+from skrevo.skrevo import Skrevo
+from skrevo.urwid_ui import UrwidUI
+
+USER_KEYS = {
+    'quit': 'ctrl x, meta q',
+    'toggle-help': 'f1',
+    'toggle-toolbar': 'f2, ctrl t',
+    'toggle-wrapping': 'f3',
+    'edit-save': 'ctrl s, f5',
+    'edit-home': 'ctrl a, home, meta a',
+    'edit-end': 'ctrl e, end, meta e',
+}
+
+NUMBER = 200000
+
+
+def bench(ui, keys):
+    # handlers are replaced by no-ops: this measures dispatch only
+    ui.handlers = dict.fromkeys(ui.handlers, lambda: None)
+    keystroke = ui.keystroke
+    per_key = timeit.timeit(lambda: [keystroke(key) for key in keys], number=NUMBER // len(keys))
+    return per_key / (NUMBER // len(keys)) / len(keys)
+
+
+def main():
+    typed = list(string.ascii_letters + string.digits + ' .,;')
+    for name, user_keys in [('default', {}), ('user', USER_KEYS)]:
+        key_bindings = KeyBindings(user_keys)
+        bound = list(key_bindings.key_index)
+        ui = UrwidUI(Skrevo('', None), key_bindings)
+        print("{0:>8} bindings: unbound key {1:6.3f}us  bound key {2:6.3f}us".format(
+            name, bench(ui, typed) * 1e6, bench(ui, bound) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
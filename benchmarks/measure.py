@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Timing helpers shared by the benchmarks."""
+import time
+
+MB = 1024 * 1024
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency(name, samples, **details):
+    # samples in seconds; reported in microseconds
+    result = {
+        'name': name,
+        'unit': 'us',
+        'count': len(samples),
+        'mean': sum(samples) / len(samples) * 1e6,
+        'p50': percentile(samples, 0.50) * 1e6,
+        'p95': percentile(samples, 0.95) * 1e6,
+        'p99': percentile(samples, 0.99) * 1e6,
+        'max': max(samples) * 1e6,
+    }
+    result.update(details)
+    return result
+
+
+def throughput(name, seconds, size_bytes, **details):
+    # best of the runs, in MB/s
+    best = min(seconds)
+    result = {
+        'name': name,
+        'unit': 'MB/s',
+        'runs': len(seconds),
+        'seconds': best,
+        'throughput': size_bytes / MB / best if best else float('inf'),
+    }
+    result.update(details)
+    return result
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def describe(result):
+    if result['unit'] == 'MB/s':
+        return "{0:<28} {1:>8} {2:>6} {3:10.1f} MB/s ({4:.3f}s)".format(
+            result['name'], result.get('size_label', ''), result.get('layout', ''),
+            result['throughput'], result['seconds'])
+    return "{0:<28} {1:>8} {2:>6} p50 {3:9.1f}us  p95 {4:9.1f}us  p99 {5:9.1f}us".format(
+        result['name'], result.get('size_label', ''), result.get('layout', ''),
+        result['p50'], result['p95'], result['p99'])
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Benchmarks of UrwidUI rendering and key handling on a fake screen.
+
+Frames are drawn by the urwid main loop into skrevo.headless.FakeScreen, so
+the whole widget tree is rendered as it would be for a terminal.  With word
+wrap, redrawing rebuilt line widgets and scrolling back over lines already
+seen are measured with and without the layout cache (skrevo.layout), and
+pasting with and without bracketed paste.
+"""
+import os
+import time
+
+from benchmarks import corpus
+from benchmarks.measure import latency
+from skrevo.headless import FakeScreen
+from skrevo.keys import KeyBindings
+from skrevo.skrevo import Skrevo
+from skrevo.urwid_ui import UrwidUI
+
+FRAMES = 200
+TYPED = "the quiet morning page "
+PASTED = ("pasted words from somewhere else " * 3 + "\n") * 40
+PASTES = 10
+
+
+def start_ui(path, wrap, layout_cache=True):
+    skrevo = Skrevo('', path)
+    skrevo.load()
+    ui = UrwidUI(skrevo, KeyBindings({}))
+    if not layout_cache:
+        ui.layout = None
+    ui.setup(enable_word_wrap=wrap, show_toolbar=False, screen=FakeScreen())
+    ui.loop.draw_screen()
+    return ui
+
+
+def draw(ui, keys):
+    started = time.perf_counter()
+    ui.loop.process_input(keys)
+    ui.loop.draw_screen()
+    return time.perf_counter() - started
+
+
+def rebuild(ui):
+    # what enter, joining lines, undo or a reload cost the screen
+    started = time.perf_counter()
+    ui.listbox.body.refresh()
+    ui.loop.draw_screen()
+    return time.perf_counter() - started
+
+
+def run(size, layout, directory=None):
+    path = corpus.write(corpus.generate(size, layout), directory)
+    results = []
+    try:
+        for wrap in (False, True):
+            details = {'size': size, 'size_label': corpus.label(size), 'layout': layout,
+                       'wrap': wrap}
+            suffix = ' (wrap)' if wrap else ''
+            ui = start_ui(path, wrap)
+            scrolling = [draw(ui, ['page down' if i % 20 < 10 else 'down']) for i in range(FRAMES)]
+            results.append(latency('scroll+render' + suffix, scrolling, **details))
+            typing = [draw(ui, [TYPED[i % len(TYPED)]]) for i in range(FRAMES)]
+            results.append(latency('keystroke+render' + suffix, typing, **details))
+            ui.listbox.body.refresh()
+            frames = [draw(ui, []) for i in range(FRAMES)]
+            results.append(latency('redraw' + suffix, frames, **details))
+
+        details = {'size': size, 'size_label': corpus.label(size), 'layout': layout, 'wrap': True}
+        for layout_cache in (True, False):
+            suffix = ' (wrap, {0}layout cache)'.format('' if layout_cache else 'no ')
+            ui = start_ui(path, True, layout_cache)
+            rebuilt = [rebuild(ui) for i in range(FRAMES)]
+            results.append(latency('rebuild+render' + suffix, rebuilt, layout_cache=layout_cache,
+                                   **details))
+            # the walker keeps 256 widgets: go far enough to drop them
+            keys = ['page down'] * 20 + ['page up'] * 20
+            scrolling = [draw(ui, [keys[i % len(keys)]]) for i in range(FRAMES)]
+            results.append(latency('scroll back+render' + suffix, scrolling,
+                                   layout_cache=layout_cache, **details))
+
+        details['wrap'] = False
+        keys = ['enter' if char == '\n' else char for char in PASTED]
+        for bracketed in (True, False):
+            ui = start_ui(path, False)
+            pasted = ['begin paste'] + keys + ['end paste'] if bracketed else keys
+            pastes = [draw(ui, pasted) for i in range(PASTES)]
+            results.append(latency('paste {0}+render ({1}bracketed)'.format(
+                corpus.label(len(PASTED)), '' if bracketed else 'not '), pastes, **details))
+    finally:
+        os.unlink(path)
+    return results
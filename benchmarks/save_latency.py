@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Keystroke latency while the content file is being saved to a slow disk.
+
+A fake filesystem makes every write and fsync sleep, like a busy network home
+directory.  Keystrokes are applied on an asyncio loop, like the editor's, while saves
+are requested every few keys; with saves running as background tasks their latency must not
+depend on how long the disk takes.
+
+    python -m benchmarks.save_latency
+"""
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from skrevo.fileio import LocalFileSystem
+from skrevo.skrevo import Skrevo
+
+KEYSTROKES = 3000
+SAVE_EVERY = 100
+WRITE_DELAY = 0.001
+FSYNC_DELAY = 0.2
+
+
+class SlowFile:
+
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+
+    def write(self, data):
+        time.sleep(WRITE_DELAY)
+        return self.wrapped.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wrapped.close()
+
+
+class SlowFileSystem(LocalFileSystem):
+
+    def __init__(self):
+        self.writes = 0
+
+    def create_temp(self, directory):
+        temp_file, temp_path = LocalFileSystem.create_temp(self, directory)
+        return SlowFile(temp_file), temp_path
+
+    def fsync(self, temp_file):
+        time.sleep(FSYNC_DELAY)
+        LocalFileSystem.fsync(self, temp_file.wrapped)
+
+    def replace(self, source, target):
+        self.writes += 1
+        LocalFileSystem.replace(self, source, target)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, 'skrevo.txt')
+    skrevo = Skrevo("some words to start with\n" * 40000, file_path)
+    fs = SlowFileSystem()
+    skrevo.saver.fs = fs
+
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    skrevo.saver.attach(loop, executor)
+
+    latencies = []
+
+    async def type_keys():
+        for i in range(KEYSTROKES):
+            before = time.perf_counter()
+            # what a keystroke costs the event loop: the edit plus the header data
+            skrevo.insert(len(skrevo) // 2, 'x')
+            skrevo.word_count(), len(skrevo), skrevo.line_count()
+            if i % SAVE_EVERY == 0:
+                skrevo.request_save()
+            latencies.append(time.perf_counter() - before)
+            await asyncio.sleep(0.0005)  # a fast typist
+
+    started = time.perf_counter()
+    loop.run_until_complete(type_keys())
+    typing = time.perf_counter() - started
+    skrevo.request_save()
+    skrevo.saver.detach()
+    executor.shutdown()
+    loop.close()
+
+    print("keystrokes: {0}, save requests: {1}, files written: {2}".format(
+        KEYSTROKES, KEYSTROKES // SAVE_EVERY + 1, fs.writes))
+    print("typing took {0:.2f}s, one slow save takes >= {1:.2f}s".format(typing, FSYNC_DELAY))
+    print("keystroke latency p50 {0:.1f}us  p99 {1:.1f}us  max {2:.1f}us".format(
+        percentile(latencies, 0.5) * 1e6, percentile(latencies, 0.99) * 1e6,
+        max(latencies) * 1e6))
+    with open(file_path) as content:
+        assert content.read().rstrip('\n') == skrevo.content.rstrip('\n')
+
+
+if __name__ == '__main__':
+    main()
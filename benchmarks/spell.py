@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Spell checker: dictionary load time, memory and per-edit check latency.
+
+Uses the given word list, or generates one of --words random words.
+
+    python -m benchmarks.spell [--word-list FILE] [--words 100000]
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.measure import describe, latency
+from skrevo.spell import SpellChecker, compile_dictionary, load_dictionary
+
+LETTERS = 'etaoinshrdlucmfwypvbgkjqxz'
+
+
+def make_word_list(path, count):
+    rng = random.Random(42)
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(LETTERS[:rng.randint(8, 26)]) for _ in range(rng.randint(2, 12))))
+    with open(path, 'w') as words_file:
+        words_file.write('\n'.join(sorted(words)) + '\n')
+    return sorted(words)
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--word-list')
+    parser.add_argument('--words', type=int, default=100000)
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        word_list = options.word_list
+        if word_list is None:
+            word_list = os.path.join(directory, 'words')
+            words = make_word_list(word_list, options.words)
+        else:
+            with open(word_list, encoding='utf-8', errors='replace') as words_file:
+                words = [line.strip() for line in words_file if line.strip()]
+        cache = os.path.join(directory, 'words.dawg')
+
+        started = time.perf_counter()
+        compile_dictionary(word_list, cache)
+        print("compile: {0:.2f} s, {1} words -> {2:.0f} KB".format(
+            time.perf_counter() - started, len(words), os.path.getsize(cache) / 1024))
+
+        rss = max_rss_kb()
+        tracemalloc.start()
+        loads = []
+        for _ in range(20):
+            started = time.perf_counter()
+            dictionary = load_dictionary(word_list, cache)
+            loads.append(time.perf_counter() - started)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(describe(latency('load (cached)', loads)))
+        print("load memory: {0:.1f} KB of Python objects, max RSS +{1} KB (the file is mapped)".format(
+            peak / 1024, max_rss_kb() - rss))
+
+        # typing into a line of about 80 characters, half of it misspelled
+        rng = random.Random(7)
+        line = ' '.join(rng.choice(words) if i % 2 else rng.choice(words) + 'q' for i in range(12))
+        checker = SpellChecker(dictionary)
+        edits = []
+        for i in range(2000):
+            column = rng.randrange(len(line))
+            line = line[:column] + rng.choice(LETTERS) + line[column:]
+            if len(line) > 100:
+                line = line[:80]
+            started = time.perf_counter()
+            checker.marks(line)
+            checker.check_pending()
+            edits.append(time.perf_counter() - started)
+        print(describe(latency('check edited line', edits, length=len(line))))
+
+        # redrawing a screen of lines that were already checked
+        screen = [' '.join(rng.choice(words) for _ in range(12)) for _ in range(50)]
+        for text in screen:
+            checker.marks(text)
+        checker.check_pending()
+        redraws = []
+        for _ in range(2000):
+            started = time.perf_counter()
+            for text in screen:
+                checker.marks(text)
+            redraws.append(time.perf_counter() - started)
+        print(describe(latency('marks for 50 checked lines', redraws)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Import-time budget for the non-interactive commands.
+
+Runs skrevo's non-interactive commands under ``python -X importtime`` and
+reports the cumulative import time of the top-level modules they load.
+Exits with status 1 when a command imports urwid or goes over the budget.
+
+    python -m benchmarks.startup [--budget-ms 50] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+COMMANDS = {
+    '--version': ['--version'],
+    '--show-default-bindings': ['--show-default-bindings', '--config', os.devnull],
+}
+
+FORBIDDEN = ('urwid',)
+
+SCRIPT = "import sys; sys.argv = ['skrevo'] + sys.argv[1:]; import skrevo.cli; skrevo.cli.main()"
+
+
+def import_times(arguments):
+    # -> ({top-level module: cumulative microseconds}, every module imported)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT] + arguments,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    times = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name.startswith('  '):  # two spaces: imported at top level
+            times[name.strip()] = int(cumulative)
+    return times, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    parser.add_argument('--runs', type=int, default=5)
+    options = parser.parse_args()
+
+    failed = False
+    for name, arguments in COMMANDS.items():
+        runs = [import_times(arguments) for _ in range(options.runs)]
+        best, modules = min(runs, key=lambda run: sum(run[0].values()))
+        total = sum(best.values()) / 1000.0
+        slowest = sorted(best.items(), key=lambda item: -item[1])[:5]
+        print("{0:<26} {1:7.1f} ms  (budget {2:.0f} ms)".format(name, total, options.budget_ms))
+        for module, micros in slowest:
+            print("    {0:<30} {1:7.1f} ms".format(module, micros / 1000.0))
+        loaded = sorted({module.split('.')[0] for module in modules} & set(FORBIDDEN))
+        if loaded:
+            print("    FAIL: imports {0}".format(", ".join(loaded)))
+            failed = True
+        if total > options.budget_ms:
+            print("    FAIL: over budget")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
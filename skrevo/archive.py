@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# coding=utf-8
+import codecs
+import hashlib
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: archiving from two editors at once may clash
+    fcntl = None
+
+# Archive of writing sessions.
+#
+# Every session's document is cut into content-defined chunks, and each
+# distinct chunk is stored once, compressed, in an append-only pack file; a
+# session is a manifest listing the sha256 of its chunks.  Days of writing
+# that continue the same text share all but the chunks around the changes, so
+# the archive grows with the new text rather than with the document size.
+#
+# Chunks end at line ends chosen by the content: after at least MIN_CHUNK
+# bytes, a line whose crc32 matches BOUNDARY_MASK ends the chunk.  An edit
+# therefore only changes the chunks around it, wherever it happens.  Lines
+# longer than MAX_CHUNK (a paragraph without line breaks) are cut every
+# MAX_CHUNK bytes from the start of the line.  A session is cut from the
+# document's pieces as they are read (split_pieces), without joining them.
+#
+# Layout of the archive directory:
+#
+#   chunks.pack         records: sha256, compressed length, zlib data
+#   chunks.idx          sha256, offset and length of each record; rebuilt
+#                       from the pack when it falls behind (after a crash)
+#   sessions/NAME.manifest
+#                       header: magic, time (ns), document size, chunk count
+#                       then the sha256 of each chunk
+
+DEFAULT_DIRECTORY = '~/.skrevo/archive'
+
+MIN_CHUNK = 4 * 1024
+MAX_CHUNK = 64 * 1024
+BOUNDARY_MASK = 0x7
+
+RECORD = struct.Struct('<32sI')
+INDEX = struct.Struct('<32sQI')
+MAGIC = b'SKA1'
+MANIFEST = struct.Struct('<4sQQI')
+DIGEST_SIZE = 32
+
+
+def split_chunks(data):
+    # Yields the content-defined chunks of data (bytes).
+    view = memoryview(data)
+    start = 0
+    size = len(data)
+    position = 0
+    while position < size:
+        end = data.find(b'\n', position)
+        end = size if end < 0 else end + 1
+        if end - start > MAX_CHUNK:
+            if position > start:
+                # close the chunk before the long line
+                yield data[start:position]
+                start = position
+            while end - start > MAX_CHUNK:
+                yield data[start:start + MAX_CHUNK]
+                start += MAX_CHUNK
+        elif end - start >= MIN_CHUNK and zlib.crc32(view[position:end]) & BOUNDARY_MASK == 0:
+            yield data[start:end]
+            start = end
+        position = end
+    if start < size:
+        yield data[start:]
+
+
+def split_pieces(pieces):
+    # Yields the chunks split_chunks() cuts from the text given as bytes
+    # pieces, keeping only the chunk being cut: a line is looked at once it
+    # is complete, a long one as soon as it is too long.
+    buffer = bytearray()
+    position = 0        # where the next line starts; the chunk starts at 0
+    long_line = False   # the line at position was cut already
+    pieces = iter(pieces)
+    final = False
+    while not final:
+        piece = next(pieces, None)
+        final = piece is None
+        if not final:
+            buffer += piece
+        while position < len(buffer):
+            end = buffer.find(b'\n', position)
+            if end >= 0:
+                end += 1
+            elif final:
+                end = len(buffer)
+            else:
+                if len(buffer) > MAX_CHUNK:
+                    if position:
+                        yield bytes(buffer[:position])
+                        del buffer[:position]
+                        position = 0
+                    while len(buffer) > MAX_CHUNK:
+                        yield bytes(buffer[:MAX_CHUNK])
+                        del buffer[:MAX_CHUNK]
+                    long_line = True
+                break
+            if long_line or end > MAX_CHUNK:
+                if position:
+                    yield bytes(buffer[:position])
+                    del buffer[:position]
+                    end -= position
+                while end > MAX_CHUNK:
+                    yield bytes(buffer[:MAX_CHUNK])
+                    del buffer[:MAX_CHUNK]
+                    end -= MAX_CHUNK
+                long_line = False
+            elif end >= MIN_CHUNK and zlib.crc32(buffer[position:end]) & BOUNDARY_MASK == 0:
+                yield bytes(buffer[:end])
+                del buffer[:end]
+                end = 0
+            position = end
+    if buffer:
+        yield bytes(buffer)
+
+
+def _encoded(chunks, size=MAX_CHUNK):
+    # the text given as chunks (str) in UTF-8, about size characters at a time
+    batch = []
+    length = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(batch).encode('utf-8')
+            batch = []
+            length = 0
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+class Archive:
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = os.path.expanduser(directory)
+        self.pack_path = os.path.join(self.directory, 'chunks.pack')
+        self.index_path = os.path.join(self.directory, 'chunks.idx')
+        self.sessions_path = os.path.join(self.directory, 'sessions')
+        self.index = None
+        # where the last complete record of the pack ends
+        self.pack_end = 0
+
+    def store(self, chunks, when=None):
+        # Archives the text given as chunks (str) as a new session; returns
+        # its name, or None when it is the same document as the last session.
+        # The text is cut, and its new chunks written, as it is read; the
+        # chunks of a document that didn't change are all in the pack already.
+        digests = []
+        size = 0
+
+        def cut():
+            nonlocal size
+            for chunk in split_pieces(_encoded(chunks)):
+                digest = hashlib.sha256(chunk).digest()
+                digests.append(digest)
+                size += len(chunk)
+                yield digest, chunk
+        os.makedirs(self.sessions_path, exist_ok=True)
+        with open(self.pack_path, 'ab') as pack:
+            if fcntl is not None:
+                fcntl.flock(pack, fcntl.LOCK_EX)
+            self._load_index()
+            self._add_chunks(pack, cut())
+        sessions = self.sessions()
+        if sessions and self._read_manifest(sessions[-1])[1] == digests:
+            return None
+        when = time.time_ns() if when is None else when
+        name = base = datetime.fromtimestamp(when / 1e9).strftime('%Y-%m-%d-%H%M%S')
+        number = 1
+        while name in sessions:
+            number += 1
+            name = '{0}-{1}'.format(base, number)
+        manifest = MANIFEST.pack(MAGIC, when, size, len(digests)) + b''.join(digests)
+        path = os.path.join(self.sessions_path, name + '.manifest')
+        with open(path + '.tmp', 'wb') as manifest_file:
+            manifest_file.write(manifest)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(path + '.tmp', path)
+        return name
+
+    def sessions(self):
+        # names of the archived sessions, oldest first
+        try:
+            names = os.listdir(self.sessions_path)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.manifest')] for name in names if name.endswith('.manifest'))
+
+    def session_info(self, name):
+        # -> (datetime, size in bytes, number of chunks)
+        when, digests, size = self._read_manifest(name)
+        return datetime.fromtimestamp(when / 1e9), size, len(digests)
+
+    def session_chunks(self, name):
+        # -> sha256 of the session's chunks, in order
+        return self._read_manifest(name)[1]
+
+    def read_chunks(self, digests):
+        # Yields (digest, bytes) of the given chunks.
+        if not digests or not os.path.exists(self.pack_path):
+            # nothing archived yet
+            return
+        self._load_index()
+        with open(self.pack_path, 'rb') as pack:
+            for digest in digests:
+                offset, length = self.index[digest]
+                pack.seek(offset)
+                yield digest, zlib.decompress(pack.read(length))
+
+    def restore(self, name):
+        # Yields the text of the session, chunk by chunk.
+        # chunks cut inside a long line may split a character
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        for _, data in self.read_chunks(self.session_chunks(name)):
+            yield decoder.decode(data)
+        yield decoder.decode(b'', final=True)
+
+    def _add_chunks(self, pack, chunks):
+        # Writes the records of the chunks ((digest, bytes), as they come)
+        # that aren't in the pack; the pack is locked and the index up to date.
+        offset = pack.seek(0, 2)
+        if offset > self.pack_end:
+            # drop a record torn by a crash
+            pack.truncate(self.pack_end)
+            offset = self.pack_end
+        entries = []
+        for digest, chunk in chunks:
+            if digest in self.index:
+                continue
+            data = zlib.compress(chunk)
+            pack.write(RECORD.pack(digest, len(data)) + data)
+            entries.append(INDEX.pack(digest, offset + RECORD.size, len(data)))
+            self.index[digest] = (offset + RECORD.size, len(data))
+            offset += RECORD.size + len(data)
+        if not entries:
+            return
+        pack.flush()
+        os.fsync(pack.fileno())
+        with open(self.index_path, 'ab') as index_file:
+            index_file.write(b''.join(entries))
+
+    def _load_index(self):
+        # Reads chunks.idx, then the pack records it doesn't cover yet.
+        index = {}
+        end = 0
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            data = b''
+        for position in range(0, len(data) - INDEX.size + 1, INDEX.size):
+            digest, offset, length = INDEX.unpack_from(data, position)
+            index[digest] = (offset, length)
+            end = max(end, offset + length)
+        self.index = index
+        self.pack_end = end
+        try:
+            pack = open(self.pack_path, 'rb')
+        except FileNotFoundError:
+            return
+        with pack:
+            size = pack.seek(0, 2)
+            position = end
+            while position + RECORD.size <= size:
+                pack.seek(position)
+                digest, length = RECORD.unpack(pack.read(RECORD.size))
+                if position + RECORD.size + length > size:
+                    break  # torn write at the end of the pack
+                index[digest] = (position + RECORD.size, length)
+                position += RECORD.size + length
+        if position > end:
+            with open(self.index_path, 'wb') as index_file:
+                index_file.write(b''.join(
+                    INDEX.pack(digest, offset, length)
+                    for digest, (offset, length) in index.items()))
+        self.pack_end = position
+
+    def _read_manifest(self, name):
+        with open(os.path.join(self.sessions_path, name + '.manifest'), 'rb') as manifest_file:
+            data = manifest_file.read()
+        magic, when, size, count = MANIFEST.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("{0} is not a skrevo session".format(name))
+        start = MANIFEST.size
+        digests = [data[start + i * DIGEST_SIZE:start + (i + 1) * DIGEST_SIZE]
+                   for i in range(count)]
+        return when, digests, size
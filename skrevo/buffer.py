@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# coding=utf-8
+import random
+from array import array
+from bisect import bisect_left
+
+# Text buffer for Skrevo: a piece table whose pieces are kept in a persistent
+# (path-copying) treap ordered by position.  Every node stores the length and
+# the number of newlines of its subtree, so locating an offset or a line,
+# inserting and deleting are O(log n) in the number of pieces.  Nodes are
+# never mutated after creation, which makes a snapshot of the whole document
+# a single reference to the root.
+
+# Inserted text is appended to an "add" block.  Typing at the end of the piece
+# created by the previous insert extends that piece instead of creating a new
+# one; blocks are capped so that appending stays cheap.
+ADD_BLOCK_SIZE = 64 * 1024
+
+# Large original texts are cut into pieces of about this size (at line
+# boundaries when possible) so that the tree is balanced from the start.
+LOAD_PIECE_SIZE = 64 * 1024
+
+# Finding a line inside a piece uses the newline offsets of the piece's
+# source text (see _Lines), indexed in regions of this many characters.
+LINE_REGION = 16 * 1024
+
+
+class _Lines:
+    # Offsets of the newlines of one source text: a loaded str, a block of a
+    # mapped file or the add block.  Sources are never changed once written,
+    # so the offsets stay valid for every piece of them, and finding the n-th
+    # newline of a piece or counting the newlines before an offset is a
+    # bisection instead of a scan of the piece.
+    #
+    # Offsets are kept per region of LINE_REGION characters in array('Q'):
+    # 8 bytes per line plus about 80 bytes per region.  Regions of loaded
+    # text are indexed the first time they are searched, so only the parts
+    # of a document that were visited cost memory; the add block is indexed
+    # as text is appended to it.
+
+    __slots__ = ('text', 'regions')
+
+    def __init__(self, text):
+        self.text = text
+        self.regions = {}
+
+    def _region(self, number):
+        offsets = self.regions.get(number)
+        if offsets is None:
+            start = number * LINE_REGION
+            offsets = _newlines(self.text[start:start + LINE_REGION], start)
+            self.regions[number] = offsets
+        return offsets
+
+    def count(self, start, end):
+        # newlines in text[start:end]
+        count = 0
+        for number in range(start // LINE_REGION, (end - 1) // LINE_REGION + 1):
+            offsets = self._region(number)
+            count += bisect_left(offsets, end) - bisect_left(offsets, start)
+        return count
+
+    def find(self, start, n):
+        # offset of the n-th newline (counting from 1) at or after start
+        number = start // LINE_REGION
+        while True:
+            offsets = self._region(number)
+            first = bisect_left(offsets, start)
+            if n <= len(offsets) - first:
+                return offsets[first + n - 1]
+            n -= len(offsets) - first
+            number += 1
+
+    def extend(self, start, text):
+        # text was appended to the source at start (the add block)
+        for number in range(start // LINE_REGION, (start + len(text) - 1) // LINE_REGION + 1):
+            self.regions.setdefault(number, array('Q'))
+        for offset in _newlines(text, start):
+            self.regions[offset // LINE_REGION].append(offset)
+
+    def truncated(self, end):
+        # A copy without the newlines from end on, for an add block that was
+        # cut back; pieces of the old one keep the old offsets.
+        lines = _Lines(None)
+        for number, offsets in self.regions.items():
+            if number * LINE_REGION < end:
+                lines.regions[number] = offsets[:bisect_left(offsets, end)]
+        return lines
+
+
+def _newlines(text, base):
+    offsets = array('Q')
+    found = text.find('\n')
+    while found >= 0:
+        offsets.append(base + found)
+        found = text.find('\n', found + 1)
+    return offsets
+
+
+class _Node:
+    __slots__ = ('text', 'index', 'start', 'length', 'newlines', 'priority',
+                 'left', 'right', 'size', 'lines')
+
+    def __init__(self, text, index, start, length, priority, left=None, right=None, newlines=None):
+        self.text = text
+        self.index = index
+        self.start = start
+        self.length = length
+        if newlines is None:
+            newlines = text.count('\n', start, start + length)
+        self.newlines = newlines
+        self.priority = priority
+        self.left = left
+        self.right = right
+        self.size = length + _size(left) + _size(right)
+        self.lines = newlines + _lines(left) + _lines(right)
+
+    def with_children(self, left, right):
+        return _Node(self.text, self.index, self.start, self.length, self.priority,
+                     left, right, self.newlines)
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _lines(node):
+    return node.lines if node is not None else 0
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        return left.with_children(left.left, _merge(left.right, right))
+    return right.with_children(_merge(left, right.left), right.right)
+
+
+def _split(node, offset):
+    # Returns (tree with the first `offset` characters, tree with the rest),
+    # cutting a piece in two when the offset falls inside it.
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    if offset <= left_size:
+        left, right = _split(node.left, offset)
+        return left, node.with_children(right, node.right)
+    if offset >= left_size + node.length:
+        left, right = _split(node.right, offset - left_size - node.length)
+        return node.with_children(node.left, left), right
+    cut = offset - left_size
+    head_lines = node.index.count(node.start, node.start + cut)
+    head = _Node(node.text, node.index, node.start, cut, node.priority, node.left, None, head_lines)
+    tail = _Node(node.text, node.index, node.start + cut, node.length - cut, random.random(),
+                 newlines=node.newlines - head_lines)
+    return head, _merge(tail, node.right)
+
+
+def _last(node):
+    while node is not None and node.right is not None:
+        node = node.right
+    return node
+
+
+def _replace_last(node, text, index, length, newlines):
+    # Path-copies the right spine, giving the last piece a new text/length.
+    if node.right is None:
+        return _Node(text, index, node.start, length, node.priority, node.left, None, newlines)
+    return node.with_children(node.left, _replace_last(node.right, text, index, length, newlines))
+
+
+def _build(pieces):
+    # Builds a treap from pieces in document order in O(n) using a stack of
+    # the right spine.
+    spine = []
+    # pieces cut from the same text share its line index
+    index = None
+    for text, start, length in pieces:
+        if index is None or index.text is not text:
+            index = _Lines(text)
+        node = _Node(text, index, start, length, random.random())
+        last = None
+        while spine and spine[-1].priority < node.priority:
+            last = spine.pop()
+            if spine:
+                spine[-1] = spine[-1].with_children(spine[-1].left, last)
+        node = node.with_children(last, None)
+        spine.append(node)
+    root = None
+    while spine:
+        root = spine.pop()
+        if spine:
+            spine[-1] = spine[-1].with_children(spine[-1].left, root)
+    return root
+
+
+def _split_for_load(text):
+    if len(text) <= LOAD_PIECE_SIZE:
+        if text:
+            yield text, 0, len(text)
+        return
+    start = 0
+    while start < len(text):
+        end = min(start + LOAD_PIECE_SIZE, len(text))
+        if end < len(text):
+            newline = text.rfind('\n', start, end)
+            if newline > start:
+                end = newline + 1
+        yield text, start, end - start
+        start = end
+
+
+class PieceTable:
+
+    def __init__(self, text=''):
+        self._root = _build(_split_for_load(text))
+        self._add = ''
+        self._add_lines = _Lines(None)
+
+    def __len__(self):
+        return _size(self._root)
+
+    def newlines(self):
+        return _lines(self._root)
+
+    def line_start(self, line):
+        # Offset of the first character of `line` (counted from 0), that is
+        # just after the line-th newline.
+        if line <= 0:
+            return 0
+        node, base, remaining = self._root, 0, line
+        while node is not None:
+            left_lines = _lines(node.left)
+            if remaining <= left_lines:
+                node = node.left
+                continue
+            remaining -= left_lines
+            piece_base = base + _size(node.left)
+            if remaining <= node.newlines:
+                return piece_base + node.index.find(node.start, remaining) + 1 - node.start
+            remaining -= node.newlines
+            base = piece_base + node.length
+            node = node.right
+        return len(self)
+
+    def line_of(self, offset):
+        # Number of newlines before offset, i.e. the line it is on.
+        node, base, lines = self._root, 0, 0
+        while node is not None:
+            left_size = _size(node.left)
+            if offset < base + left_size:
+                node = node.left
+                continue
+            lines += _lines(node.left)
+            inside = offset - base - left_size
+            if inside < node.length:
+                return lines + node.index.count(node.start, node.start + inside)
+            lines += node.newlines
+            base += left_size + node.length
+            node = node.right
+        return lines
+
+    def __str__(self):
+        return ''.join(self.chunks())
+
+    def snapshot(self):
+        # Nodes are immutable, so the root is a consistent view of the
+        # document that later edits cannot change.
+        return self._root
+
+    def restore(self, snapshot):
+        self._root = snapshot
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, len(self)))
+        left, right = _split(self._root, offset)
+        last = _last(left)
+        if (last is not None and last.text is self._add and
+                last.start + last.length == len(self._add) and
+                len(self._add) + len(text) <= ADD_BLOCK_SIZE):
+            self._add_lines.extend(len(self._add), text)
+            self._add += text
+            left = _replace_last(left, self._add, self._add_lines, last.length + len(text),
+                                 last.newlines + text.count('\n'))
+        else:
+            if len(self._add) + len(text) > ADD_BLOCK_SIZE:
+                self._add = ''
+                self._add_lines = _Lines(None)
+            start = len(self._add)
+            self._add_lines.extend(start, text)
+            self._add += text
+            left = _merge(left, _Node(self._add, self._add_lines, start, len(text), random.random(),
+                                      newlines=text.count('\n')))
+        self._root = _merge(left, right)
+
+    def delete(self, offset, length):
+        if length <= 0:
+            return
+        left, rest = _split(self._root, offset)
+        removed, right = _split(rest, length)
+        last = _last(left)
+        if (last is not None and removed is not None and
+                last.text is self._add and removed.left is None and removed.right is None and
+                removed.text is self._add and
+                last.start + last.length == removed.start and
+                removed.start + removed.length == len(self._add)):
+            # Backspace over freshly typed text: give the characters back to
+            # the add block so that typing keeps extending the same piece.
+            self._add = self._add[:removed.start]
+            self._add_lines = self._add_lines.truncated(removed.start)
+            left = _replace_last(left, self._add, self._add_lines, last.length, last.newlines)
+        self._root = _merge(left, right)
+
+    def replace(self, text):
+        self.load(_split_for_load(text))
+
+    def load(self, pieces):
+        # pieces: (text, start, length) in document order; text only needs
+        # len() and slicing, see skrevo.mapped
+        self._root = _build(pieces)
+        self._add = ''
+        self._add_lines = _Lines(None)
+
+    def pieces(self, snapshot=None):
+        # Yields (text, start, length) of the pieces in document order, as
+        # load() takes them.
+        stack = []
+        node = self._root if snapshot is None else snapshot
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.text, node.start, node.length
+            node = node.right
+
+    def slice(self, start, end=None):
+        size = len(self)
+        if end is None or end > size:
+            end = size
+        start = max(0, start)
+        if start >= end:
+            return ''
+        return ''.join(self.chunks(start, end))
+
+    def chunks(self, start=0, end=None, snapshot=None):
+        # Yields the text between start and end piece by piece, visiting only
+        # the nodes that overlap the range.
+        root = self._root if snapshot is None else snapshot
+        if end is None:
+            end = _size(root)
+        stack = []
+        node, base = root, 0
+        while stack or node is not None:
+            while node is not None:
+                if start >= base + node.size or end <= base:
+                    node = None
+                    break
+                stack.append((node, base))
+                node = node.left
+            if not stack:
+                break
+            node, base = stack.pop()
+            piece_start = base + _size(node.left)
+            piece_end = piece_start + node.length
+            if piece_start >= end:
+                break
+            if piece_end > start:
+                lo = max(start, piece_start) - piece_start
+                hi = min(end, piece_end) - piece_start
+                yield node.text[node.start + lo:node.start + hi]
+            node, base = node.right, piece_end
+
+    def char_at(self, offset):
+        node, base = self._root, 0
+        while node is not None:
+            left_size = _size(node.left)
+            if offset < base + left_size:
+                node = node.left
+            elif offset < base + left_size + node.length:
+                return node.text[node.start + offset - base - left_size]
+            else:
+                base += left_size + node.length
+                node = node.right
+        return ''
@@ -2,55 +2,52 @@
 # coding=utf-8
 """skrevo
 Usage:
-  skrevo [--config FILE] [-o SKREVOFILE]
+  skrevo export FORMAT [--config FILE] [-o SKREVOFILE] [--to FILE] [--workers N] [SESSION...]
+  skrevo [--config FILE] [-o SKREVOFILE] [--profile] [--record LOG] [DOCUMENT...]
+  skrevo --replay LOG [--config FILE] [-o SKREVOFILE] [--paced]
+  skrevo --sessions [--config FILE]
+  skrevo --restore SESSION [--config FILE] [--to FILE]
+  skrevo --search QUERY [--config FILE]
+  skrevo --stats [--config FILE] [-o SKREVOFILE]
   skrevo (-h | --help)
   skrevo --version
   skrevo --show-default-bindings
+
 Options:
   -o FILE                             Path to the file where skrevo will save your content [default: ~/skrevo.txt]
   -c FILE --config=FILE               Path to your skrevo configuraton file [default: ~/.skrevorc]
+  --profile                           Time every keystroke and print latency percentiles on exit
+  --record LOG                        Record all input into LOG, to be replayed with --replay
+  --replay LOG                        Replay the input recorded in LOG on a copy of the content
+                                      file, without a terminal, and report throughput and the
+                                      final document hash
+  --paced                             Replay at the recorded pace instead of as fast as possible
+  --sessions                          List the archived writing sessions
+  --restore SESSION                   Write an archived session to stdout, or to the file given
+                                      with --to
+  --to FILE                           Where --restore writes the session, or export its output
+  --search QUERY                      Search everything saved with skrevo, current and past
+                                      text, best matches first
+  --stats                             Show words per day, vocabulary growth, average sentence
+                                      length and the most frequent terms
+  --workers N                         Processes rendering the chapters of an export
+                                      [default: all cores]
   -h --help                           Show this screen.
   --version                           Show version.
   --show-default-bindings             Show default keybindings in config parser format
                                       Add this to your config file and edit to customize
 """
 
+# Only what every command needs is imported here.  The editor (urwid, the
+# buffer, asyncio) is imported in main() once we know the UI will start, so
+# that --version and --show-default-bindings stay fast.
 import sys
 import os
-import random
-import threading
-from collections import OrderedDict
+from functools import partial
 from docopt import docopt
 
 import skrevo as SKR
-from skrevo.urwid_ui import UrwidUI
 from skrevo.keys import KeyBindings
-from skrevo.skrevo import Skrevo
-
-import configparser
-config_parser_module = configparser
-
-autosave_lock = threading.Lock()
-
-
-def autosave():
-    if not enable_autosave:
-        return
-
-    # print "autosaving..."
-    with autosave_lock:
-        # view.save_todos() # TODO: Saved message isn't displayed, need to force redraw urwid ui?
-        view.todos.save()
-
-    # Check the flag once again, as the flag may have been set
-    # after the last check but before this statement is executed.
-    if enable_autosave:
-        global timer
-        timer = threading.Timer(30.0, autosave)
-        timer.start()
-
-
-timer = threading.Timer(30.0, autosave)
 
 
 def exit_with_error(message):
@@ -77,11 +74,12 @@ def get_real_path(filename, description):
     return file_path
 
 
-def get_boolean_config_option(cfg, section, option, default=False):
-    value = dict(cfg.items(section)).get(option, default)
-    if (type(value) != bool and
-        (str(value).lower() == 'true' or
-         str(value).lower() == '1')):
+def get_boolean_config_option(settings, option, default=False):
+    value = settings.get(option, default)
+    if type(value) == bool:
+        return value
+    if (str(value).lower() == 'true' or
+            str(value).lower() == '1'):
         value = True
     else:
         # If present but is not True or 1
@@ -90,43 +88,83 @@ def get_boolean_config_option(cfg, section, option, default=False):
 
 
 def main():
-    random.seed()
-
     # Parse command line
     arguments = docopt(__doc__, version=SKR.version)
-    config_file_path = os.path.expanduser(arguments['--config'][0])
+    config_file_path = os.path.expanduser(arguments['--config'])
     # print(arguments) ; exit(0)
 
     # Validate readline editing mode option (docopt doesn't handle this)
     # if arguments['--readline-editing-mode'] not in ['vi', 'emacs']:
     #     exit_with_error("--readline-editing-mode must be set to either vi or emacs\n")
 
-    # Parse config file
-    cfg = config_parser_module.ConfigParser(allow_no_value=True)
-    cfg.read(config_file_path)
-
-    cfg.add_section('keys')
-    cfg.add_section('settings')
-
     if arguments['--show-default-bindings']:
+        import configparser
+        cfg = configparser.ConfigParser(allow_no_value=True)
+        cfg.read(config_file_path)
+        for section in ('keys', 'settings'):
+            if not cfg.has_section(section):
+                cfg.add_section(section)
         d = {k: ", ".join(v) for k, v in KeyBindings({}).key_bindings.items()}
-        cfg._sections['keys'] = OrderedDict(sorted(d.items(), key=lambda t: t[0]))
+        cfg._sections['keys'] = dict(sorted(d.items(), key=lambda t: t[0]))
         cfg.write(sys.stdout)
         exit(0)
 
-    # Load keybindings specified in the [keys] section of the config file
-    keyBindings = KeyBindings(dict(cfg.items('keys')))
+    # Parse config file, or load it compiled from the previous start: the
+    # [settings] section and the key bindings specified in the [keys]
+    # section
+    from skrevo.config import load_config
+    try:
+        config = load_config(config_file_path)
+    except (OSError, ValueError) as error:
+        exit_with_error("ERROR: unable to read {0}: {1}".format(config_file_path, error))
+    settings = config.settings
+    keyBindings = config.key_bindings
 
     # load the colorscheme defined in the user config, else load the default scheme
     # colorscheme = ColorScheme(dict(cfg.items('settings')).get('colorscheme', 'default'), cfg)
 
     # Get auto-saving setting (defaults to False)
-    global enable_autosave
-    enable_autosave = get_boolean_config_option(cfg, 'settings', 'auto-save', default=False)
+    enable_autosave = get_boolean_config_option(settings, 'auto-save', default=False)
+
+    # Every session is archived on exit (defaults to True)
+    archive_directory = settings.get('archive-dir', '~/.skrevo/archive')
+    enable_archive = get_boolean_config_option(settings, 'archive', default=True)
+
+    # Saved text is indexed for searching (defaults to True)
+    search_path = settings.get('search-index', '~/.skrevo/search.db')
+    enable_search = get_boolean_config_option(settings, 'search', default=True)
+
+    # Counts of text already seen are kept here
+    stats_cache = settings.get('stats-cache', '~/.skrevo/stats.cache')
+
+    if arguments['--search'] is not None:
+        from skrevo.search import SearchIndex, MATCH_START, MATCH_END
+        for result in SearchIndex(search_path).search(arguments['--search']):
+            snippet = ' '.join(result.snippet.split())
+            print("{0:%Y-%m-%d %H:%M}  {1}{2}".format(
+                result.saved, result.file, '' if result.current else '  (no longer in the file)'))
+            print("    " + snippet.replace(MATCH_START, '[').replace(MATCH_END, ']'))
+        exit(0)
+
+    if arguments['--sessions'] or arguments['--restore']:
+        from skrevo.archive import Archive
+        archive = Archive(archive_directory)
+        if arguments['--sessions']:
+            for name in archive.sessions():
+                when, size, chunks = archive.session_info(name)
+                print("{0}  {1:>10} bytes  {2:>6} chunks".format(name, size, chunks))
+            exit(0)
+        if arguments['--restore'] not in archive.sessions():
+            exit_with_error("ERROR: No archived session named {0}.".format(arguments['--restore']))
+        output = open(os.path.expanduser(arguments['--to']), 'w') if arguments['--to'] else sys.stdout
+        with output:
+            for chunk in archive.restore(arguments['--restore']):
+                output.write(chunk)
+        exit(0)
 
     # Load the skrevo.txt file specified in the [settings] section of the config file
     # a skrevo.txt file on the command line takes precedence
-    skrevo_file = dict(cfg.items('settings')).get('content-file', arguments['-o'])
+    skrevo_file = settings.get('content-file', arguments['-o'])
     if arguments['-o']:
         skrevo_file = os.path.expanduser(arguments['-o'])
 
@@ -135,21 +173,152 @@ def main():
 
     skrevo_file_path = get_real_path(skrevo_file, 'skrevo.txt')
 
+    # Undo history, capped in memory and optionally kept across sessions
     try:
-        with open(skrevo_file_path, "w+") as skrevo_file:
-            skrevo = Skrevo(skrevo_file.readlines(), skrevo_file_path)
+        undo_memory = int(settings.get('undo-memory-mb', 16))
+    except ValueError:
+        exit_with_error("ERROR: undo-memory-mb must be a number of megabytes.")
+    persist_undo = get_boolean_config_option(settings, 'persist-undo', default=False)
+
+    if arguments['--replay']:
+        from skrevo.replay import replay
+        result = replay(arguments['--replay'], skrevo_file_path, keyBindings, paced=arguments['--paced'],
+                        undo_memory=undo_memory * 1024 * 1024, persist_undo=persist_undo)
+        if not result['initial_hash_matches']:
+            sys.stderr.write("WARNING: the content file differs from the one the log was recorded on\n")
+        print("{events} events, {keys} keys in {seconds:.3f}s ({keys_per_second:.0f} keys/s, {frames} frames)".format(**result))
+        print("document sha256: {final_hash}".format(**result))
+        exit(0)
+
+    if arguments['--stats']:
+        from skrevo.stats import Statistics, format_report
+        archive = None
+        if enable_archive:
+            from skrevo.archive import Archive
+            archive = Archive(archive_directory)
+        report = Statistics(stats_cache).report(skrevo_file_path, archive)
+        print('\n'.join(format_report(report)))
+        exit(0)
+
+    if arguments['export']:
+        from skrevo.export import FORMATS, export, file_lines, chunk_lines
+        output_format = arguments['FORMAT'].lower()
+        if output_format not in FORMATS:
+            exit_with_error("ERROR: FORMAT must be one of {0}.".format(", ".join(FORMATS)))
+        if output_format == 'epub' and not arguments['--to']:
+            exit_with_error("ERROR: an EPUB export needs --to FILE.")
+        try:
+            workers = int(arguments['--workers']) if arguments['--workers'] != 'all cores' else None
+        except ValueError:
+            exit_with_error("ERROR: --workers must be a number of processes.")
+        if arguments['SESSION']:
+            # archived sessions instead of the content file
+            from skrevo.archive import Archive
+            archive = Archive(archive_directory)
+            for name in arguments['SESSION']:
+                if name not in archive.sessions():
+                    exit_with_error("ERROR: No archived session named {0}.".format(name))
+            sources = ((name, chunk_lines(archive.restore(name))) for name in arguments['SESSION'])
+        else:
+            sources = [(os.path.basename(skrevo_file_path), file_lines(skrevo_file_path))]
+        title = os.path.splitext(os.path.basename(skrevo_file_path))[0]
+        if output_format == 'epub':
+            output = os.path.expanduser(arguments['--to'])
+        elif arguments['--to']:
+            output = open(os.path.expanduser(arguments['--to']), 'w', encoding='utf-8')
+        else:
+            output = sys.stdout
+        try:
+            export(sources, output_format, output, title, workers)
+        finally:
+            if output is not sys.stdout and not isinstance(output, str):
+                output.close()
+        exit(0)
+
+    # Everything below is only needed by the editor.
+    from skrevo import documents
+    from skrevo.urwid_ui import UrwidUI
+
+    # Map big files instead of reading them (defaults to False)
+    lazy_load = get_boolean_config_option(settings, 'lazy-load', default=False)
+
+    # Keep edits in a journal next to the content file (defaults to False)
+    enable_journal = get_boolean_config_option(settings, 'journal', default=False)
+
+    # Documents not shown are closed when the open ones use more than this
+    try:
+        memory_cap = int(settings.get('memory-cap-mb', 256))
+    except ValueError:
+        exit_with_error("ERROR: memory-cap-mb must be a number of megabytes.")
+
+    search_index = None
+    if enable_search:
+        from skrevo.search import SearchIndex
+        search_index = SearchIndex(search_path)
+
+    open_document = partial(documents.open_document, lazy=lazy_load, journal=enable_journal,
+                            undo_memory=undo_memory * 1024 * 1024, persist_undo=persist_undo,
+                            index=search_index)
+    close_document = partial(documents.close_document, persist_undo=persist_undo,
+                             archive_directory=archive_directory if enable_archive else None)
+
+    try:
+        skrevo = open_document(skrevo_file_path)
     except FileNotFoundError as fnf_error:
         print(fnf_error)
         exit_with_error("ERROR: unable to open {0}\n\nEither specify one as an argument on the command line or set it in your configuration file ({1}).".format(skrevo_file_path, config_file_path))
-        skrevo = Skrevo([], skrevo_file_path)
 
-    show_toolbar = get_boolean_config_option(cfg, 'settings', 'show-toolbar')
-    enable_word_wrap = get_boolean_config_option(cfg, 'settings', 'enable-word-wrap')
+    show_toolbar = get_boolean_config_option(settings, 'show-toolbar')
+    enable_word_wrap = get_boolean_config_option(settings, 'enable-word-wrap')
+
+    view = UrwidUI(skrevo, keyBindings)
+    view.documents.opener = open_document
+    view.documents.closer = close_document
+    view.documents.memory_cap = memory_cap * 1024 * 1024
+    # more documents from the command line, opened when first shown
+    for document in arguments['DOCUMENT']:
+        view.documents.add(get_real_path(document, 'document'))
+
+    def open_statistics():
+        from skrevo.stats import Statistics
+        archive = None
+        if enable_archive:
+            from skrevo.archive import Archive
+            archive = Archive(archive_directory)
+        return Statistics(stats_cache), archive
+    view.open_statistics = open_statistics
+
+    # Input arriving faster than this is drawn in one frame (defaults to 16)
+    try:
+        view.frame_budget = float(settings.get('frame-budget-ms', 16)) / 1000
+    except ValueError:
+        exit_with_error("ERROR: frame-budget-ms must be a number of milliseconds.")
+
+    if arguments['--record']:
+        view.enable_recording(arguments['--record'])
 
-    global view
-    view = UrwidUI(skrevo)
+    # Keystroke latency profiling (defaults to False)
+    if arguments['--profile'] or get_boolean_config_option(settings, 'profile', default=False):
+        view.enable_profiling()
 
-    timer.start()
+    # Work that can wait until the document is on screen
+    if enable_autosave:
+        view.run_after_first_paint(view.start_autosave)
+    # Apply changes other programs make to the content file (defaults to True)
+    if get_boolean_config_option(settings, 'watch-file', default=True):
+        view.run_after_first_paint(view.start_watching)
+    # Key bindings are reloaded when the config file changes (defaults to True)
+    if get_boolean_config_option(settings, 'watch-config', default=True):
+        view.run_after_first_paint(lambda: view.watch_config(
+            config_file_path, lambda: load_config(config_file_path).key_bindings))
+    if skrevo.index is not None:
+        view.run_after_first_paint(view.start_indexing)
+    # Spell checking with a word list (one word per line, defaults to the
+    # system's), compiled once into dictionary-cache
+    word_list = os.path.expanduser(settings.get('dictionary', '/usr/share/dict/words'))
+    dictionary_cache = settings.get('dictionary-cache', '~/.skrevo/dictionary.dawg')
+    if get_boolean_config_option(settings, 'spell-check', default=True) and os.path.exists(word_list):
+        view.run_after_first_paint(lambda: view.start_spell_checking(word_list, dictionary_cache))
 
     view.main(  # start up the urwid UI event loop
         enable_word_wrap,
@@ -157,14 +326,17 @@ def main():
 
     # UI is now shut down
 
-    # Shut down the auto-saving thread.
-    enable_autosave = False
-    timer.cancel()
-
-    # Final save
-    with autosave_lock:
-        # print("Writing: {0}".format(skrevo_file_path))
-        view.skrevo.save()
+    if view.profiler is not None:
+        sys.stderr.write(view.profiler.report())
+    if view.recorder is not None:
+        view.recorder.close()
+
+    # Final save of the open documents; the background tasks were stopped
+    # with the UI
+    for document in view.documents.open.values():
+        warning = close_document(document)
+        if warning is not None:
+            sys.stderr.write("WARNING: {0}\n".format(warning))
 
     exit(0)
 
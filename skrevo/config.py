@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding=utf-8
+import marshal
+import os
+import struct
+from collections import namedtuple
+
+import skrevo as SKR
+from skrevo.keys import KeyBindings
+
+# The configuration file, compiled.
+#
+# Parsing ~/.skrevorc takes configparser (and importing it) and resolving
+# the key bindings rebuilds the tables from the defaults on every start.
+# Instead the result, the [settings] and [keys] sections and the binding
+# tables with their reverse index, is kept in a snapshot that is loaded
+# with one read.  A snapshot is only used for the configuration file it
+# was compiled from and by the skrevo version that compiled it (it holds
+# that version's default bindings), while the file has the same size and
+# mtime or, failing that (the file was touched or copied), the same
+# content.  A missing configuration file is one without settings.
+#
+# Layout of the snapshot file:
+#
+#   header      magic, size and mtime of the configuration file, blake2b
+#               digest of its content, length of the tables
+#   tables      marshalled (version, path, settings, user keys, bindings,
+#               key index)
+
+DEFAULT_CACHE = '~/.skrevo/config.cache'
+
+MAGIC = b'SKC1'
+HEADER = struct.Struct('<4sQQ32sI')
+
+Config = namedtuple('Config', 'settings key_bindings')
+
+
+def _stamp(config_path):
+    # as skrevo.fileio.file_stamp, which imports tempfile: this is on the
+    # path of every start
+    try:
+        stat = os.stat(config_path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _read(config_path):
+    try:
+        with open(config_path, 'rb') as config_file:
+            return config_file.read()
+    except FileNotFoundError:
+        return b''
+
+
+def _digest(data):
+    import hashlib
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+
+def parse_config(data, config_path='<config>'):
+    # -> Config of the configuration file's content, raising ValueError if
+    # it can't be parsed
+    import configparser
+    cfg = configparser.ConfigParser(allow_no_value=True)
+    try:
+        cfg.read_string(data.decode('utf-8'), config_path)
+        for section in ('keys', 'settings'):
+            if not cfg.has_section(section):
+                cfg.add_section(section)
+        settings = dict(cfg.items('settings'))
+        user_keys = dict(cfg.items('keys'))
+    except configparser.Error as error:
+        raise ValueError(str(error)) from error
+    return Config(settings, KeyBindings(user_keys))
+
+
+def read_snapshot(cache_path, config_path):
+    # -> (size, mtime), digest and Config of the snapshot of config_path, or
+    # None if there is no usable one
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            snapshot = cache_file.read()
+        magic, size, mtime, digest, length = HEADER.unpack_from(snapshot)
+        if magic != MAGIC or len(snapshot) != HEADER.size + length:
+            return None
+        version, path, settings, user_keys, key_bindings, key_index = marshal.loads(snapshot[HEADER.size:])
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        return None
+    if version != SKR.version or path != config_path:
+        return None
+    return (size, mtime), digest, Config(settings, KeyBindings.fromTables(user_keys, key_bindings, key_index))
+
+
+def write_snapshot(cache_path, config_path, stamp, digest, config):
+    key_bindings = config.key_bindings
+    tables = marshal.dumps((SKR.version, config_path, config.settings, dict(key_bindings.user_keys),
+                            dict(key_bindings.key_bindings), dict(key_bindings.key_index)))
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        cache_file.write(HEADER.pack(MAGIC, stamp[0], stamp[1], digest, len(tables)) + tables)
+    os.replace(temp_path, cache_path)
+
+
+def load_config(config_path, cache_path=DEFAULT_CACHE):
+    # -> Config of config_path, from the snapshot if it is up to date;
+    # otherwise the file is parsed and the snapshot written again.
+    cache_path = os.path.expanduser(cache_path)
+    stamp = _stamp(config_path)
+    snapshot = read_snapshot(cache_path, config_path)
+    if snapshot is not None and snapshot[0] == stamp:
+        return snapshot[2]
+    data = _read(config_path)
+    digest = _digest(data)
+    if snapshot is not None and snapshot[1] == digest:
+        config = snapshot[2]
+    else:
+        config = parse_config(data, config_path)
+    try:
+        write_snapshot(cache_path, config_path, stamp, digest, config)
+    except OSError:
+        # parsed again next time
+        pass
+    return config
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Word and line statistics kept up to date as the buffer is edited.
+#
+# A word starts at every non-whitespace character that follows whitespace (or
+# the start of the document), so whether a character starts a word depends
+# only on the character itself and the one before it.  An edit can therefore
+# only change the word starts inside the edited text and at the character
+# right after it; updating the count needs nothing but the edited text and
+# its two neighbours, whatever the size of the document.
+
+
+def _is_word_start(char, previous):
+    return bool(char) and not char.isspace() and (not previous or previous.isspace())
+
+
+def _count_word_starts(text, previous):
+    words = len(text.split())
+    if text and _is_word_start(text[0], '') and not _is_word_start(text[0], previous):
+        # the first word of `text` continues the word before it
+        words -= 1
+    return words
+
+
+class Counters:
+
+    def __init__(self):
+        self.words = 0
+        self.newlines = 0
+
+    def reset(self, chunks):
+        self.words = 0
+        self.newlines = 0
+        previous = ''
+        for chunk in chunks:
+            self.words += _count_word_starts(chunk, previous)
+            self.newlines += chunk.count('\n')
+            previous = chunk[-1:]
+
+    def inserted(self, previous, text, following):
+        self.words += (_count_word_starts(text, previous) +
+                       _is_word_start(following, text[-1]) -
+                       _is_word_start(following, previous))
+        self.newlines += text.count('\n')
+
+    def deleted(self, previous, text, following):
+        self.words -= (_count_word_starts(text, previous) +
+                       _is_word_start(following, text[-1]) -
+                       _is_word_start(following, previous))
+        self.newlines -= text.count('\n')
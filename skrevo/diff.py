@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# coding=utf-8
+import difflib
+from collections import namedtuple
+from itertools import accumulate
+
+# Line-level differences between two versions of a document, used to apply
+# changes made to the content file by other programs without reloading it.
+#
+# Lines are compared with their newline, and the text after the last newline
+# counts as a line (possibly empty), so the lines are exactly the positions
+# of SkrevoWalker.  Lines common to the start and the end are skipped first;
+# what remains (usually a handful of lines around the edits) is matched with
+# difflib, unless it is too big for that, in which case it becomes a single
+# change.
+
+MATCH_LIMIT = 20000
+
+# Lines [line, line + old_lines) of the old text, characters [start, end),
+# become `text`, which has new_lines lines.
+Change = namedtuple('Change', 'line old_lines new_lines start end text')
+
+
+def _lines(text):
+    parts = text.split('\n')
+    return [part + '\n' for part in parts[:-1]] + parts[-1:]
+
+
+def line_changes(old, new):
+    # -> the changes turning old into new, last first, so that applying them
+    # in order doesn't move the ones still to apply
+    old_lines = _lines(old)
+    new_lines = _lines(new)
+    shortest = min(len(old_lines), len(new_lines))
+    head = 0
+    while head < shortest and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while tail < shortest - head and old_lines[-1 - tail] == new_lines[-1 - tail]:
+        tail += 1
+    old_middle = old_lines[head:len(old_lines) - tail]
+    new_middle = new_lines[head:len(new_lines) - tail]
+    if not old_middle and not new_middle:
+        return []
+
+    if len(old_middle) + len(new_middle) <= MATCH_LIMIT:
+        matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+        opcodes = matcher.get_opcodes()
+    else:
+        opcodes = [('replace', 0, len(old_middle), 0, len(new_middle))]
+    # offsets[i]: where old line head + i starts
+    offsets = list(accumulate(map(len, old_middle),
+                              initial=sum(map(len, old_lines[:head]))))
+    changes = []
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag != 'equal':
+            changes.append(Change(head + i1, i2 - i1, j2 - j1, offsets[i1], offsets[i2],
+                                  ''.join(new_middle[j1:j2])))
+    return changes
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding=utf-8
+from collections import OrderedDict
+
+# The content files open in one editor, in tab order.
+#
+# Documents are opened with opener(path) -> Skrevo and closed (saved, and
+# their journal and history put away) with closer(skrevo).  When the open
+# documents use more than memory_cap bytes (see Skrevo.memory_use), the ones
+# used least recently are evicted: closed, keeping only their path and
+# cursor, and opened again when they are switched to.
+
+DEFAULT_MEMORY_CAP = 256 * 1024 * 1024
+
+
+def open_document(path, lazy=False, journal=False, undo_memory=None, persist_undo=False, index=None):
+    # -> the Skrevo of path, loaded (mapped when lazy) with its journal
+    # replayed, an undo history of undo_memory bytes and the search index
+    from skrevo.skrevo import Skrevo
+    skrevo = Skrevo([], path)
+    skrevo.load(lazy=lazy)
+    if journal:
+        skrevo.open_journal()
+    if undo_memory is not None:
+        skrevo.enable_history(undo_memory, persist_undo)
+    skrevo.index = index
+    return skrevo
+
+
+def close_document(skrevo, persist_undo=False, archive_directory=None):
+    # Saves a document, and archives it when archive_directory is given;
+    # returns a warning if it couldn't be saved or archived.  A document in
+    # conflict with its file isn't written over it: it goes to a copy next
+    # to the file.
+    warnings = []
+    if not skrevo.readable():
+        # written into by another program: our text can't be read back
+        skrevo.conflict = True
+        skrevo.close_journal()
+        if skrevo.modified():
+            return "{0} was rewritten on disk; unsaved edits were lost".format(skrevo.file_path)
+        return None
+    conflict = skrevo.check_conflict()
+    if conflict:
+        try:
+            warnings.append("{0} changed on disk; your version is in {1}".format(
+                skrevo.file_path, skrevo.save_copy()))
+        except OSError as error:
+            warnings.append("{0} changed on disk; your version was not saved: {1}".format(
+                skrevo.file_path, error))
+    skrevo.save()
+    skrevo.close_journal()
+    if not conflict:
+        if persist_undo:
+            skrevo.save_history()
+        skrevo.update_index()
+    if archive_directory is not None:
+        from skrevo.archive import Archive
+        try:
+            Archive(archive_directory).store(skrevo.buffer.chunks())
+        except OSError as error:
+            warnings.append("The session of {0} was not archived: {1}".format(skrevo.file_path, error))
+    return "; ".join(warnings) or None
+
+
+class Documents:
+
+    def __init__(self, opener=open_document, closer=close_document, memory_cap=DEFAULT_MEMORY_CAP):
+        self.opener = opener
+        self.closer = closer
+        self.memory_cap = memory_cap
+        self.paths = []
+        # path -> Skrevo, least recently used first
+        self.open = OrderedDict()
+        # path -> (line, column) of the cursor when it was last shown
+        self.cursors = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, path, skrevo=None):
+        # -> position of the document, which may already be open
+        if path not in self.paths:
+            self.paths.append(path)
+        if skrevo is not None:
+            self.open[path] = skrevo
+        return self.paths.index(path)
+
+    def get(self, path):
+        # the open document, or None if it has to be opened
+        skrevo = self.open.get(path)
+        if skrevo is not None:
+            self.open.move_to_end(path)
+        return skrevo
+
+    def opened(self, path, skrevo):
+        self.open[path] = skrevo
+        self.open.move_to_end(path)
+
+    def memory_use(self):
+        return sum(skrevo.memory_use() for skrevo in self.open.values())
+
+    def to_evict(self, active):
+        # -> the documents to close to get under the cap, never the active one
+        evict = []
+        memory = self.memory_use()
+        for path, skrevo in self.open.items():
+            if memory <= self.memory_cap:
+                break
+            if skrevo is not active:
+                evict.append((path, skrevo))
+                memory -= skrevo.memory_use()
+        return evict
+
+    def evicted(self, path):
+        self.open.pop(path, None)
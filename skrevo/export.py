@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding=utf-8
+import html
+import os
+import re
+import uuid
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+# Export to Markdown, HTML or EPUB.
+#
+# The text goes through a pipeline of generators, so only a few chapters are
+# in memory at any time whatever the size of the input:
+#
+#   lines       of the content file, or of archived sessions
+#   chapters    lines grouped into chapters, which start at level-1
+#               headings ("# Title") and at each source; chapters longer
+#               than CHAPTER_LIMIT characters are cut at a paragraph break
+#               (or anywhere, past four times that)
+#   rendered    each chapter rendered to the output format, in a process
+#               pool once there is more than one chapter, with at most
+#               IN_FLIGHT chapters per worker waiting to be written
+#   output      written chapter by chapter, in order
+#
+# Headings are lines starting with one to six '#'; paragraphs are separated
+# by blank lines.
+
+FORMATS = ('md', 'html', 'epub')
+CHAPTER_LIMIT = 1024 * 1024
+IN_FLIGHT = 2
+
+HEADING = re.compile(r'(#{1,6})[ \t]+(.*?)[ \t#]*$')
+
+Chapter = namedtuple('Chapter', 'number title lines')
+
+HTML_START = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>{0}</title>
+</head>
+<body>
+"""
+HTML_END = "</body>\n</html>\n"
+
+XHTML = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><meta charset="utf-8"/><title>{0}</title></head>
+<body>
+{1}</body>
+</html>
+"""
+
+CONTAINER = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles>
+<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+</rootfiles>
+</container>
+"""
+
+PACKAGE = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="id">urn:uuid:{0}</dc:identifier>
+<dc:title>{1}</dc:title>
+<dc:language>{2}</dc:language>
+<meta property="dcterms:modified">{3}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{4}
+</manifest>
+<spine>
+{5}
+</spine>
+</package>
+"""
+
+
+# sources
+
+def file_lines(file_path):
+    with open(file_path, encoding='utf-8', errors='replace') as content_file:
+        yield from content_file
+
+
+def chunk_lines(chunks):
+    # lines of text given as chunks
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if rest:
+        yield rest
+
+
+# parse
+
+def chapters(sources, limit=CHAPTER_LIMIT):
+    # sources: (name, lines); yields the Chapters of all of them in order
+    number = 0
+    for name, lines in sources:
+        title = name
+        current = []
+        size = 0
+        for line in lines:
+            heading = HEADING.match(line)
+            starts_chapter = heading is not None and len(heading.group(1)) == 1
+            if starts_chapter or (size > limit and not line.strip()) or size > 4 * limit:
+                if any(text.strip() for text in current):
+                    number += 1
+                    yield Chapter(number, title, current)
+                current = []
+                size = 0
+                if starts_chapter:
+                    title = heading.group(2)
+            current.append(line)
+            size += len(line)
+        if any(text.strip() for text in current):
+            number += 1
+            yield Chapter(number, title, current)
+
+
+def blocks(lines):
+    # Yields ('heading', level, text) and ('paragraph', lines).
+    paragraph = []
+    for line in lines:
+        line = line.rstrip('\n')
+        heading = HEADING.match(line)
+        if heading is not None or not line.strip():
+            if paragraph:
+                yield 'paragraph', paragraph
+                paragraph = []
+            if heading is not None:
+                yield 'heading', len(heading.group(1)), heading.group(2)
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield 'paragraph', paragraph
+
+
+# render
+
+def render_markdown(chapter):
+    out = []
+    for block in blocks(chapter.lines):
+        if block[0] == 'heading':
+            out.append('#' * block[1] + ' ' + block[2])
+        else:
+            out.append('\n'.join(line.rstrip() for line in block[1]))
+    return '\n\n'.join(out) + '\n\n'
+
+
+def render_html(chapter):
+    out = []
+    for block in blocks(chapter.lines):
+        if block[0] == 'heading':
+            out.append('<h{0}>{1}</h{0}>'.format(block[1], html.escape(block[2])))
+        else:
+            out.append('<p>' + '<br/>\n'.join(html.escape(line.strip()) for line in block[1]) + '</p>')
+    return '<section id="chapter-{0}">\n{1}\n</section>\n'.format(chapter.number, '\n'.join(out))
+
+
+def render_epub(chapter):
+    return XHTML.format(html.escape(chapter.title), render_html(chapter))
+
+
+RENDERERS = {'md': render_markdown, 'html': render_html, 'epub': render_epub}
+
+
+def rendered(chapters, render, workers=None):
+    # Yields (chapter, rendered text) in order.  A single chapter is rendered
+    # here; more go to a process pool, keeping a bounded number in flight.
+    chapters = iter(chapters)
+    first = next(chapters, None)
+    if first is None:
+        return
+    second = next(chapters, None)
+    if second is None:
+        yield first, render(first)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        for chapter in _chain(first, second, chapters):
+            # the lines are no longer needed here once handed to the pool
+            in_flight.append((chapter._replace(lines=None), pool.submit(render, chapter)))
+            if len(in_flight) >= IN_FLIGHT * workers:
+                chapter, future = in_flight.popleft()
+                yield chapter, future.result()
+        while in_flight:
+            chapter, future = in_flight.popleft()
+            yield chapter, future.result()
+
+
+def _chain(first, second, rest):
+    yield first
+    yield second
+    yield from rest
+
+
+# output
+
+def export(sources, output_format, output, title, workers=None, language='en'):
+    # Writes the sources ((name, lines) pairs) to output: a text file object
+    # for md and html, a path or binary file object for epub.  Returns the
+    # number of chapters.
+    parts = rendered(chapters(sources), RENDERERS[output_format], workers)
+    if output_format == 'epub':
+        return _write_epub(parts, output, title, language)
+    count = 0
+    if output_format == 'html':
+        output.write(HTML_START.format(html.escape(title)))
+    for _, text in parts:
+        output.write(text)
+        count += 1
+    if output_format == 'html':
+        output.write(HTML_END)
+    return count
+
+
+def _write_epub(parts, output, title, language):
+    contents = []
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as epub:
+        # the mimetype comes first and uncompressed
+        epub.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', zipfile.ZIP_STORED)
+        epub.writestr('META-INF/container.xml', CONTAINER)
+        for chapter, text in parts:
+            name = 'chapter-{0}.xhtml'.format(chapter.number)
+            epub.writestr('OEBPS/' + name, text)
+            contents.append((name, chapter.title))
+        items = '\n'.join('<item id="c{0}" href="{1}" media-type="application/xhtml+xml"/>'.format(
+            number, name) for number, (name, _) in enumerate(contents, 1))
+        spine = '\n'.join('<itemref idref="c{0}"/>'.format(number) for number in range(1, len(contents) + 1))
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        epub.writestr('OEBPS/content.opf', PACKAGE.format(
+            uuid.uuid4(), html.escape(title), language, modified, items, spine))
+        navigation = '<nav epub:type="toc">\n<ol>\n{0}\n</ol>\n</nav>\n'.format('\n'.join(
+            '<li><a href="{0}">{1}</a></li>'.format(name, html.escape(chapter_title))
+            for name, chapter_title in contents))
+        epub.writestr('OEBPS/nav.xhtml', XHTML.format(html.escape(title), navigation))
+    return len(contents)
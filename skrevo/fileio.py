@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding=utf-8
+import os
+import tempfile
+
+
+class LocalFileSystem:
+    # The few file operations used for saving, kept behind an object so that
+    # they can be replaced (e.g. by a slow fake filesystem in benchmarks).
+
+    def create_temp(self, directory):
+        fd, temp_path = tempfile.mkstemp(prefix='.skrevo-', dir=directory)
+        return os.fdopen(fd, 'w', encoding='utf-8'), temp_path
+
+    def fsync(self, temp_file):
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+
+    def replace(self, source, target):
+        os.replace(source, target)
+
+    def remove(self, path):
+        os.unlink(path)
+
+    def sync_directory(self, directory):
+        # makes the rename itself durable; not possible on every platform
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+local_fs = LocalFileSystem()
+
+
+def file_stamp(file_path):
+    # (size, mtime) identifying a version of a file, for sidecar files
+    # that are only valid for that version
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_atomically(file_path, chunks, fs=local_fs):
+    # Writes the chunks to a temporary file next to file_path, flushes it to
+    # disk and renames it over file_path, so a crash leaves either the old or
+    # the new content but never a truncated file.  The file always ends with
+    # a newline.
+    directory = os.path.dirname(file_path) or '.'
+    temp_file, temp_path = fs.create_temp(directory)
+    try:
+        with temp_file:
+            last = ''
+            for chunk in chunks:
+                temp_file.write(chunk)
+                last = chunk[-1:] or last
+            if last != '\n':
+                temp_file.write('\n')
+            fs.fsync(temp_file)
+        fs.replace(temp_path, file_path)
+    except BaseException:
+        fs.remove(temp_path)
+        raise
+    fs.sync_directory(directory)
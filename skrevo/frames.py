@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# coding=utf-8
+import time
+
+# Frame scheduling.
+#
+# urwid redraws the screen every time the event loop goes idle, that is after
+# every batch of input, alarm or watched file.  When input arrives faster than
+# frames can be drawn (fast typing, a slow terminal, a paste without bracketed
+# paste mode) most of those frames are never seen.  The scheduler takes the
+# place of that redraw: the first request after a quiet period draws at once,
+# so a single keystroke is as fast as before, and the ones that follow within
+# the frame budget are folded into one frame drawn at its end.
+
+FRAME_BUDGET = 1 / 60
+
+
+class FrameScheduler:
+
+    def __init__(self, main_loop, asyncio_loop, budget=FRAME_BUDGET):
+        self.main_loop = main_loop
+        self.asyncio_loop = asyncio_loop
+        self.budget = budget
+        self.last = 0.0
+        self.pending = None
+
+    def attach(self):
+        # MainLoop registers entering_idle when it starts running
+        self.main_loop.entering_idle = self.request
+
+    def request(self):
+        if self.pending is not None:
+            return
+        wait = self.last + self.budget - time.perf_counter()
+        if wait <= 0:
+            self.draw()
+        else:
+            self.pending = self.asyncio_loop.call_later(wait, self.draw)
+
+    def draw(self):
+        self.pending = None
+        if self.main_loop.screen.started:
+            self.main_loop.draw_screen()
+        self.last = time.perf_counter()
+
+    def cancel(self):
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding=utf-8
+import urwid
+
+# An urwid screen that renders into memory instead of a terminal, for
+# replaying recorded input (skrevo.replay) and for the benchmarks.
+
+
+class FakeScreen(urwid.BaseScreen):
+
+    def __init__(self, cols=100, rows=40):
+        super(FakeScreen, self).__init__()
+        self.size = (cols, rows)
+        self.frames = 0
+        self.text = []
+
+    def get_cols_rows(self):
+        return self.size
+
+    def set_terminal_properties(self, colors=None, bright_is_bold=None, has_underline=None):
+        pass
+
+    def draw_screen(self, size, canvas):
+        # Walking the content is what a real screen does to emit it.
+        self.text = [b''.join(text for _, _, text in row) for row in canvas.content()]
+        self.frames += 1
+
+    def clear(self):
+        pass
+
+    def get_input(self, raw_keys=False):
+        return ([], []) if raw_keys else []
+
+    # There is no terminal to read; input is fed to the main loop directly.
+    def hook_event_loop(self, event_loop, callback):
+        pass
+
+    def unhook_event_loop(self, event_loop):
+        pass
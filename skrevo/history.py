@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding=utf-8
+import os
+import struct
+import time
+from collections import deque
+
+from skrevo.fileio import file_stamp
+
+# Undo/redo history.
+#
+# Every edit is kept as a delta (insert or delete, offset, text), so undoing
+# or redoing costs the size of the edit.  Consecutive typing, backspacing or
+# forward deleting at adjacent offsets is merged into a single step until a
+# newline, a pause of MERGE_PAUSE seconds or an edit somewhere else.  Pauses
+# are measured with clock(), which a replay sets to the recorded time.
+#
+# Memory is estimated per delta (its text plus DELTA_OVERHEAD) and the oldest
+# steps are dropped once the history goes over its cap.
+#
+# The history can be saved to "<content file>.undo" on exit and loaded again
+# when the content file is still the one it was saved with.
+
+INSERT = b'i'
+DELETE = b'd'
+
+MERGE_PAUSE = 1.0
+DELTA_OVERHEAD = 120
+
+MAGIC = b'SKU1'
+HEADER = struct.Struct('<4sQQII')
+STEP = struct.Struct('<I')
+DELTA = struct.Struct('<cQI')
+
+
+def _cost(delta):
+    return DELTA_OVERHEAD + len(delta[2])
+
+
+class History:
+
+    def __init__(self, memory_cap=16 * 1024 * 1024, clock=time.monotonic):
+        self.memory_cap = memory_cap
+        self.clock = clock
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.memory = 0
+        self.last_edit = 0.0
+        self.merging = False
+
+    def inserted(self, offset, text):
+        self._record([INSERT, offset, text])
+
+    def deleted(self, offset, text):
+        self._record([DELETE, offset, text])
+
+    def checkpoint(self):
+        # the next edit starts a new step
+        self.merging = False
+
+    def _record(self, delta):
+        now = self.clock()
+        if self.redo_steps:
+            self.redo_steps = []
+        step = self.undo_steps[-1] if self.undo_steps else None
+        if (step and self.merging and now - self.last_edit < MERGE_PAUSE and
+                '\n' not in delta[2] and self._merge(step[-1], delta)):
+            self.memory += len(delta[2])
+        else:
+            self.undo_steps.append([delta])
+            self.memory += _cost(delta)
+        self.merging = '\n' not in delta[2]
+        self.last_edit = now
+        self._evict()
+
+    def _merge(self, last, delta):
+        op, offset, text = delta
+        if op != last[0]:
+            return False
+        if op == INSERT and offset == last[1] + len(last[2]):
+            last[2] += text
+        elif op == DELETE and offset + len(text) == last[1]:
+            # backspace
+            last[1] = offset
+            last[2] = text + last[2]
+        elif op == DELETE and offset == last[1]:
+            # forward delete
+            last[2] += text
+        else:
+            return False
+        return True
+
+    def _evict(self):
+        while self.memory > self.memory_cap and len(self.undo_steps) > 1:
+            for delta in self.undo_steps.popleft():
+                self.memory -= _cost(delta)
+
+    def undo(self, skrevo):
+        # Reverts the last step; returns the offset to put the cursor at,
+        # or None when there is nothing to undo.
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        cursor = None
+        for op, offset, text in reversed(step):
+            if op == INSERT:
+                skrevo.delete(offset, len(text), record=False)
+                cursor = offset
+            else:
+                skrevo.insert(offset, text, record=False)
+                cursor = offset + len(text)
+        self.redo_steps.append(step)
+        self.merging = False
+        return cursor
+
+    def redo(self, skrevo):
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        cursor = None
+        for op, offset, text in step:
+            if op == INSERT:
+                skrevo.insert(offset, text, record=False)
+                cursor = offset + len(text)
+            else:
+                skrevo.delete(offset, len(text), record=False)
+                cursor = offset
+        self.undo_steps.append(step)
+        self.merging = False
+        return cursor
+
+    def save(self, file_path):
+        # Writes the undo steps next to file_path, which must hold the
+        # current content.
+        out = [None]
+        for step in self.undo_steps:
+            out.append(STEP.pack(len(step)))
+            for op, offset, text in step:
+                data = text.encode('utf-8')
+                out.append(DELTA.pack(op, offset, len(data)))
+                out.append(data)
+        size, mtime = file_stamp(file_path)
+        out[0] = HEADER.pack(MAGIC, size, mtime, len(self.undo_steps), 0)
+        temp_path = file_path + '.undo.tmp'
+        with open(temp_path, 'wb') as undo_file:
+            undo_file.write(b''.join(out))
+        os.replace(temp_path, file_path + '.undo')
+
+    def load(self, file_path):
+        # Loads the undo steps saved for file_path, unless the file changed
+        # since.  Returns the number of steps.
+        try:
+            with open(file_path + '.undo', 'rb') as undo_file:
+                data = undo_file.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) < HEADER.size:
+            return 0
+        magic, size, mtime, steps, _ = HEADER.unpack_from(data)
+        if magic != MAGIC or (size, mtime) != file_stamp(file_path):
+            return 0
+        position = HEADER.size
+        for _ in range(steps):
+            count, = STEP.unpack_from(data, position)
+            position += STEP.size
+            step = []
+            for _ in range(count):
+                op, offset, length = DELTA.unpack_from(data, position)
+                position += DELTA.size
+                step.append([op, offset, data[position:position + length].decode('utf-8')])
+                position += length
+            self.undo_steps.append(step)
+            self.memory += sum(_cost(delta) for delta in step)
+        self._evict()
+        return steps
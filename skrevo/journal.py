@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# coding=utf-8
+import os
+import struct
+import threading
+
+from skrevo.fileio import file_stamp
+
+# Sidecar journal of edits for a content file.
+#
+# Instead of rewriting the whole content file on every autosave, edits are
+# appended to "<content file>.journal" as small insert/delete records, so the
+# cost of an autosave depends on what was typed, not on the document size.
+# Once the journal grows past COMPACT_SIZE the content file is rewritten in
+# the background (see skrevo.saver) and the journal starts over with only
+# the records that came after the written snapshot.  On startup any leftover
+# journal is replayed.
+#
+# The header stores the size and mtime of the content file the records apply
+# to; a journal whose header doesn't match the content file (because it was
+# compacted or changed by someone else) is stale and is discarded.
+
+MAGIC = b'SKJ1'
+HEADER = struct.Struct('<4sQQ')
+RECORD = struct.Struct('<cQI')
+INSERT = b'i'
+DELETE = b'd'
+
+COMPACT_SIZE = 1024 * 1024
+
+
+class Journal:
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.journal_path = file_path + '.journal'
+        self.lock = threading.Lock()
+        # records not encoded yet; the last one may still grow while typing
+        self.pending = []
+        # encoded records since the content file was last written, numbered
+        # from log_start, and how many of them are not in the journal file yet
+        self.log = []
+        self.log_start = 0
+        self.unwritten = 0
+
+    def record_insert(self, offset, text):
+        with self.lock:
+            last = self.pending[-1] if self.pending else None
+            if last and last[0] == INSERT and last[1] + len(last[2]) == offset:
+                # typing continues the previous insert
+                last[2] += text
+            else:
+                self.pending.append([INSERT, offset, text])
+
+    def record_delete(self, offset, length):
+        with self.lock:
+            last = self.pending[-1] if self.pending else None
+            if (last and last[0] == INSERT and length <= len(last[2]) and
+                    offset + length == last[1] + len(last[2])):
+                # backspace over text that never reached the disk
+                last[2] = last[2][:-length]
+                if not last[2]:
+                    self.pending.pop()
+            else:
+                self.pending.append([DELETE, offset, length])
+
+    def replay(self, skrevo):
+        # Applies the records of a leftover journal to skrevo, which must hold
+        # the content file as it is on disk.  Returns the number of records.
+        try:
+            with open(self.journal_path, 'rb') as journal_file:
+                data = journal_file.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) < HEADER.size:
+            return 0
+        magic, size, mtime = HEADER.unpack_from(data)
+        if magic != MAGIC or (size, mtime) != file_stamp(self.file_path):
+            return 0
+
+        count = 0
+        position = HEADER.size
+        while position + RECORD.size <= len(data):
+            op, offset, value = RECORD.unpack_from(data, position)
+            end = position + RECORD.size
+            if op == INSERT:
+                if end + value > len(data):
+                    break  # torn write at the end of the journal
+                skrevo.insert(offset, data[end:end + value].decode('utf-8'))
+                end += value
+            elif op == DELETE:
+                skrevo.delete(offset, value)
+            else:
+                break
+            self.log.append(data[position:end])
+            position = end
+            count += 1
+        return count
+
+    def start(self):
+        # Writes a fresh journal for the content file as it is on disk,
+        # keeping any replayed records (and dropping a torn one).
+        with self.lock:
+            self.pending = []
+            self.unwritten = 0
+            self._write_journal()
+
+    def restart(self):
+        # The buffer was reloaded from the content file: nothing to keep.
+        self.reset()
+        self.rewrite()
+
+    def reset(self):
+        # restart() without writing the journal file; records that come
+        # before rewrite() are kept
+        with self.lock:
+            self.pending = []
+            self.log = []
+            self.log_start = 0
+            self.unwritten = 0
+
+    def rewrite(self):
+        # Writes the journal file again, for the content file as it is now.
+        with self.lock:
+            self._seal()
+            self.unwritten = 0
+            self._write_journal()
+
+    def flush(self):
+        # Appends the pending records to the journal file.
+        with self.lock:
+            self._seal()
+            if not self.unwritten:
+                return
+            data = b''.join(self.log[-self.unwritten:])
+            with open(self.journal_path, 'ab') as journal_file:
+                journal_file.write(data)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self.unwritten = 0
+
+    def mark(self):
+        # Called together with a snapshot of the buffer about to be written;
+        # returns the position of the first record that is not part of it.
+        with self.lock:
+            self._seal()
+            return self.log_start + len(self.log)
+
+    def rebase(self, mark):
+        # The snapshot taken at mark is now the content file: start a new
+        # journal with only the records that came after it.
+        with self.lock:
+            del self.log[:mark - self.log_start]
+            self.log_start = mark
+            self.unwritten = 0
+            self._write_journal()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def needs_compaction(self):
+        return self.size() > COMPACT_SIZE
+
+    def remove(self):
+        try:
+            os.unlink(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    def _seal(self):
+        # Encodes the pending records so that nothing typed later merges
+        # into them.
+        for op, offset, value in self.pending:
+            if op == INSERT:
+                text = value.encode('utf-8')
+                self.log.append(RECORD.pack(INSERT, offset, len(text)) + text)
+            else:
+                self.log.append(RECORD.pack(DELETE, offset, value))
+            self.unwritten += 1
+        self.pending = []
+
+    def _write_journal(self):
+        temp_path = self.journal_path + '.tmp'
+        with open(temp_path, 'wb') as journal_file:
+            journal_file.write(HEADER.pack(MAGIC, *file_stamp(self.file_path)))
+            journal_file.write(b''.join(self.log))
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temp_path, self.journal_path)
@@ -1,11 +1,34 @@
+from types import MappingProxyType
+
+
 class KeyBindings:
-    user_keys = []
-    key_bindings = {}
+    # The bindings of one configuration.  They can't be changed once built:
+    # a reloaded configuration makes a new KeyBindings.
 
     def __init__(self, user_keys):
-        self.user_keys = user_keys
+        self.user_keys = MappingProxyType(dict(user_keys))
+        self.key_bindings = {}
         self.fillWithDefault()
         self.fillWithUserKeys(user_keys)
+        self.key_bindings = MappingProxyType({bind: tuple(keys) for bind, keys in self.key_bindings.items()})
+
+    @classmethod
+    def fromTables(cls, user_keys, key_bindings, key_index):
+        # Bindings already resolved (from a compiled configuration)
+        keyBindings = cls.__new__(cls)
+        keyBindings.user_keys = MappingProxyType(dict(user_keys))
+        keyBindings.key_bindings = MappingProxyType(key_bindings)
+        keyBindings.key_index = MappingProxyType(key_index)
+        return keyBindings
+
+    def buildKeyIndex(self):
+        # key -> actions bound to it, in binding order, so that looking up a
+        # typed key doesn't scan every binding
+        key_index = {}
+        for bind, keys in self.key_bindings.items():
+            for key in keys:
+                key_index[key] = key_index.get(key, ()) + (bind,)
+        self.key_index = MappingProxyType(key_index)
 
     def fillWithUserKeys(self, users_keys):
         for bind in users_keys:
@@ -14,6 +37,7 @@ class KeyBindings:
                 self.key_bindings[bind] = key
             except KeyError:
                 print("KeyBind \"" + bind + "\" not found")
+        self.buildKeyIndex()
 
     def fillWithDefault(self):
         self.key_bindings['toggle-help'] = ['ctrl h']
@@ -44,12 +68,15 @@ class KeyBindings:
         # self.key_bindings['swap-up'] = ['K']
         # self.key_bindings['edit-complete'] = ['tab']
         self.key_bindings['edit-save'] = ['ctrl s']
+        self.key_bindings['undo'] = ['ctrl u']
+        self.key_bindings['redo'] = ['ctrl y']
         self.key_bindings['edit-move-left'] = ['left']
         self.key_bindings['edit-move-right'] = ['right']
         # self.key_bindings['edit-word-left'] = ['meta b', 'ctrl b']
         # self.key_bindings['edit-word-right'] = ['meta f', 'ctrl f']
         self.key_bindings['edit-end'] = ['ctrl e', 'end']
         self.key_bindings['edit-home'] = ['ctrl a', 'home']
+        self.key_bindings['profile-dump'] = ['f12']
         # self.key_bindings['edit-delete-word'] = ['ctrl w']
         # self.key_bindings['edit-delete-end'] = ['ctrl k']
         # self.key_bindings['edit-delete-beginning'] = ['ctrl u']
@@ -57,8 +84,12 @@ class KeyBindings:
         # self.key_bindings['toggle-filter'] = ['f']
         # self.key_bindings['clear-filter'] = ['F']
         # self.key_bindings['toggle-sorting'] = ['s']
-        # self.key_bindings['search'] = ['/']
-        # self.key_bindings['search-end'] = ['enter']
+        self.key_bindings['search'] = ['ctrl f']
+        self.key_bindings['search-end'] = ['enter']
+        self.key_bindings['toggle-stats'] = ['ctrl g']
+        self.key_bindings['next-document'] = ['ctrl n']
+        self.key_bindings['previous-document'] = ['ctrl p']
+        self.key_bindings['open-document'] = ['ctrl o']
         # self.key_bindings['search-clear'] = ['C']
 
     def __getitem__(self, index):
@@ -72,7 +103,10 @@ class KeyBindings:
         try:
             return self.key_bindings[bind]
         except KeyError:
-            return []
+            return ()
+
+    def actions_for(self, key):
+        return self.key_index.get(key, ())
 
     def is_binded_to(self, key, bind):
-        return key in self.getKeyBinding(bind)
\ No newline at end of file
+        return bind in self.key_index.get(key, ())
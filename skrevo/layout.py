@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# coding=utf-8
+from collections import OrderedDict
+
+import urwid
+
+# Layout cache for the line widgets.
+#
+# Laying out a line (finding where it wraps) is the most expensive part of
+# rendering it, and urwid only remembers the layout inside the widget that
+# computed it; line widgets are recreated whenever lines are added, removed or
+# scrolled out of the walker's cache.  This layout is shared by all of them
+# and keeps the most recent results keyed by (text, width, align, wrap).  An
+# edited line has a new text and a resized terminal a new width, so they miss
+# the cache; everything else is laid out once.
+
+LAYOUT_CACHE_SIZE = 4096
+
+
+class CachedLayout(urwid.StandardTextLayout):
+
+    def __init__(self, size=LAYOUT_CACHE_SIZE):
+        super(CachedLayout, self).__init__()
+        self.size = size
+        self.layouts = OrderedDict()
+
+    def layout(self, text, width, align, wrap):
+        key = (text, width, align, wrap)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+        layout = super(CachedLayout, self).layout(text, width, align, wrap)
+        self.layouts[key] = layout
+        if len(self.layouts) > self.size:
+            self.layouts.popitem(last=False)
+        return layout
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# coding=utf-8
+import mmap
+import os
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+# Lazily decoded content files.
+#
+# The file is memory-mapped and cut, in one pass, into blocks of about
+# BLOCK_SIZE bytes ending at line boundaries.  For each block the index keeps
+# its byte offset, its length in characters and its number of newlines (about
+# 20 bytes per 64 KB of file); the blocks become the initial pieces of the
+# buffer.  Text is only decoded when a piece is actually read: ASCII blocks
+# are decoded just for the requested range, other blocks are decoded whole
+# and kept in a small cache.
+#
+# The mapping stays valid when the content file is saved, because saves
+# replace the file with a new one instead of writing into it.  Other
+# programs may write into the file in place: the mapped text then changes
+# under the buffer, and reading past the end of a truncated file kills the
+# process (SIGBUS), so such a file has to be mapped again (see stale()).
+# The crc32 of each block is kept to tell whether a block still holds the
+# text it was mapped with (see holds()).
+
+BLOCK_SIZE = 64 * 1024
+DECODED_BLOCKS = 32
+
+
+class Block:
+    # A stand-in for the str of one block, as far as the buffer is concerned.
+    __slots__ = ('mapped', 'index')
+
+    def __init__(self, mapped, index):
+        self.mapped = mapped
+        self.index = index
+
+    def __len__(self):
+        return self.mapped.chars[self.index]
+
+    def __getitem__(self, key):
+        return self.mapped.read(self.index, key)
+
+    def count(self, sub, start, end):
+        if sub == '\n' and start == 0 and end >= len(self):
+            return self.mapped.newlines[self.index]
+        return self.mapped.read(self.index, slice(start, end)).count(sub)
+
+
+class MappedText:
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.offsets = array('Q')
+        self.chars = array('Q')
+        self.newlines = array('L')
+        self.ascii = bytearray()
+        self.checksums = array('I')
+        self.words = 0
+        self.decoded = OrderedDict()
+        self.lock = threading.Lock()
+        with open(file_path, 'rb') as mapped_file:
+            stat = os.fstat(mapped_file.fileno())
+            self.identity = (stat.st_dev, stat.st_ino)
+            self.stamp = (stat.st_size, stat.st_mtime_ns)
+            size = mapped_file.seek(0, 2)
+            self.data = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._index()
+
+    def _index(self):
+        data = self.data
+        size = len(data)
+        start = 0
+        previous_space = True
+        while start < size:
+            end = min(start + BLOCK_SIZE, size)
+            if end < size:
+                newline = data.rfind(b'\n', start, end)
+                if newline >= start:
+                    end = newline + 1
+                else:
+                    # a very long line: cut it, but not inside a character
+                    while end > start + 1 and data[end] & 0xC0 == 0x80:
+                        end -= 1
+            block = data[start:end]
+            if block.isascii():
+                self.ascii.append(1)
+                self.chars.append(len(block))
+                self.words += len(block.split())
+                first_space = block[:1].isspace()
+                last_space = block[-1:].isspace()
+            else:
+                text = block.decode('utf-8', 'replace')
+                self.ascii.append(0)
+                self.chars.append(len(text))
+                self.words += len(text.split())
+                first_space = text[:1].isspace()
+                last_space = text[-1:].isspace()
+            if not previous_space and not first_space:
+                # the block starts in the middle of the previous block's word
+                self.words -= 1
+            previous_space = last_space
+            self.offsets.append(start)
+            self.newlines.append(block.count(b'\n'))
+            self.checksums.append(zlib.crc32(block))
+            start = end
+        self.offsets.append(size)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def _stat(self):
+        # the file at file_path, if it is still the mapped one
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat if (stat.st_dev, stat.st_ino) == self.identity else None
+
+    def stale(self):
+        # True when the mapped file was written in place since it was mapped
+        stat = self._stat()
+        return stat is not None and (stat.st_size, stat.st_mtime_ns) != self.stamp
+
+    def holds(self, indexes):
+        # True when the given blocks still hold the text they were mapped
+        # with; blocks past the end of a truncated file are not read.
+        stat = self._stat()
+        if stat is None or (stat.st_size, stat.st_mtime_ns) == self.stamp:
+            return True
+        offsets = self.offsets
+        for index in indexes:
+            if offsets[index + 1] > stat.st_size:
+                return False
+            if zlib.crc32(self.data[offsets[index]:offsets[index + 1]]) != self.checksums[index]:
+                return False
+        return True
+
+    def pieces(self):
+        for index in range(len(self)):
+            yield Block(self, index), 0, self.chars[index]
+
+    def read(self, index, key):
+        start = self.offsets[index]
+        if self.ascii[index]:
+            # one byte per character: decode just what was asked for
+            end = self.offsets[index + 1]
+            if isinstance(key, slice):
+                lo, hi, _ = key.indices(end - start)
+                return self.data[start + lo:start + hi].decode('ascii')
+            if key < 0:
+                key += end - start
+            return chr(self.data[start + key])
+        return self._decode(index)[key]
+
+    def _decode(self, index):
+        # snapshots are also read by background saves, hence the lock
+        with self.lock:
+            text = self.decoded.get(index)
+            if text is not None:
+                self.decoded.move_to_end(index)
+                return text
+            text = self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8', 'replace')
+            self.decoded[index] = text
+            if len(self.decoded) > DECODED_BLOCKS:
+                self.decoded.popitem(last=False)
+            return text
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding=utf-8
+import math
+import time
+import weakref
+from array import array
+
+# Opt-in keystroke-to-paint latency profiling.
+#
+# Profiler.attach() wraps, on the instances only, the methods that make up a
+# keystroke: the main loop's input processing, the buffer edits, the header
+# rebuild and the screen redraw.  The edits are wrapped per document, by
+# attach_document(), as the UI shows each one.  Nothing is wrapped unless
+# profiling is enabled, so a normal session pays nothing for it.
+#
+# Times are accumulated per phase until the frame is drawn, then recorded as
+# one sample per phase.  Samples go into log-scale histograms (four buckets
+# per power of two), kept in a ring of WINDOWS histograms of WINDOW_SIZE
+# frames each: memory is fixed and percentiles cover the recent frames.
+
+PHASES = ('input', 'buffer', 'header', 'redraw')
+WINDOWS = 8
+WINDOW_SIZE = 1024
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 30 * BUCKETS_PER_OCTAVE  # 1us up to about 18 minutes
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = array('L', [0]) * BUCKETS
+        self.total = 0
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        bucket = int(math.log2(micros) * BUCKETS_PER_OCTAVE) if micros > 1 else 0
+        self.counts[min(bucket, BUCKETS - 1)] += 1
+        self.total += 1
+
+    def clear(self):
+        self.counts = array('L', [0]) * BUCKETS
+        self.total = 0
+
+
+def bucket_limit(bucket):
+    # upper bound of a bucket, in seconds
+    return 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1e6
+
+
+def percentiles(histograms, fractions):
+    counts = [sum(column) for column in zip(*(h.counts for h in histograms))]
+    total = sum(counts)
+    results = []
+    for fraction in fractions:
+        if not total:
+            results.append(0.0)
+            continue
+        wanted = math.ceil(total * fraction)
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if seen >= wanted:
+                results.append(bucket_limit(bucket))
+                break
+    return results, total
+
+
+class Profiler:
+
+    def __init__(self):
+        self.windows = {phase: [Histogram() for _ in range(WINDOWS)] for phase in PHASES}
+        self.window = 0
+        self.frames = 0
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.had_input = False
+        # the documents whose edits are wrapped
+        self.documents = weakref.WeakSet()
+
+    def attach(self, ui):
+        loop = ui.loop
+        loop.process_input = self._timed(loop.process_input, 'input', input=True)
+        loop.draw_screen = self._timed_frame(loop.draw_screen)
+        ui.update_header = self._timed(ui.update_header, 'header')
+        self.attach_document(ui.skrevo)
+
+    def attach_document(self, skrevo):
+        if skrevo in self.documents:
+            return
+        self.documents.add(skrevo)
+        skrevo.insert = self._timed(skrevo.insert, 'buffer')
+        skrevo.delete = self._timed(skrevo.delete, 'buffer')
+
+    def _timed(self, function, phase, input=False):
+        current = self.current
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                current[phase] += time.perf_counter() - started
+                if input:
+                    self.had_input = True
+        return timed
+
+    def _timed_frame(self, draw_screen):
+        def timed():
+            started = time.perf_counter()
+            try:
+                return draw_screen()
+            finally:
+                self.current['redraw'] += time.perf_counter() - started
+                self._end_frame()
+        return timed
+
+    def _end_frame(self):
+        current = self.current
+        if self.had_input:
+            # buffer and header work happens inside input processing
+            current['input'] = max(0.0, current['input'] - current['buffer'] - current['header'])
+            for phase in PHASES:
+                self.windows[phase][self.window].record(current[phase])
+            self.frames += 1
+            if self.frames % WINDOW_SIZE == 0:
+                self.window = (self.window + 1) % WINDOWS
+                for phase in PHASES:
+                    self.windows[phase][self.window].clear()
+        for phase in PHASES:
+            current[phase] = 0.0
+        self.had_input = False
+
+    def summary(self):
+        # one line for the header
+        (p50, p95, p99), count = self._total_percentiles()
+        return "{0} keys  p50 {1:.1f}ms  p95 {2:.1f}ms  p99 {3:.1f}ms".format(
+            count, p50 * 1e3, p95 * 1e3, p99 * 1e3)
+
+    def report(self):
+        lines = ["skrevo keystroke latency, last {0} keystrokes (ms)".format(
+                     min(self.frames, WINDOWS * WINDOW_SIZE)),
+                 "{0:<8} {1:>8} {2:>8} {3:>8}".format("phase", "p50", "p95", "p99")]
+        for phase in PHASES:
+            (p50, p95, p99), _ = percentiles(self.windows[phase], (0.5, 0.95, 0.99))
+            lines.append("{0:<8} {1:8.2f} {2:8.2f} {3:8.2f}".format(
+                phase, p50 * 1e3, p95 * 1e3, p99 * 1e3))
+        return "\n".join(lines) + "\n"
+
+    def _total_percentiles(self):
+        # The phases of a frame add up; the sum of their percentiles is an
+        # upper bound of the percentile of the sum.
+        totals = [0.0, 0.0, 0.0]
+        count = 0
+        for phase in PHASES:
+            values, count = percentiles(self.windows[phase], (0.5, 0.95, 0.99))
+            totals = [total + value for total, value in zip(totals, values)]
+        return totals, count
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# coding=utf-8
+import asyncio
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+# Recording and headless replay of the input stream.
+#
+# Recorder wraps the main loop's process_input, which every key and mouse
+# event goes through (whether an editor widget or UrwidUI.keystroke ends up
+# handling it), and appends the batches with their timing to a binary log:
+#
+#   header: magic, screen cols and rows, flags (word wrap, toolbar) and the
+#           sha256 of the document when recording started
+#   event:  varint microseconds since the previous event, varint number of
+#           keys, then each key: tag 0 + string, or tag 1 + mouse event
+#           name, button, column and row
+#
+# replay() drives an UrwidUI on a FakeScreen with the same events, against a
+# copy of the content file, and reports throughput and the final document
+# hash, so a session can be re-run, timed and checked without a terminal.
+
+MAGIC = b'SKR1'
+HEADER = struct.Struct('<4sHHB32s')
+WORD_WRAP = 1
+TOOLBAR = 2
+KEY = 0
+MOUSE = 1
+
+
+def document_hash(skrevo):
+    digest = hashlib.sha256()
+    for chunk in skrevo.buffer.chunks():
+        digest.update(chunk.encode('utf-8'))
+    return digest.digest()
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_string(out, text):
+    data = text.encode('utf-8')
+    _write_varint(out, len(data))
+    out += data
+
+
+class _Reader:
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def varint(self):
+        value, shift = 0, 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def string(self):
+        length = self.varint()
+        self.position += length
+        return self.data[self.position - length:self.position].decode('utf-8')
+
+    def done(self):
+        return self.position >= len(self.data)
+
+
+class Recorder:
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.log_file = None
+        self.last = None
+
+    def attach(self, ui):
+        cols, rows = ui.loop.screen.get_cols_rows()
+        flags = (WORD_WRAP if ui.wrapping[0] == 'space' else 0) | (TOOLBAR if ui.toolbar_is_open else 0)
+        self.log_file = open(self.log_path, 'wb')
+        self.log_file.write(HEADER.pack(MAGIC, cols, rows, flags, document_hash(ui.skrevo)))
+        self.last = time.perf_counter()
+
+        process_input = ui.loop.process_input
+
+        def recorded(keys):
+            self.record(keys)
+            return process_input(keys)
+        ui.loop.process_input = recorded
+
+    def record(self, keys):
+        now = time.perf_counter()
+        out = bytearray()
+        _write_varint(out, int((now - self.last) * 1e6))
+        self.last = now
+        _write_varint(out, len(keys))
+        for key in keys:
+            if isinstance(key, str):
+                out.append(KEY)
+                _write_string(out, key)
+            else:
+                event, button, column, row = key
+                out.append(MOUSE)
+                _write_string(out, event)
+                for value in (button, column, row):
+                    _write_varint(out, int(value))
+        self.log_file.write(out)
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+def read_log(log_path):
+    # -> (header fields, [(delay in seconds, keys)])
+    with open(log_path, 'rb') as log_file:
+        data = log_file.read()
+    magic, cols, rows, flags, initial_hash = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("{0} is not a skrevo input log".format(log_path))
+    reader = _Reader(data[HEADER.size:])
+    events = []
+    while not reader.done():
+        delay = reader.varint() / 1e6
+        keys = []
+        for _ in range(reader.varint()):
+            if reader.data[reader.position] == KEY:
+                reader.position += 1
+                keys.append(reader.string())
+            else:
+                reader.position += 1
+                event = reader.string()
+                keys.append((event, reader.varint(), reader.varint(), reader.varint()))
+        events.append((delay, keys))
+    return (cols, rows, flags, initial_hash), events
+
+
+def _settle(ui):
+    # The asyncio loop isn't running during a replay; let the background work
+    # a batch started (saves, reloads) finish before the next one, as it
+    # would have in the recorded session.
+    pending = set(ui.tasks)
+    if ui.skrevo.saver.task is not None:
+        pending.add(ui.skrevo.saver.task)
+    if pending:
+        ui.asyncio_loop.run_until_complete(asyncio.wait(pending))
+
+
+def replay(log_path, content_path, key_bindings, paced=False,
+           undo_memory=16 * 1024 * 1024, persist_undo=False):
+    # Replays the log against a copy of content_path, with the undo history
+    # set up as the editor does (undo_memory, persist_undo); returns a dict
+    # with the event and key counts, the time taken, keys per second and the
+    # sha256 of the final document.
+    import urwid
+    from skrevo.headless import FakeScreen
+    from skrevo.skrevo import Skrevo
+    from skrevo.urwid_ui import UrwidUI
+
+    (cols, rows, flags, initial_hash), events = read_log(log_path)
+    directory = tempfile.mkdtemp(prefix='skrevo-replay-')
+    try:
+        copy_path = os.path.join(directory, os.path.basename(content_path))
+        # with its mtime, which a saved history is checked against
+        shutil.copy2(content_path, copy_path)
+        if persist_undo and os.path.exists(content_path + '.undo'):
+            shutil.copy2(content_path + '.undo', copy_path + '.undo')
+        skrevo = Skrevo('', copy_path)
+        skrevo.load()
+        skrevo.enable_history(undo_memory, persist_undo)
+        # edits are merged into undo steps by the recorded pauses, not by
+        # how fast the replay runs
+        recorded_time = [0.0]
+        skrevo.history.clock = lambda: recorded_time[0]
+        initial_hash_matches = document_hash(skrevo) == initial_hash
+        ui = UrwidUI(skrevo, key_bindings)
+        ui.setup(enable_word_wrap=bool(flags & WORD_WRAP), show_toolbar=bool(flags & TOOLBAR),
+                 screen=FakeScreen(cols, rows))
+        ui.loop.draw_screen()
+
+        keys = 0
+        started = time.perf_counter()
+        due = started
+        try:
+            for delay, batch in events:
+                recorded_time[0] += delay
+                if paced:
+                    due += delay
+                    wait = due - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                ui.loop.process_input(batch)
+                _settle(ui)
+                ui.loop.draw_screen()
+                keys += len(batch)
+        except urwid.ExitMainLoop:
+            pass
+        seconds = time.perf_counter() - started
+        ui.shutdown()
+        return {
+            'events': len(events),
+            'keys': keys,
+            'seconds': seconds,
+            'keys_per_second': keys / seconds if seconds else 0.0,
+            'frames': ui.loop.screen.frames,
+            'initial_hash_matches': initial_hash_matches,
+            'final_hash': document_hash(skrevo).hex(),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding=utf-8
+from skrevo.fileio import file_stamp, local_fs, write_atomically
+
+# Saving of a content file.
+#
+# request() only records a snapshot of the buffer (free, see skrevo.buffer).
+# Once attached to the editor's asyncio loop, the write runs in a coroutine
+# that hands the file I/O to an executor, so the loop never waits for the
+# disk.  Requests that arrive while a write is in progress replace each
+# other, so a burst of saves (ctrl-s spam plus an autosave tick) ends in a
+# single write of the newest snapshot.  When not attached to a loop (before
+# the UI starts, after it stops, in scripts) requests are written at once.
+# Only the file I/O runs in the executor: done() is called on the loop.
+
+
+class Saver:
+
+    def __init__(self, file_path, fs=local_fs):
+        self.file_path = file_path
+        self.fs = fs
+        self.status = ''
+        self.on_status = None
+        self.loop = None
+        self.executor = None
+        self.requested = None
+        self.task = None
+
+    def attach(self, loop, executor=None):
+        self.loop = loop
+        self.executor = executor
+
+    def detach(self):
+        self.wait()
+        self.loop = None
+        self.executor = None
+
+    def request(self, chunks, done=None, written=None):
+        # chunks: callable returning the text to write, piece by piece
+        # done: called with the file's stamp (see file_stamp) once it is on
+        # disk
+        # written: called right after the write, in the executor, for file
+        # I/O that has to follow it
+        self._set_status("Saving")
+        if self.loop is None:
+            status, stamp = self._write(chunks, written)
+            if stamp is not None and done is not None:
+                done(stamp)
+            self._set_status(status)
+            return
+        self.requested = (chunks, done, written)
+        if self.task is None:
+            self.task = self.loop.create_task(self._run())
+
+    async def drain(self):
+        # Waits until every requested save has been written.
+        while self.task is not None:
+            await self.task
+
+    def wait(self):
+        # The blocking version of drain(), for use outside the running loop.
+        if self.task is not None:
+            self.loop.run_until_complete(self.drain())
+
+    async def _run(self):
+        try:
+            status = ''
+            while self.requested is not None:
+                chunks, done, written = self.requested
+                self.requested = None
+                status, stamp = await self.loop.run_in_executor(self.executor, self._write, chunks, written)
+                if stamp is not None and done is not None:
+                    done(stamp)
+            self._set_status(status)
+        finally:
+            self.task = None
+
+    def _write(self, chunks, written):
+        # -> (status, stamp of the written file or None)
+        stamp = None
+        try:
+            write_atomically(self.file_path, chunks(), self.fs)
+            stamp = file_stamp(self.file_path)
+            if written is not None:
+                written()
+        except OSError as error:
+            return "Save failed: {0}".format(error.strerror or error), stamp
+        return "Saved", stamp
+
+    def _set_status(self, status):
+        self.status = status
+        if self.on_status is not None:
+            self.on_status(status)
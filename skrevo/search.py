@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding=utf-8
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime
+
+# Full-text search over everything written.
+#
+# Documents are indexed paragraph by paragraph in an SQLite FTS5 table.  Each
+# save hashes the paragraphs of the saved text and compares them with the
+# ones indexed for that file, so only new paragraphs are added; paragraphs
+# that were deleted or rewritten stay in the index, marked as no longer
+# current, so text from past sessions can still be found.
+#
+#   paragraphs    FTS5 table of paragraph texts
+#   versions      for each paragraph (same rowid): content file, hash, when
+#                 it was first saved and whether the file still has it
+#
+# Paragraphs are separated by blank lines; blocks longer than MAX_PARAGRAPH
+# are cut at line ends, so a file without blank lines is indexed line by
+# line.  The text is read chunk by chunk and never held whole.
+#
+# sqlite3 is imported when the index is first used, after the editor's
+# first paint.
+
+DEFAULT_PATH = '~/.skrevo/search.db'
+MAX_PARAGRAPH = 4000
+RESULTS = 20
+
+# snippets mark the matched terms with these
+MATCH_START = '\x01'
+MATCH_END = '\x02'
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    saved INTEGER NOT NULL,
+    current INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS versions_by_hash ON versions (file, hash);
+"""
+
+QUERY = """
+SELECT v.file, v.saved, v.current, p.text,
+       snippet(paragraphs, 0, ?, ?, '...', 16)
+FROM paragraphs p JOIN versions v ON v.id = p.rowid
+WHERE paragraphs MATCH ? {0}
+ORDER BY bm25(paragraphs), v.current DESC, v.saved DESC
+LIMIT ?
+"""
+
+Result = namedtuple('Result', 'file saved current text snippet')
+
+_BLANK_LINES = re.compile(r'\n[ \t]*\n\s*')
+
+
+def _cut(block):
+    # -> (paragraphs cut from the start of block at line ends while more than
+    # MAX_PARAGRAPH of it is left, the rest of it)
+    cut = []
+    start = 0
+    while len(block) - start > MAX_PARAGRAPH:
+        end = block.rfind('\n', start, start + MAX_PARAGRAPH)
+        end = end + 1 if end > start else start + MAX_PARAGRAPH
+        cut.append(block[start:end])
+        start = end
+    return cut, block[start:]
+
+
+def paragraphs(chunks):
+    # Reads the text given as chunks incrementally: only the block being read
+    # is kept, and it is cut as soon as it is long enough, so the paragraphs
+    # are the same however the text is split into chunks.
+    block = ''
+    fresh = True    # nothing was cut from block yet
+    for chunk in chunks:
+        text = block + chunk
+        if fresh:
+            # the blank lines before a block may continue in this chunk
+            text = text.lstrip()
+        *complete, block = _BLANK_LINES.split(text)
+        if complete:
+            fresh = True
+        for part in complete:
+            cut, rest = _cut(part)
+            yield from _stripped(cut + [rest])
+        # a line end followed by blanks may be the start of blank lines
+        end = block.find('\n', len(block.rstrip()))
+        end = end if end >= 0 else len(block)
+        cut, rest = _cut(block[:end])
+        block = rest + block[end:]
+        if cut:
+            fresh = False
+        yield from _stripped(cut)
+    cut, rest = _cut(block)
+    yield from _stripped(cut + [rest])
+
+
+def _stripped(texts):
+    for text in texts:
+        text = text.strip()
+        if text:
+            yield text
+
+
+def _quoted(query):
+    # the query as plain words, for input that isn't valid FTS5 syntax
+    return ' '.join('"{0}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+class SearchIndex:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = os.path.expanduser(path)
+        # file -> {hash: id} of its current paragraphs, once read
+        self.known = {}
+        # updates come from the saver's executor threads
+        self.lock = threading.Lock()
+        self.error = None
+
+    def _connect(self):
+        import sqlite3
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute('PRAGMA journal_mode = WAL')
+        db.executescript(SCHEMA)
+        return db
+
+    def update(self, file_path, chunks, when=None):
+        # Indexes the text of file_path (given as chunks) as saved now.
+        # Returns (paragraphs added, paragraphs no longer current), or None if
+        # the index couldn't be written (see error).
+        import sqlite3
+        when = time.time_ns() if when is None else when
+        try:
+            # each paragraph is compared as it is read, so only the hashes
+            # of the text are held
+            with self.lock, closing(self._connect()) as db, db:
+                current = self.known.get(file_path)
+                if current is None:
+                    current = dict(db.execute(
+                        'SELECT hash, id FROM versions WHERE file = ? AND current = 1', (file_path,)))
+                known = {}
+                added = 0
+                for paragraph in paragraphs(chunks):
+                    digest = hashlib.blake2b(paragraph.encode('utf-8'), digest_size=16).digest()
+                    if digest in known:
+                        continue
+                    row = current.get(digest)
+                    if row is None:
+                        # a paragraph that comes back (undo, paste) keeps its row
+                        found = db.execute('SELECT id FROM versions WHERE file = ? AND hash = ?',
+                                           (file_path, digest)).fetchone()
+                        if found is not None:
+                            db.execute('UPDATE versions SET current = 1 WHERE id = ?', found)
+                            row = found[0]
+                        else:
+                            row = db.execute('INSERT INTO paragraphs (text) VALUES (?)',
+                                             (paragraph,)).lastrowid
+                            db.execute('INSERT INTO versions (id, file, hash, saved, current) '
+                                       'VALUES (?, ?, ?, ?, 1)', (row, file_path, digest, when))
+                            added += 1
+                    known[digest] = row
+                gone = [(row,) for digest, row in current.items() if digest not in known]
+                db.executemany('UPDATE versions SET current = 0 WHERE id = ?', gone)
+                self.known[file_path] = known
+        except sqlite3.Error as error:
+            self.error = str(error)
+            return None
+        self.error = None
+        return added, len(gone)
+
+    def search(self, query, limit=RESULTS, file_path=None):
+        # -> Results, best first; terms in snippets are between MATCH_START
+        # and MATCH_END
+        import sqlite3
+        if not query.strip() or not os.path.exists(self.path):
+            return []
+        where = 'AND v.file = ?' if file_path is not None else ''
+        sql = QUERY.format(where)
+        with closing(self._connect()) as db:
+            for match in (query, _quoted(query)):
+                arguments = [MATCH_START, MATCH_END, match] + ([file_path] if file_path else []) + [limit]
+                try:
+                    rows = db.execute(sql, arguments).fetchall()
+                    break
+                except sqlite3.OperationalError:
+                    rows = []
+        return [Result(file, datetime.fromtimestamp(saved / 1e9), bool(current), text, snippet)
+                for file, saved, current, text, snippet in rows]
@@ -1,23 +1,313 @@
 #!/usr/bin/env python
 # coding=utf-8
-import re
-import random
-from datetime import date
+from skrevo.buffer import PieceTable
+from skrevo.counters import Counters
+from skrevo.diff import line_changes
+from skrevo.fileio import file_stamp, write_atomically
+from skrevo.history import History
+from skrevo.journal import Journal
+from skrevo.mapped import Block, MappedText
+from skrevo.saver import Saver
+
+# where a document in conflict with its file is written when it is closed
+CONFLICT_SUFFIX = '.conflict'
 
 class Skrevo:
 
     def __init__(self, content, file_path):
-        self.content = content
+        self.buffer = PieceTable()
+        self.counters = Counters()
         self.file_path = file_path
-        self.update(skrevo)
+        self.journal = None
+        self.history = None
+        self.saver = Saver(file_path)
+        self.lazy = False
+        # the skrevo.mapped.MappedText of a lazy load
+        self.mapped = None
+        self.dirty = False
+        # the version of the document that is in the content file, and the
+        # file's (size, mtime) when it was read or written
+        self.disk_snapshot = None
+        self.disk_stamp = None
+        # the file was changed by someone else while we had unsaved edits
+        self.conflict = False
+        # a skrevo.search.SearchIndex for the saved versions, and the version
+        # it was last given
+        self.index = None
+        self.indexed = None
+        # called after each save, on the loop the saver is attached to
+        self.on_saved = None
+        self.update(content)
 
-    def reload_from_file(self):
+    @property
+    def content(self):
+        return str(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def word_count(self):
+        return self.counters.words
+
+    def line_count(self):
+        # a last line without a trailing newline still counts as a line
+        size = len(self.buffer)
+        if size and self.buffer.char_at(size - 1) != '\n':
+            return self.counters.newlines + 1
+        return self.counters.newlines
+
+    def memory_use(self):
+        # Rough bytes held by the document: its text, unless it is mapped
+        # from the file, and its undo history.
+        size = 0 if self.lazy else len(self.buffer)
+        if self.history is not None:
+            size += self.history.memory
+        return size
+
+    def open_journal(self):
+        # Replays edits left over from a session that didn't exit cleanly and
+        # starts journaling new ones.
+        journal = Journal(self.file_path)
+        replayed = journal.replay(self)
+        journal.start()
+        self.journal = journal
+        self.dirty = replayed > 0
+        return replayed
+
+    def close_journal(self):
+        if self.journal is not None:
+            if self.dirty:
+                self.save()
+            self.saver.wait()
+            self.journal.remove()
+            self.journal = None
+
+    def enable_history(self, memory_cap, persist=False):
+        # A saved history applies to the content file as it is, not to edits
+        # a journal replayed on top of it: its offsets would be stale.
+        self.history = History(memory_cap)
+        if persist and not self.modified():
+            self.history.load(self.file_path)
+
+    def save_history(self):
+        # call after the content file was saved
+        if self.history is not None:
+            self.history.save(self.file_path)
+
+    def undo(self):
+        # -> offset for the cursor, or None when there is nothing to undo
+        if self.history is None:
+            return None
+        return self.history.undo(self)
+
+    def redo(self):
+        if self.history is None:
+            return None
+        return self.history.redo(self)
+
+    def load(self, lazy=False):
+        # Reads the content file.  A lazy load maps the file instead and only
+        # decodes the parts that are read, see skrevo.mapped.
+        self.lazy = lazy
+        stamp = file_stamp(self.file_path)
+        if not lazy:
+            self.mapped = None
+            with open(self.file_path, "r") as skrevo_file:
+                self.update(skrevo_file.read())
+        else:
+            mapped = self.mapped = MappedText(self.file_path)
+            self.buffer.load(mapped.pieces())
+            self.counters.words = mapped.words
+            self.counters.newlines = sum(mapped.newlines)
+            self._forget_history()
+        self._on_disk(self.buffer.snapshot(), stamp)
+
+    def _on_disk(self, snapshot, stamp):
+        self.disk_snapshot = snapshot
+        self.disk_stamp = stamp
+        self.conflict = False
+
+    def modified(self):
+        # True when the document differs from the content file
+        return self.buffer.snapshot() is not self.disk_snapshot
+
+    def changed_on_disk(self):
+        return file_stamp(self.file_path) != self.disk_stamp
+
+    def check_conflict(self):
+        # Catches a change to the file under unsaved edits that wasn't
+        # noticed (yet) by a watcher; -> whether the document is in conflict
+        if self.modified() and self.changed_on_disk():
+            self.conflict = True
+        return self.conflict
+
+    def readable(self):
+        # False when part of the document's text is mapped from a file that
+        # another program wrote into: reading it gives their text, or kills
+        # the process past the end of a truncated file
+        if self.mapped is None:
+            return True
+        return self.mapped.holds({text.index for text, _, _ in self.buffer.pieces() if isinstance(text, Block)})
+
+    def mapping_stale(self):
+        # True when another program wrote into the mapped content file: the
+        # document can't be compared with it, see remap()
+        return self.mapped is not None and self.mapped.stale()
+
+    def remap(self):
+        # Maps the content file again after it was written in place.  Unsaved
+        # edits are written to a copy if the document can still be read (see
+        # readable()); otherwise they are lost.  -> the copy's path, or None.
+        # Runs in the executor, so it can't wait for saves: drain the saver
+        # first.
+        copy_path = None
+        if self.modified() and self.readable():
+            copy_path = self.save_copy()
+        self._reread()
+        return copy_path
+
+    def read_changes(self, snapshot):
+        # Reads the content file and compares it with snapshot; safe to call
+        # off the event loop.  -> (stamp of what was read, changes), see
+        # skrevo.diff
+        stamp = file_stamp(self.file_path)
         with open(self.file_path, "r") as skrevo_file:
-            self.update(skrevo_file.readlines())
+            text = skrevo_file.read()
+        return stamp, line_changes(''.join(self.buffer.chunks(snapshot=snapshot)), text)
+
+    def apply_changes(self, changes, stamp):
+        # Brings the document to the version of the file read_changes was
+        # given; the changes are recorded in the history, so they can be
+        # undone.  The journal starts over, but its file is only written by
+        # Journal.rewrite(), which belongs off the event loop.
+        for change in changes:
+            self.delete(change.start, change.end - change.start)
+            self.insert(change.start, change.text)
+        self._on_disk(self.buffer.snapshot(), stamp)
+        if self.journal is not None:
+            self.journal.reset()
+        self.dirty = False
+
+    def find(self, text, snapshot=None):
+        # Offset of the first occurrence of text, or -1; reads the document
+        # chunk by chunk, so it can run in the executor on a snapshot.
+        offset = 0
+        tail = ''
+        for chunk in self.buffer.chunks(snapshot=snapshot):
+            window = tail + chunk
+            found = window.find(text)
+            if found >= 0:
+                return offset - len(tail) + found
+            tail = window[-(len(text) - 1):] if len(text) > 1 else ''
+            offset += len(chunk)
+        return -1
+
+    def line_range(self, line):
+        # (start, end) offsets of `line`, without its newline
+        start = self.buffer.line_start(line)
+        if line < self.buffer.newlines():
+            return start, self.buffer.line_start(line + 1) - 1
+        return start, len(self.buffer)
+
+    def line(self, line):
+        return self.buffer.slice(*self.line_range(line))
+
+    def reload_from_file(self):
+        self.saver.wait()
+        self._reread()
+
+    def _reread(self):
+        self.load(self.lazy)
+        if self.journal is not None:
+            self.journal.restart()
+        self.dirty = False
+
+    def request_save(self, overwrite=False):
+        # Hands a snapshot of the buffer to the saver, which writes it in the
+        # background while the UI runs; see skrevo.saver.  A file that
+        # already holds the document isn't rewritten, and one that changed
+        # under unsaved edits only when overwrite is set (the user chose to
+        # keep their version).
+        if self.conflict and not overwrite:
+            return
+        self.dirty = False
+        self.conflict = False
+        if not self.modified():
+            return
+        snapshot = self.buffer.snapshot()
+        mark = self.journal.mark() if self.journal is not None else None
+        journal = self.journal
+
+        def done(stamp):
+            self._on_disk(snapshot, stamp)
+            if self.on_saved is not None:
+                self.on_saved()
+        # the journal is locked for use from the executor, where its file is
+        # rewritten
+        rebase = (lambda: journal.rebase(mark)) if journal is not None else None
+        self.saver.request(lambda: self.buffer.chunks(snapshot=snapshot), done, rebase)
+
+    def save(self, overwrite=False):
+        self.request_save(overwrite)
+        self.saver.wait()
+
+    def update_index(self, snapshot=None):
+        # Indexes a saved version, the one on disk by default; reads it chunk
+        # by chunk, so it can run in the executor.
+        snapshot = self.disk_snapshot if snapshot is None else snapshot
+        if self.index is None or snapshot is self.indexed:
+            return
+        self.index.update(self.file_path, self.buffer.chunks(snapshot=snapshot))
+        self.indexed = snapshot
+
+    def save_copy(self):
+        # Writes the document next to the content file, for when it can't be
+        # written over the file; -> the copy's path
+        copy_path = self.file_path + CONFLICT_SUFFIX
+        write_atomically(copy_path, self.buffer.chunks())
+        return copy_path
 
-    def save(self):
-        with open(self.file_path, "w") as skrevo_file:
-            skrevo_file.write(self.content + '\n')
-    
     def update(self, skrevo_content):
-        self.content = skrevo_content
+        if not isinstance(skrevo_content, str):
+            skrevo_content = ''.join(skrevo_content)
+        self.buffer.replace(skrevo_content)
+        self.counters.reset(self.buffer.chunks())
+        self._forget_history()
+
+    def _forget_history(self):
+        # the old deltas don't apply to replaced content
+        if self.history is not None:
+            self.history = History(self.history.memory_cap, self.history.clock)
+
+    def insert(self, offset, text, record=True):
+        if not text:
+            return
+        offset = max(0, min(offset, len(self.buffer)))
+        previous = self.buffer.char_at(offset - 1) if offset else ''
+        following = self.buffer.char_at(offset)
+        self.buffer.insert(offset, text)
+        self.counters.inserted(previous, text, following)
+        if self.journal is not None:
+            self.journal.record_insert(offset, text)
+        if record and self.history is not None:
+            self.history.inserted(offset, text)
+        self.dirty = True
+
+    def delete(self, offset, length, record=True):
+        offset = max(0, offset)
+        length = min(length, len(self.buffer) - offset)
+        if length <= 0:
+            return
+        previous = self.buffer.char_at(offset - 1) if offset else ''
+        following = self.buffer.char_at(offset + length)
+        removed = self.buffer.slice(offset, offset + length)
+        self.buffer.delete(offset, length)
+        self.counters.deleted(previous, removed, following)
+        if self.journal is not None:
+            self.journal.record_delete(offset, length)
+        if record and self.history is not None:
+            self.history.deleted(offset, removed)
+        self.dirty = True
+
+    def slice(self, start, end=None):
+        return self.buffer.slice(start, end)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# coding=utf-8
+import mmap
+import os
+import re
+import struct
+import time
+from collections import OrderedDict
+
+from skrevo.fileio import file_stamp
+
+# Spell checking.
+#
+# The word list is compiled once into a DAWG (a trie whose identical
+# suffixes are shared, built with Daciuk's incremental algorithm from the
+# sorted words) and written to a flat binary file that is memory-mapped.
+# Loading a cached dictionary is just mapping the file: pages are read as
+# lookups touch them, and nothing is kept in Python objects.  The cache is
+# rebuilt when the word list's size or mtime changes.
+#
+# Layout of the cache file:
+#
+#   header      magic, word list size and mtime, offset of the root node
+#   nodes       edge count, then the edges sorted by character: code point,
+#               and offset of the target node shifted left by one, with the
+#               low bit set when a word ends there
+#
+# Lines are checked as a whole and their results are kept by text, so a line
+# is only checked again once its text changes, wherever it moves.
+
+DEFAULT_WORD_LIST = '/usr/share/dict/words'
+DEFAULT_CACHE = '~/.skrevo/dictionary.dawg'
+
+MAGIC = b'SKD1'
+HEADER = struct.Struct('<4sQQI')
+COUNT = struct.Struct('<I')
+EDGE = struct.Struct('<II')
+
+WORD = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+CHECKED_LINES = 4096
+MISSPELLED = 'misspelled'
+
+
+class _State:
+    __slots__ = ('edges', 'final')
+
+    def __init__(self):
+        self.edges = {}
+        self.final = False
+
+
+def _common_prefix(a, b):
+    size = min(len(a), len(b))
+    for i in range(size):
+        if a[i] != b[i]:
+            return i
+    return size
+
+
+def build_dawg(words):
+    # Compiles the words into the cache file format (bytes, without the
+    # header), returning (data, root offset relative to the data).
+    register = {}
+    root = _State()
+    # states of the last word that may still be merged with registered ones
+    unchecked = []
+    previous = ''
+
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, char, child = unchecked.pop()
+            key = (child.final, tuple((c, id(state)) for c, state in sorted(child.edges.items())))
+            same = register.get(key)
+            if same is not None:
+                parent.edges[char] = same
+            else:
+                register[key] = child
+
+    for word in sorted(set(words)):
+        common = _common_prefix(previous, word)
+        minimize(common)
+        state = unchecked[-1][2] if unchecked else root
+        for char in word[common:]:
+            child = _State()
+            state.edges[char] = child
+            unchecked.append((state, char, child))
+            state = child
+        state.final = True
+        previous = word
+    minimize(0)
+
+    # lay the states out children first, so every offset is known when the
+    # edges pointing to it are written
+    offsets = {}
+    out = []
+    size = 0
+    stack = [(root, False)]
+    while stack:
+        state, expanded = stack.pop()
+        if id(state) in offsets:
+            continue
+        if not expanded:
+            stack.append((state, True))
+            stack.extend((child, False) for child in state.edges.values()
+                         if id(child) not in offsets)
+            continue
+        edges = sorted(state.edges.items())
+        out.append(COUNT.pack(len(edges)))
+        for char, child in edges:
+            out.append(EDGE.pack(ord(char), offsets[id(child)] << 1 | child.final))
+        offsets[id(state)] = size
+        size += COUNT.size + EDGE.size * len(edges)
+    return b''.join(out), offsets[id(root)]
+
+
+class Dictionary:
+
+    def __init__(self, path):
+        with open(path, 'rb') as dictionary_file:
+            self.data = mmap.mmap(dictionary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.source_size, self.source_mtime, self.root = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError("{0} is not a skrevo dictionary".format(path))
+
+    def __contains__(self, word):
+        data = self.data
+        node = self.root
+        final = False
+        for char in word:
+            code = ord(char)
+            count, = COUNT.unpack_from(data, node)
+            low, high = 0, count
+            first = node + COUNT.size
+            while low < high:
+                middle = (low + high) // 2
+                edge_char, _ = EDGE.unpack_from(data, first + middle * EDGE.size)
+                if edge_char < code:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low == count:
+                return False
+            edge_char, target = EDGE.unpack_from(data, first + low * EDGE.size)
+            if edge_char != code:
+                return False
+            node = HEADER.size + (target >> 1)
+            final = target & 1
+        return bool(final)
+
+    def close(self):
+        self.data.close()
+
+
+def compile_dictionary(word_list, cache_path):
+    # Builds the cache file for the word list (one word per line).
+    with open(word_list, encoding='utf-8', errors='replace') as words_file:
+        words = [line.strip() for line in words_file]
+    data, root = build_dawg(word for word in words if word)
+    size, mtime = file_stamp(word_list)
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        cache_file.write(HEADER.pack(MAGIC, size, mtime, HEADER.size + root))
+        cache_file.write(data)
+    os.replace(temp_path, cache_path)
+
+
+def load_dictionary(word_list=DEFAULT_WORD_LIST, cache_path=DEFAULT_CACHE):
+    # Maps the compiled word list, compiling it first if the cache is
+    # missing or older than the word list.
+    cache_path = os.path.expanduser(cache_path)
+    try:
+        dictionary = Dictionary(cache_path)
+        if (dictionary.source_size, dictionary.source_mtime) == file_stamp(word_list):
+            return dictionary
+        dictionary.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    compile_dictionary(word_list, cache_path)
+    return Dictionary(cache_path)
+
+
+class SpellChecker:
+
+    def __init__(self, dictionary, on_pending=None):
+        self.dictionary = dictionary
+        # line text -> urwid attributes marking its misspelled words
+        self.checked = OrderedDict()
+        self.pending = OrderedDict()
+        # called when a line is waiting to be checked
+        self.on_pending = on_pending
+
+    def known(self, word):
+        word = word.replace('’', "'")
+        dictionary = self.dictionary
+        return word in dictionary or (not word.islower() and word.lower() in dictionary)
+
+    def misspelled(self, text):
+        # -> (start, end) of the words of text that aren't in the dictionary
+        return [match.span() for match in WORD.finditer(text) if not self.known(match.group())]
+
+    def marks(self, text):
+        # Attributes for the text if it has been checked; otherwise it is
+        # queued and None is returned.
+        marks = self.checked.get(text)
+        if marks is None:
+            if text not in self.pending:
+                self.pending[text] = None
+                if self.on_pending is not None:
+                    self.on_pending()
+            return None
+        self.checked.move_to_end(text)
+        return marks
+
+    def check_pending(self, budget=None):
+        # Checks queued lines, for at most budget seconds; returns whether
+        # any are left.
+        deadline = None if budget is None else time.perf_counter() + budget
+        while self.pending:
+            text, _ = self.pending.popitem(last=False)
+            marks = []
+            position = 0
+            for start, end in self.misspelled(text):
+                if start > position:
+                    marks.append((None, start - position))
+                marks.append((MISSPELLED, end - start))
+                position = end
+            self.checked[text] = marks
+            if len(self.checked) > CHECKED_LINES:
+                self.checked.popitem(last=False)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        return bool(self.pending)
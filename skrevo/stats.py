@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# coding=utf-8
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from skrevo.archive import split_chunks
+from skrevo.fileio import file_stamp
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Writing statistics: words per day, vocabulary growth, most frequent terms
+# and average sentence length, over the content file and the archived
+# sessions.
+#
+# Text is counted in the content-defined chunks of skrevo.archive, and the
+# counts of each chunk are cached by its sha256 in an append-only file.  A
+# chunk is only ever counted once: sessions that continue the same text, and
+# the content file, share all but the chunks around their changes, so a run
+# only counts the text that is new since the last one.  The chunks of the
+# content file are kept next to it in "<content file>.stats", valid for as
+# long as the file's size and mtime don't change.
+#
+# Cache file: records of digest, word count, sentence count, number of
+# distinct terms and size of the terms, then a uint32 count per term and the
+# terms, utf-8, separated by newlines.  A record torn by a crash is dropped
+# when the cache is read.
+#
+# When more than PARALLEL_BYTES of text has to be counted, it is counted in
+# a process pool, in batches of BATCH_BYTES so that memory stays bounded.
+
+DEFAULT_CACHE = '~/.skrevo/stats.cache'
+
+TERM = re.compile(r"\w+(?:['’]\w+)*")
+SENTENCE_END = re.compile(r'[.!?…]+(?=["”’)\]]*(?:\s|$))')
+# shorter words are mostly articles and prepositions
+MIN_TERM_LENGTH = 4
+TOP_TERMS = 20
+
+PARALLEL_BYTES = 8 * 1024 * 1024
+BATCH_BYTES = 64 * 1024 * 1024
+
+RECORD = struct.Struct('<32sIIII')
+MAGIC = b'SKS1'
+SIDECAR = struct.Struct('<4sQQI')
+DIGEST_SIZE = 32
+
+ChunkStats = namedtuple('ChunkStats', 'words sentences terms')
+Day = namedtuple('Day', 'date words total vocabulary')
+Report = namedtuple('Report', 'days words sentences top_terms')
+
+
+def count_chunk(data):
+    # bytes -> ChunkStats; run in worker processes for big inputs
+    text = data.decode('utf-8', 'replace')
+    return ChunkStats(len(text.split()),
+                      len(SENTENCE_END.findall(text)),
+                      Counter(TERM.findall(text.lower())))
+
+
+class StatsCache:
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = os.path.expanduser(path)
+        self.chunks = {}
+        self.end = 0
+
+    def load(self):
+        # Reads the records added since the last load.
+        try:
+            with open(self.path, 'rb') as cache_file:
+                cache_file.seek(self.end)
+                data = cache_file.read()
+        except FileNotFoundError:
+            return
+        position = 0
+        while position + RECORD.size <= len(data):
+            digest, words, sentences, count, size = RECORD.unpack_from(data, position)
+            start = position + RECORD.size
+            end = start + 4 * count + size
+            if end > len(data):
+                break
+            counts = array('I', data[start:start + 4 * count])
+            terms = data[start + 4 * count:end].decode('utf-8').split('\n') if count else []
+            self.chunks[digest] = ChunkStats(words, sentences, dict(zip(terms, counts)))
+            position = end
+        self.end += position
+
+    def add(self, counted):
+        # Appends the (digest, ChunkStats) pairs.
+        records = []
+        for digest, stats in counted:
+            self.chunks[digest] = stats
+            terms = '\n'.join(stats.terms).encode('utf-8')
+            records.append(RECORD.pack(digest, stats.words, stats.sentences, len(stats.terms), len(terms)))
+            records.append(array('I', stats.terms.values()).tobytes())
+            records.append(terms)
+        if not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as cache_file:
+            if fcntl is not None:
+                fcntl.flock(cache_file, fcntl.LOCK_EX)
+            size = cache_file.seek(0, 2)
+            if size > self.end:
+                # another run added records, maybe ending with a torn one
+                self.load()
+                if size > self.end:
+                    cache_file.truncate(self.end)
+            cache_file.write(b''.join(records))
+            self.end = cache_file.tell()
+
+
+def file_chunks(file_path):
+    # Yields (digest, bytes) of the content-defined chunks of a file.
+    with open(file_path, 'rb') as content_file:
+        if os.fstat(content_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(content_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for chunk in split_chunks(data):
+                yield hashlib.sha256(chunk).digest(), chunk
+
+
+def _read_sidecar(file_path):
+    # digests of the file's chunks, if it didn't change since they were saved
+    try:
+        with open(file_path + '.stats', 'rb') as sidecar:
+            data = sidecar.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < SIDECAR.size:
+        return None
+    magic, size, mtime, count = SIDECAR.unpack_from(data)
+    if magic != MAGIC or (size, mtime) != file_stamp(file_path):
+        return None
+    return [data[SIDECAR.size + i * DIGEST_SIZE:SIDECAR.size + (i + 1) * DIGEST_SIZE]
+            for i in range(count)]
+
+
+def _write_sidecar(file_path, stamp, digests):
+    temp_path = file_path + '.stats.tmp'
+    with open(temp_path, 'wb') as sidecar:
+        sidecar.write(SIDECAR.pack(MAGIC, stamp[0], stamp[1], len(digests)) + b''.join(digests))
+    os.replace(temp_path, file_path + '.stats')
+
+
+class Statistics:
+
+    def __init__(self, cache_path=DEFAULT_CACHE, workers=None):
+        self.cache = StatsCache(cache_path)
+        self.workers = workers
+        # reports may be asked for from the UI's executor threads
+        self.lock = threading.Lock()
+
+    def report(self, file_path, archive=None):
+        with self.lock:
+            return self._report(file_path, archive)
+
+    def _report(self, file_path, archive):
+        self.cache.load()
+        known = self.cache.chunks
+        # (time, digests) of every version of the text, oldest first
+        versions = []
+        if archive is not None:
+            missing = {}
+            for name in archive.sessions():
+                when = archive.session_info(name)[0]
+                digests = archive.session_chunks(name)
+                versions.append((when, digests))
+                missing.update((digest, None) for digest in digests if digest not in known)
+            self._count(archive.read_chunks(list(missing)))
+        stamp = file_stamp(file_path)
+        digests = _read_sidecar(file_path)
+        if digests is None or any(digest not in known for digest in digests):
+            digests = []
+
+            def new_chunks():
+                for digest, chunk in file_chunks(file_path):
+                    digests.append(digest)
+                    if digest not in known:
+                        yield digest, chunk
+            self._count(new_chunks())
+            try:
+                _write_sidecar(file_path, stamp, digests)
+            except OSError:
+                pass
+        if not versions or versions[-1][1] != digests:
+            versions.append((datetime.fromtimestamp(stamp[1] / 1e9), digests))
+        return self._summarize(versions, digests)
+
+    def _count(self, chunks):
+        # Counts the (digest, bytes) chunks and caches the counts.
+        batch = []
+        size = 0
+        for digest, chunk in chunks:
+            batch.append((digest, chunk))
+            size += len(chunk)
+            if size >= BATCH_BYTES:
+                self._count_batch(batch, size)
+                batch = []
+                size = 0
+        self._count_batch(batch, size)
+
+    def _count_batch(self, batch, size):
+        if not batch:
+            return
+        digests = [digest for digest, _ in batch]
+        data = [chunk for _, chunk in batch]
+        if size < PARALLEL_BYTES or self.workers == 1:
+            counted = map(count_chunk, data)
+        else:
+            with ProcessPoolExecutor(self.workers) as pool:
+                counted = list(pool.map(count_chunk, data, chunksize=16))
+        self.cache.add(zip(digests, counted))
+
+    def _summarize(self, versions, current):
+        chunks = self.cache.chunks
+        days = []
+        vocabulary = set()
+        seen = set()
+        total = 0
+        for when, digests in versions:
+            for digest in digests:
+                if digest not in seen:
+                    seen.add(digest)
+                    vocabulary.update(chunks[digest].terms)
+            words = sum(chunks[digest].words for digest in digests)
+            day = when.date()
+            if days and days[-1].date == day:
+                previous = days.pop()
+                written = previous.words + words - previous.total
+            else:
+                written = words - total
+            days.append(Day(day, written, words, len(vocabulary)))
+            total = words
+        terms = Counter()
+        words = sentences = 0
+        for digest in current:
+            stats = chunks[digest]
+            terms.update(stats.terms)
+            words += stats.words
+            sentences += stats.sentences
+        top = [(term, count) for term, count in terms.most_common()
+               if len(term) >= MIN_TERM_LENGTH][:TOP_TERMS]
+        return Report(days, words, sentences, top)
+
+
+def format_report(report, days=14):
+    # -> lines of text
+    lines = ["Words per day", ""]
+    for day in report.days[-days:]:
+        lines.append("  {0}  {1:>+8,} words  {2:>10,} total  {3:>8,} distinct".format(
+            day.date, day.words, day.total, day.vocabulary))
+    lines += ["", "Average sentence length: {0:.1f} words".format(
+        report.words / report.sentences if report.sentences else report.words), ""]
+    lines.append("Most frequent terms")
+    lines.append("")
+    for term, count in report.top_terms:
+        lines.append("  {0:<24} {1:>8,}".format(term, count))
+    return lines
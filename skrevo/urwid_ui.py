@@ -1,29 +1,121 @@
 #!/usr/bin/env python
 # coding=utf-8
 
-import urwid
+import asyncio
 import collections
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import urwid
+
+from skrevo.documents import Documents
+from skrevo.frames import FRAME_BUDGET, FrameScheduler
+from skrevo.layout import CachedLayout
+
+AUTOSAVE_INTERVAL = 30.0
+# lines are spell checked once typing pauses for this long, in slices of
+# at most SPELL_CHECK_BUDGET seconds
+SPELL_CHECK_DELAY = 0.15
+SPELL_CHECK_BUDGET = 0.005
+
+# Terminals send a paste between these keys when asked to (bracketed paste);
+# only characters, enter and tab are kept from it.
+BRACKETED_PASTE_ON = '\x1b[?2004h'
+BRACKETED_PASTE_OFF = '\x1b[?2004l'
+PASTED_KEYS = {'enter': '\n', 'tab': '\t'}
 
 # Modified from http://wiki.goffi.org/wiki/Urwid-satext/en
 
 class UrwidUI:
 
-    def __init__(self, skrevo):
+    def __init__(self, skrevo, key_bindings):
         self.wrapping = collections.deque(['clip', 'space'])
         self.border = collections.deque(['no border', 'bordered'])
 
+        # the document shown; others may be open in self.documents
         self.skrevo = skrevo
-        # self.key_bindings = key_bindings
+        self.documents = Documents()
+        self.documents.add(skrevo.file_path, skrevo)
+        self.key_bindings = key_bindings
 
         # self.colorscheme = colorscheme
         # self.palette = [(key, '', '', '', value['fg'], value['bg']) for key, value in self.colorscheme.colors.items()]
+        self.palette = [
+            ('header', 'white', 'dark blue'),
+            ('header_word_count', 'yellow', 'dark blue'),
+            ('header_char_count', 'light cyan', 'dark blue'),
+            ('header_line_count', 'light green', 'dark blue'),
+            ('header_file', 'white,bold', 'dark blue'),
+            ('plain', 'default', 'default'),
+            ('plain_selected', 'black', 'light gray'),
+            ('help', 'light gray', 'dark gray'),
+            ('search_match', 'yellow,bold', 'dark gray'),
+            ('search_selected', 'black', 'light gray'),
+            ('misspelled', 'light red,underline', 'default'),
+        ]
 
         self.toolbar_is_open = False
         self.help_panel_is_open = False
+        self.search_panel = None
+        self.stats_panel = None
+        # a skrevo.spell.SpellChecker once the dictionary is loaded
+        self.spelling = None
+        self.spelling_wanted = asyncio.Event()
+        # skrevo.stats.Statistics over the content file and the Archive, made
+        # by open_statistics (None when they are turned off) the first time
+        # the panel is opened: statistics import multiprocessing
+        self.open_statistics = None
+        self.statistics = None
+        self.archive = None
+        self.deferred = []
+        # shared by the line widgets; None lets each widget lay itself out
+        self.layout = CachedLayout()
+        self.frame_budget = FRAME_BUDGET
+        self.frames = None
+        self.pasting = None
+        self.bracketed_paste = False
+        self.profiler = None
+        self.recorder = None
+
+        # Everything runs on one asyncio loop: input, redraws and background
+        # tasks (autosave, saves).  Blocking file I/O goes to the executor,
+        # shared by all the open documents.
+        self.asyncio_loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='skrevo-io')
+        self.tasks = set()
+        # serializes reloads and the handling of external changes
+        self.file_lock = asyncio.Lock()
+        # documents being indexed -> whether they were saved again meanwhile
+        self.indexing = {}
+        # path -> FileWatcher of every open document, once watching starts
+        self.watchers = {}
+        self.watching = False
+        self.config_watcher = None
+
+        # action name -> handler, for keys that reach unhandled input
+        self.handlers = {
+            'quit': self.quit,
+            'top': self.move_selection_top,
+            'bottom': self.move_selection_bottom,
+            'change-focus': self.change_focus,
+            'toggle-help': self.toggle_help_panel,
+            'toggle-toolbar': self.toggle_toolbar,
+            'toggle-wrapping': self.toggle_wrapping,
+            'toggle-borders': self.toggle_border,
+            'save': self.save_skrevo,
+            'edit-save': self.save_skrevo,
+            'reload': self.reload_skrevo_from_file,
+            'undo': self.undo,
+            'redo': self.redo,
+            'search': self.toggle_search_panel,
+            'toggle-stats': self.toggle_stats_panel,
+            'next-document': self.next_document,
+            'previous-document': self.previous_document,
+            'open-document': self.prompt_open,
+        }
         # self.filter_panel_is_open = False
         # self.filtering = False
-        # self.searching = False
-        # self.search_string = ''
         # self.yanked_text = ''
 
     def visible_lines(self):
@@ -46,36 +138,257 @@ class UrwidUI:
     def move_selection_bottom(self):
         self.listbox.set_focus(len(self.listbox.body) - 1)
 
+    def focus_line(self, line, column):
+        # Through the walker: after ListBox.set_focus the next render would
+        # move the cursor to the list box's preferred column, losing column.
+        listbox = self.listbox
+        listbox.set_focus_pending = None
+        listbox.body.set_focus(line)
+        listbox.body.get_focus()[0].edit.set_edit_pos(column)
+        listbox.pref_col = column
+
+    def next_document(self):
+        self.switch_document(1)
+
+    def previous_document(self):
+        self.switch_document(-1)
+
+    def switch_document(self, step):
+        paths = self.documents.paths
+        if len(paths) < 2:
+            self.update_header("No other document open")
+            return
+        position = paths.index(self.skrevo.file_path)
+        self.start_task(self.show_document(paths[(position + step) % len(paths)]))
+
+    def prompt_open(self):
+        self.frame.footer = OpenPrompt(self)
+        self.frame.focus_position = 'footer'
+
+    def open_path(self, path):
+        self.frame.footer = self.create_footer()
+        self.frame.focus_position = 'body'
+        if path:
+            path = os.path.realpath(os.path.expanduser(path))
+            self.documents.add(path)
+            self.start_task(self.show_document(path))
+
+    async def show_document(self, path):
+        # Shows the document at path, opening it in the executor if it isn't
+        # open, then evicts the documents over the memory cap.
+        documents = self.documents
+        async with self.file_lock:
+            skrevo = documents.get(path)
+            if skrevo is None:
+                self.update_header("Opening")
+                try:
+                    skrevo = await self.asyncio_loop.run_in_executor(self.executor, documents.opener, path)
+                except OSError as error:
+                    documents.paths.remove(path)
+                    self.update_header("Can't open {0}: {1}".format(path, error.strerror or error))
+                    return
+                documents.opened(path, skrevo)
+                if self.watching:
+                    self.watch(skrevo)
+            self.show(skrevo)
+            for evicted_path, evicted in documents.to_evict(skrevo):
+                self.unwatch(evicted_path)
+                await self.close_document(evicted)
+                documents.evicted(evicted_path)
+        if skrevo.changed_on_disk():
+            self.start_task(self.file_changed(skrevo))
+
+    def show(self, skrevo):
+        if skrevo is self.skrevo:
+            return
+        walker = self.listbox.body
+        self.documents.cursors[self.skrevo.file_path] = (walker.focus, walker.get_focus()[0].edit.edit_pos)
+        self.skrevo.saver.on_status = None
+        self.skrevo = skrevo
+        self.attach_document(skrevo)
+        self.listbox = ViListBox(self.key_bindings, SkrevoWalker(self))
+        self.frame.body = urwid.AttrMap(self.listbox, 'plain')
+        line, column = self.documents.cursors.get(skrevo.file_path, (0, 0))
+        self.focus_line(min(line, len(self.listbox.body) - 1), column)
+        self.update_header()
+
+    def attach_document(self, skrevo):
+        skrevo.saver.attach(self.asyncio_loop, self.executor)
+        skrevo.saver.on_status = self.update_header
+        skrevo.on_saved = lambda: self.index_saved(skrevo)
+        if self.profiler is not None:
+            self.profiler.attach_document(skrevo)
+
+    async def close_document(self, skrevo):
+        # Saves an open document that isn't shown and lets it go.
+        skrevo.request_save()
+        await skrevo.saver.drain()
+        skrevo.saver.on_status = None
+        skrevo.on_saved = None
+        skrevo.saver.detach()
+        warning = await self.asyncio_loop.run_in_executor(self.executor, self.documents.closer, skrevo)
+        if warning:
+            self.update_header(warning)
+
+    def open_panel(self, panel):
+        self.view.contents.append((panel, self.view.options(width_type='weight', width_amount=3)))
+        self.view.set_focus(len(self.view.contents) - 1)
+
+    def close_panel(self, panel):
+        for position, (widget, _) in enumerate(self.view.contents):
+            if widget is panel:
+                del self.view.contents[position]
+                break
+        self.view.focus_position = 0
+
     def toggle_help_panel(self, button=None):
         if self.help_panel_is_open:
-            self.view.contents.pop()
+            self.close_panel(self.help_panel)
             self.help_panel_is_open = False
             # set header line to word-wrap contents
             # for header_column in self.frame.header.original_widget.contents:
             #     header_column[0].set_wrap_mode('space')
         else:
             self.help_panel = self.create_help_panel()
-            self.view.contents.append((self.help_panel, self.view.options(width_type='weight', width_amount=3)))
-            self.view.set_focus(1)
+            self.open_panel(self.help_panel)
             self.help_panel_is_open = True
             # set header line to clip contents
             # for header_column in self.frame.header.original_widget.contents:
             #     header_column[0].set_wrap_mode('clip')
 
 
+    def create_help_panel(self):
+        bindings = sorted(self.key_bindings.key_bindings.items())
+        return urwid.AttrMap(urwid.ListBox(urwid.SimpleListWalker(
+            [urwid.Text(('header_file', " Key bindings"))] +
+            [urwid.Text(" {0:<20} {1}".format(action, ", ".join(keys))) for action, keys in bindings]
+        )), 'help')
+
+    def toggle_search_panel(self):
+        if self.skrevo.index is None:
+            self.update_header("Search is turned off")
+        elif self.search_panel is not None:
+            self.close_panel(self.search_panel)
+            self.search_panel = None
+        else:
+            self.search_panel = SearchPanel(self)
+            self.open_panel(self.search_panel)
+
+    async def search(self, query):
+        self.update_header("Searching...")
+        results = await self.asyncio_loop.run_in_executor(
+            self.executor, self.skrevo.index.search, query)
+        if self.search_panel is not None:
+            self.search_panel.show(results)
+        self.update_header("Matches: {0}".format(len(results)))
+
+    async def show_result(self, result):
+        # Moves to the paragraph of a result, if it is still in this document.
+        if not result.current or not os.path.exists(result.file):
+            self.update_header("From {0}, {1:%Y-%m-%d}".format(result.file, result.saved))
+            return
+        if result.file != self.skrevo.file_path:
+            self.documents.add(result.file)
+            await self.show_document(result.file)
+        skrevo = self.skrevo
+        snapshot = skrevo.buffer.snapshot()
+        offset = await self.asyncio_loop.run_in_executor(
+            self.executor, skrevo.find, result.text.split('\n', 1)[0], snapshot)
+        if offset < 0 or skrevo.buffer.snapshot() is not snapshot:
+            self.update_header("No longer in the document")
+            return
+        line = skrevo.buffer.line_of(offset)
+        self.focus_line(line, offset - skrevo.buffer.line_start(line))
+        self.view.focus_position = 0
+        self.update_header()
+
+    def toggle_stats_panel(self):
+        if self.open_statistics is None:
+            self.update_header("Statistics are turned off")
+        elif self.stats_panel is not None:
+            self.close_panel(self.stats_panel)
+            self.stats_panel = None
+        else:
+            self.stats_lines = urwid.SimpleListWalker([urwid.Text(" Counting...")])
+            self.stats_panel = urwid.AttrMap(urwid.ListBox(self.stats_lines), 'help')
+            self.open_panel(self.stats_panel)
+            self.start_task(self.show_stats())
+
+    async def show_stats(self):
+        # Counts the saved file; the text of earlier runs comes from the
+        # cache, so this is quick after the first time.
+        from skrevo.stats import format_report
+        if self.statistics is None:
+            self.statistics, self.archive = self.open_statistics()
+        await self.skrevo.saver.drain()
+        report = await self.asyncio_loop.run_in_executor(
+            self.executor, self.statistics.report, self.skrevo.file_path, self.archive)
+        self.stats_lines[:] = [urwid.Text(('header_file', " Statistics"))] + [
+            urwid.Text(" " + line) for line in format_report(report)]
+        self.request_frame()
+
+    def start_spell_checking(self, word_list, cache_path):
+        self.start_task(self.spell_check(word_list, cache_path))
+
+    async def spell_check(self, word_list, cache_path):
+        # Checks the lines the visible widgets ask for (see LineEdit), away
+        # from input handling: after a pause in typing, a few milliseconds
+        # at a time.
+        from skrevo.spell import load_dictionary, SpellChecker
+        dictionary = await self.asyncio_loop.run_in_executor(
+            self.executor, load_dictionary, word_list, cache_path)
+        self.spelling = SpellChecker(dictionary, self.spelling_wanted.set)
+        self.redraw_lines()
+        while True:
+            await self.spelling_wanted.wait()
+            await asyncio.sleep(SPELL_CHECK_DELAY)
+            self.spelling_wanted.clear()
+            while self.spelling.check_pending(SPELL_CHECK_BUDGET):
+                await asyncio.sleep(0)
+            self.redraw_lines()
+
+    def redraw_lines(self):
+        for widget in self.listbox.body.widgets.values():
+            widget.edit._invalidate()
+        self.request_frame()
+
+    def start_indexing(self):
+        # the file as it was opened; later versions as they are saved
+        self.index_saved(self.skrevo)
+
+    def index_saved(self, skrevo):
+        # Indexes the version of skrevo on disk in the background, so saves
+        # don't wait for the index.  One update runs per document; the saves
+        # made meanwhile are indexed after it, at once.
+        if skrevo.index is None:
+            return
+        if skrevo in self.indexing:
+            self.indexing[skrevo] = True
+            return
+        self.indexing[skrevo] = False
+        self.start_task(self.index_document(skrevo))
+
+    async def index_document(self, skrevo):
+        try:
+            while True:
+                self.indexing[skrevo] = False
+                await self.asyncio_loop.run_in_executor(
+                    self.executor, skrevo.update_index, skrevo.disk_snapshot)
+                if not self.indexing[skrevo]:
+                    break
+        finally:
+            del self.indexing[skrevo]
+
     def toggle_wrapping(self, checkbox=None, state=None):
+        # line widgets are built on demand, so only the cached ones need to go
         self.wrapping.rotate(1)
-        for widget in self.listbox.body:
-            widget.wrapping = self.wrapping[0]
-            widget.update_todo()
+        self.listbox.body.refresh()
         if self.toolbar_is_open:
             self.update_header()
 
     def toggle_border(self, checkbox=None, state=None):
         self.border.rotate(1)
-        for widget in self.listbox.body:
-            widget.border = self.border[0]
-            widget.update_todo()
+        self.listbox.body.refresh()
         if self.toolbar_is_open:
             self.update_header()
 
@@ -84,188 +397,350 @@ class UrwidUI:
         self.update_header()
 
     def save_skrevo(self, button=None):
-        self.skrevo.save()
-        self.update_header("Saved")
+        # the write happens in a background task; the saver reports the
+        # status when it is done
+        self.skrevo.request_save(overwrite=True)
+        self.update_header(self.skrevo.saver.status)
+
+    def enable_profiling(self):
+        # the instrumentation is attached in setup(), once the loop exists
+        from skrevo.profiling import Profiler
+        self.profiler = Profiler()
+        self.handlers['profile-dump'] = self.show_profile
+
+    def enable_recording(self, log_path):
+        from skrevo.replay import Recorder
+        self.recorder = Recorder(log_path)
+
+    def show_profile(self):
+        self.update_header(self.profiler.summary())
+
+    def run_after_first_paint(self, callback):
+        self.deferred.append(callback)
+
+    def start_deferred(self, loop=None, data=None):
+        # Alarms run before idle callbacks, and the first idle callback draws
+        # the screen, so registering here puts the deferred work after it.
+        def run_deferred():
+            # idle callbacks can't be removed while they are being run
+            self.asyncio_loop.call_soon(self.loop.event_loop.remove_enter_idle, handle)
+            deferred, self.deferred = self.deferred, []
+            for callback in deferred:
+                callback()
+        handle = self.loop.event_loop.enter_idle(run_deferred)
+
+    def start_task(self, coroutine):
+        task = self.asyncio_loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.task_done)
+        return task
+
+    def task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.update_header("Error: {0}".format(task.exception()))
+
+    def start_autosave(self, interval=AUTOSAVE_INTERVAL):
+        self.start_task(self.autosave(interval))
+
+    async def autosave(self, interval):
+        # One timer for all the open documents.
+        while True:
+            await asyncio.sleep(interval)
+            for skrevo in list(self.documents.open.values()):
+                if not skrevo.dirty or skrevo.conflict:
+                    # a conflict is resolved by an explicit save or reload
+                    continue
+                if skrevo.journal is None:
+                    skrevo.request_save()
+                    continue
+                # With a journal only the edits are written; the whole file
+                # is rewritten once the journal gets big.
+                skrevo.dirty = False
+                await self.asyncio_loop.run_in_executor(self.executor, skrevo.journal.flush)
+                if skrevo.journal.needs_compaction():
+                    skrevo.request_save()
 
     def reload_skrevo_from_file(self, button=None):
-        self.clear_skrevo_content()
-        self.skrevo.reload_from_file()
+        self.start_task(self.reload())
+
+    async def reload(self):
+        # Takes the file's version, dropping local edits (they can be undone).
+        async with self.file_lock:
+            if self.skrevo.mapping_stale():
+                await self.remap(self.skrevo)
+                return
+            while not await self.apply_file_changes(self.skrevo):
+                pass
         self.update_header("Reloaded")
 
-    def keystroke(self, input):
-        focus, focus_index = self.listbox.get_focus()
-
-        if self.key_bindings.is_binded_to(input, 'quit'):
-            raise urwid.ExitMainLoop()
-
-        # Movement
-        elif self.key_bindings.is_binded_to(input, 'top'):
-            self.move_selection_top()
-        elif self.key_bindings.is_binded_to(input, 'bottom'):
-            self.move_selection_bottom()
-        elif self.key_bindings.is_binded_to(input, 'swap-down'):
-            self.swap_down()
-        elif self.key_bindings.is_binded_to(input, 'swap-up'):
-            self.swap_up()
-        elif self.key_bindings.is_binded_to(input, 'change-focus'):
-            current_focus = self.frame.get_focus()
-            if current_focus == 'body':
-
-                if self.filter_panel_is_open and self.toolbar_is_open:
-
-                    if self.view.focus_position == 1:
-                        self.view.focus_position = 0
-                        self.frame.focus_position = 'header'
-                    elif self.view.focus_position == 0:
-                        self.view.focus_position = 1
-
-                elif self.toolbar_is_open:
-                    self.frame.focus_position = 'header'
-
-                elif self.filter_panel_is_open:
-                    if self.view.focus_position == 1:
-                        self.view.focus_position = 0
-                    elif self.view.focus_position == 0:
-                        self.view.focus_position = 1
-
-            elif current_focus == 'header':
-                self.frame.focus_position = 'body'
-
-        # View options
-        elif self.key_bindings.is_binded_to(input, 'toggle-help'):
+    def start_watching(self):
+        # Every open document is watched, shown or not: the ones in the
+        # background are autosaved and saved on exit too.
+        self.watching = True
+        for skrevo in self.documents.open.values():
+            self.watch(skrevo)
+
+    def watch(self, skrevo):
+        from skrevo.watcher import FileWatcher
+        if skrevo.file_path in self.watchers:
+            return
+        watcher = FileWatcher(skrevo.file_path, lambda: self.start_task(self.file_changed(skrevo)))
+        watcher.start(self.asyncio_loop)
+        self.watchers[skrevo.file_path] = watcher
+
+    def unwatch(self, path):
+        watcher = self.watchers.pop(path, None)
+        if watcher is None:
+            return
+        watcher.stop()
+        if watcher.poller is not None:
+            # waited for on shutdown
+            self.tasks.add(watcher.poller)
+            watcher.poller.add_done_callback(self.task_done)
+
+    def watch_config(self, config_path, loader):
+        # loader() -> the KeyBindings of the config file; called in the
+        # executor whenever the file changes
+        from skrevo.watcher import FileWatcher
+        self.config_watcher = FileWatcher(config_path,
+                                          lambda: self.start_task(self.config_changed(loader)))
+        self.config_watcher.start(self.asyncio_loop)
+
+    async def config_changed(self, loader):
+        try:
+            key_bindings = await self.asyncio_loop.run_in_executor(self.executor, loader)
+        except (OSError, ValueError) as error:
+            self.update_header("Key bindings not reloaded: {0}".format(str(error).split('\n')[0]))
+            return
+        if dict(key_bindings.key_bindings) != dict(self.key_bindings.key_bindings):
+            self.set_key_bindings(key_bindings)
+            self.update_header("Key bindings reloaded")
+
+    def set_key_bindings(self, key_bindings):
+        self.key_bindings = key_bindings
+        self.listbox.key_bindings = key_bindings
+        self.view.key_bindings = key_bindings
+        if self.help_panel_is_open:
             self.toggle_help_panel()
-        elif self.key_bindings.is_binded_to(input, 'toggle-toolbar'):
-            self.toggle_toolbar()
-        elif self.key_bindings.is_binded_to(input, 'toggle-filter'):
-            self.toggle_filter_panel()
-        elif self.key_bindings.is_binded_to(input, 'clear-filter'):
-            self.clear_filters()
-        elif self.key_bindings.is_binded_to(input, 'toggle-wrapping'):
-            self.toggle_wrapping()
-        elif self.key_bindings.is_binded_to(input, 'toggle-borders'):
-            self.toggle_border()
-        elif self.key_bindings.is_binded_to(input, 'toggle-sorting'):
-            self.toggle_sorting()
-
-        elif self.key_bindings.is_binded_to(input, 'search'):
-            self.start_search()
-        elif self.key_bindings.is_binded_to(input, 'search-clear'):
-            if self.searching:
-                self.clear_search_term()
-
-        # Editing
-        elif self.key_bindings.is_binded_to(input, 'toggle-complete'):
-            if focus.todo.is_complete():
-                focus.todo.incomplete()
-            else:
-                focus.todo.complete()
-            focus.update_todo()
+            self.toggle_help_panel()
+
+    async def file_changed(self, skrevo):
+        name = self.document_name(skrevo)
+        async with self.file_lock:
+            if skrevo is not self.documents.open.get(skrevo.file_path):
+                # closed in the meantime
+                return
+            # our own saves change the file too
+            await skrevo.saver.drain()
+            if not skrevo.changed_on_disk():
+                return
+            if skrevo.mapping_stale():
+                await self.remap(skrevo)
+                return
+            if skrevo.modified() or not await self.apply_file_changes(skrevo):
+                skrevo.conflict = True
+                self.update_header(name + "Changed on disk: save to keep your version, reload to take it")
+                return
+        self.update_header(name + "Updated from disk")
+
+    def document_name(self, skrevo):
+        # prefix of messages about a document that isn't shown
+        return '' if skrevo is self.skrevo else os.path.basename(skrevo.file_path) + ": "
+
+    async def remap(self, skrevo):
+        # The mapped content file was written in place: the document is
+        # mapped again before anything reads the old mapping.
+        name = self.document_name(skrevo)
+        await skrevo.saver.drain()
+        modified = skrevo.modified()
+        try:
+            copy_path = await self.asyncio_loop.run_in_executor(self.executor, skrevo.remap)
+        except OSError as error:
+            self.update_header(name + "Can't reload: {0}".format(error.strerror or error))
+            return
+        if skrevo is self.skrevo:
+            walker = self.listbox.body
+            walker.refresh()
+            self.focus_line(min(walker.focus, len(walker) - 1), 0)
+        if copy_path is not None:
+            self.update_header(name + "Rewritten on disk: reloaded, your version is in {0}".format(copy_path))
+        elif modified:
+            self.update_header(name + "Rewritten on disk: reloaded, unsaved edits were lost")
+        else:
+            self.update_header(name + "Rewritten on disk: reloaded")
+
+    async def apply_file_changes(self, skrevo):
+        # Reads and compares the file in the executor, then applies only the
+        # changed lines to the buffer and, if it is shown, to the line
+        # widgets.  Returns False if the document was edited in the meantime.
+        await skrevo.saver.drain()
+        snapshot = skrevo.buffer.snapshot()
+        stamp, changes = await self.asyncio_loop.run_in_executor(
+            self.executor, skrevo.read_changes, snapshot)
+        if skrevo.buffer.snapshot() is not snapshot:
+            return False
+        skrevo.apply_changes(changes, stamp)
+        if skrevo is self.skrevo:
+            walker = self.listbox.body
+            for change in changes:
+                walker.lines_replaced(change.line, change.old_lines, change.new_lines)
+            self.listbox.set_focus(min(walker.focus, len(walker) - 1))
             self.update_header()
+        if skrevo.journal is not None:
+            await self.asyncio_loop.run_in_executor(self.executor, skrevo.journal.rewrite)
+        return True
 
-        elif self.key_bindings.is_binded_to(input, 'archive'):
-            self.archive_done_todos()
-
-        elif self.key_bindings.is_binded_to(input, 'delete'):
-            if self.todos.todo_items:
-                i = focus.todo.raw_index
-                self.todos.delete(i)
-                del self.listbox.body[focus_index]
-                self.update_header()
-
-        elif self.key_bindings.is_binded_to(input, 'append'):
-            self.add_new_todo(position='append')
-        elif self.key_bindings.is_binded_to(input, 'insert-before'):
-            self.add_new_todo(position='insert_before')
-        elif self.key_bindings.is_binded_to(input, 'insert-after'):
-            self.add_new_todo(position='insert_after')
-
-        elif self.key_bindings.is_binded_to(input, 'priority-up'):
-            self.adjust_priority(focus, up=True)
-
-        elif self.key_bindings.is_binded_to(input, 'priority-down'):
-            self.adjust_priority(focus, up=False)
-
-        # Save current file
-        elif self.key_bindings.is_binded_to(input, 'save'):
-            self.save_todos()
-
-        # Reload original file
-        elif self.key_bindings.is_binded_to(input, 'reload'):
-            self.reload_todos_from_file()
-
-    def adjust_priority(self, focus, up=True):
-            priorities = ['', 'A', 'B', 'C', 'D', 'E', 'F']
-            if up:
-                new_priority = priorities.index(focus.todo.priority) + 1
-            else:
-                new_priority = priorities.index(focus.todo.priority) - 1
+    def undo(self):
+        self.move_cursor_to(self.skrevo.undo(), "Nothing to undo")
 
-            if new_priority < 0:
-                focus.todo.change_priority(priorities[len(priorities) - 1])
-            elif new_priority < len(priorities):
-                focus.todo.change_priority(priorities[new_priority])
-            else:
-                focus.todo.change_priority(priorities[0])
+    def redo(self):
+        self.move_cursor_to(self.skrevo.redo(), "Nothing to redo")
 
-            focus.update_todo()
+    def move_cursor_to(self, offset, message_if_none=""):
+        if offset is None:
+            self.update_header(message_if_none)
+            return
+        line = self.skrevo.buffer.line_of(offset)
+        self.listbox.body.refresh()
+        self.focus_line(line, offset - self.skrevo.buffer.line_start(line))
+        self.update_header()
 
-    def add_new_todo(self, position=False):
-        if len(self.listbox.body) == 0:
-            position = 'append'
-        else:
-            focus_index = self.listbox.get_focus()[1]
+    # Edits made in a LineWidget are mirrored into the buffer here.
 
-        if self.filtering:
-            position = 'append'
+    def line_edited(self, widget, before, after):
+        prefix = 0
+        shortest = min(len(before), len(after))
+        while prefix < shortest and before[prefix] == after[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < shortest - prefix and
+               before[len(before) - 1 - suffix] == after[len(after) - 1 - suffix]):
+            suffix += 1
+        offset = self.skrevo.buffer.line_start(widget.line) + prefix
+        self.skrevo.delete(offset, len(before) - prefix - suffix)
+        self.skrevo.insert(offset, after[prefix:len(after) - suffix])
+        self.update_header()
 
-        if position is 'append':
-            new_index = self.todos.append('', add_creation_date=False)
-            self.listbox.body.append(TodoWidget(self.todos[new_index], self.key_bindings, self.colorscheme, self, editing=True, wrapping=self.wrapping[0], border=self.border[0]))
-        else:
-            if position is 'insert_after':
-                new_index = self.todos.insert(focus_index + 1, '', add_creation_date=False)
-            elif position is 'insert_before':
-                new_index = self.todos.insert(focus_index, '', add_creation_date=False)
+    def split_line(self, widget, column):
+        self.skrevo.insert(self.skrevo.buffer.line_start(widget.line) + column, '\n')
+        self.listbox.body.refresh()
+        self.focus_line(widget.line + 1, 0)
+        self.update_header()
 
-            self.listbox.body.insert(new_index, TodoWidget(self.todos[new_index], self.key_bindings, self.colorscheme, self, editing=True, wrapping=self.wrapping[0], border=self.border[0]))
+    def join_with_previous_line(self, widget):
+        if widget.line == 0:
+            return
+        start = self.skrevo.buffer.line_start(widget.line)
+        column = start - 1 - self.skrevo.buffer.line_start(widget.line - 1)
+        self.skrevo.delete(start - 1, 1)
+        self.listbox.body.refresh()
+        self.focus_line(widget.line - 1, column)
+        self.update_header()
+
+    def join_with_next_line(self, widget):
+        if widget.line >= self.skrevo.buffer.newlines():
+            return
+        column = len(widget.edit.edit_text)
+        self.skrevo.delete(self.skrevo.buffer.line_start(widget.line) + column, 1)
+        self.listbox.body.refresh()
+        self.focus_line(widget.line, column)
+        self.update_header()
+
+    def quit(self):
+        raise urwid.ExitMainLoop()
+
+    def change_focus(self):
+        if self.frame.get_focus() == 'header':
+            self.frame.focus_position = 'body'
+        elif len(self.view.contents) > 1:
+            # cycle through the document and the open panels
+            self.view.focus_position = (self.view.focus_position + 1) % len(self.view.contents)
+        elif self.toolbar_is_open:
+            self.frame.focus_position = 'header'
 
-        if position:
-            if self.filtering:
-                self.listbox.set_focus(len(self.listbox.body) - 1)
+    def process_input(self, keys):
+        # urwid's process_input, except that a bracketed paste is collected
+        # and inserted with a single edit instead of going through the
+        # widgets key by key; it may be split over several batches.
+        if self.pasting is None and 'begin paste' not in keys:
+            return self.urwid_process_input(keys)
+        handled = False
+        passed = []
+        for key in keys:
+            if self.pasting is not None:
+                if key == 'end paste':
+                    self.paste(''.join(self.pasting))
+                    self.pasting = None
+                    handled = True
+                elif isinstance(key, str):
+                    self.pasting.append(PASTED_KEYS.get(key, key if len(key) == 1 else ''))
+            elif key == 'begin paste':
+                if passed:
+                    handled = self.urwid_process_input(passed) or handled
+                    passed = []
+                self.pasting = []
             else:
-                self.listbox.set_focus(new_index)
-            # edit_widget = self.listbox.body[new_index]._w
-            # edit_widget.edit_text += ' '
-            # edit_widget.set_edit_pos(len(self.todos[new_index].raw) + 1)
-            self.update_header()
+                passed.append(key)
+        if passed:
+            handled = self.urwid_process_input(passed) or handled
+        return handled
+
+    def paste(self, text):
+        # The text goes to the widget in focus: the document, or a one-line
+        # field (the search query, the Open prompt) where line breaks become
+        # spaces.  Other widgets don't take text.
+        if not text:
+            return
+        if self.view.focus is not self.frame or self.frame.focus_position != 'body':
+            if self.view.focus is self.search_panel:
+                field = self.search_panel.pile.focus
+            else:
+                field = self.frame.focus
+            if isinstance(field, urwid.Edit):
+                field.insert_text(' '.join(text.splitlines()))
+            return
+        walker = self.listbox.body
+        widget, line = walker.get_focus()
+        offset = self.skrevo.buffer.line_start(line) + widget.edit.edit_pos
+        self.skrevo.insert(offset, text)
+        walker.lines_replaced(line, 1, 1 + text.count('\n'))
+        end = offset + len(text)
+        line = self.skrevo.buffer.line_of(end)
+        self.focus_line(line, end - self.skrevo.buffer.line_start(line))
+        self.update_header()
 
-    def create_header(self, message=""):
-        return urwid.AttrMap(
-            urwid.Columns([
-                urwid.Text([
-                    ('header_word_count', "{0} Words ".format(self.skrevo.word_count())),
-                    ('header_char_count', " {0} Chars ".format(self.skrevo.__len__())),
-                    ('header_line_count', " {0} Lines ".format(self.skrevo.line_count())),
-                ]),
-                # urwid.Text( " skrevo ", align='center' ),
-                urwid.Text(('header_file', "{0}  {1} ".format(message, self.skrevo.file_path)), align='right')
-            ]), 'header')
+    def keystroke(self, input):
+        # Looking the key up in the reverse index of the key bindings costs
+        # the same for every key, bound or not.
+        for action in self.key_bindings.actions_for(input):
+            handler = self.handlers.get(action)
+            if handler is not None:
+                handler()
+                return True
+        return False
+
+    # The header widgets are built once; updates only change their text.
+
+    def create_header(self):
+        self.header_counts = urwid.Text('')
+        self.header_file = urwid.Text('', align='right')
+        return urwid.AttrMap(urwid.Columns([self.header_counts, self.header_file]), 'header')
 
     def create_toolbar(self):
+        self.wrap_checkbox = urwid.CheckBox([('header_file', 'w'), 'ord wrap'], state=(self.wrapping[0] == 'space'), on_state_change=self.toggle_wrapping)
         return urwid.AttrMap(urwid.Columns([
             urwid.Padding(
-                urwid.AttrMap(
-                    urwid.CheckBox([('header_file', 'w'), 'ord wrap'], state=(self.wrapping[0] == 'space'), on_state_change=self.toggle_wrapping),
-                    'header', 'plain_selected'), right=2),
+                urwid.AttrMap(self.wrap_checkbox, 'header', 'plain_selected'), right=2),
 
             urwid.Padding(
                 urwid.AttrMap(
-                    urwid.Button([('header_file', 'R'), 'eload'], on_press=self.reload_todos_from_file),
+                    urwid.Button([('header_file', 'R'), 'eload'], on_press=self.reload_skrevo_from_file),
                     'header', 'plain_selected'), right=2),
 
             urwid.Padding(
                 urwid.AttrMap(
-                    urwid.Button([('header_file', 'S'), 'ave'], on_press=self.save_todos),
+                    urwid.Button([('header_file', 'S'), 'ave'], on_press=self.save_skrevo),
                     'header', 'plain_selected'), right=2),
 
         ]), 'header')
@@ -275,24 +750,43 @@ class UrwidUI:
         return w
 
     def update_header(self, message=""):
+        self.header_counts.set_text([
+            ('header_word_count', "{0} Words ".format(self.skrevo.word_count())),
+            ('header_char_count', " {0} Chars ".format(self.skrevo.__len__())),
+            ('header_line_count', " {0} Lines ".format(self.skrevo.line_count())),
+        ])
+        tab = ''
+        if len(self.documents) > 1:
+            tab = "[{0}/{1}] ".format(self.documents.paths.index(self.skrevo.file_path) + 1, len(self.documents))
+        self.header_file.set_text(('header_file', "{0}  {1}{2} ".format(message, tab, self.skrevo.file_path)))
+        header = self.header_with_toolbar if self.toolbar_is_open else self.header
+        if self.frame.header is not header:
+            self.frame.header = header
         if self.toolbar_is_open:
-            self.frame.header = urwid.Pile([self.create_header(message), self.create_toolbar()])
-        else:
-            self.frame.header = self.create_header(message)
+            self.wrap_checkbox.set_state(self.wrapping[0] == 'space', do_callback=False)
+        self.request_frame()
+
+    def request_frame(self):
+        # for changes made outside input handling (background tasks), which
+        # urwid doesn't redraw by itself
+        if self.frames is not None:
+            self.frames.request()
 
     def update_footer(self, message=""):
         self.frame.footer = self.create_footer()
 
-    def main(self,
-             enable_word_wrap=False,
-             show_toolbar=False):
+    def setup(self,
+              enable_word_wrap=False,
+              show_toolbar=False,
+              screen=None):
+        # Builds the widgets and the main loop without running it; screen
+        # defaults to the terminal.
 
         self.header = self.create_header()
+        self.header_with_toolbar = urwid.Pile([self.header, self.create_toolbar()])
         self.footer = self.create_footer()
 
-        self.listbox = ViListBox(self.key_bindings, urwid.SimpleListWalker(
-            [TodoWidget(t, self.key_bindings, self.colorscheme, self) for t in self.todos.todo_items]
-        ))
+        self.listbox = ViListBox(self.key_bindings, SkrevoWalker(self))
 
         self.frame = urwid.Frame(urwid.AttrMap(self.listbox, 'plain'), header=self.header, footer=self.footer)
 
@@ -301,12 +795,299 @@ class UrwidUI:
                                   ('weight', 2, self.frame)
                               ])
 
-        self.loop = urwid.MainLoop(self.view, self.palette, unhandled_input=self.keystroke)
+        self.loop = urwid.MainLoop(self.view, self.palette, screen=screen, unhandled_input=self.keystroke,
+                                   event_loop=urwid.AsyncioEventLoop(loop=self.asyncio_loop))
         self.loop.screen.set_terminal_properties(colors=256)
+        self.update_header()
+        self.urwid_process_input = self.loop.process_input
+        self.loop.process_input = self.process_input
+        self.frames = FrameScheduler(self.loop, self.asyncio_loop, self.frame_budget)
+        self.frames.attach()
+
+        for skrevo in self.documents.open.values():
+            skrevo.saver.attach(self.asyncio_loop, self.executor)
+        self.attach_document(self.skrevo)
+        if self.deferred:
+            self.loop.set_alarm_in(0, self.start_deferred)
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if self.recorder is not None:
+            self.recorder.attach(self)
 
         if enable_word_wrap:
             self.toggle_wrapping()
         if show_toolbar:
             self.toggle_toolbar()
 
-        self.loop.run()
\ No newline at end of file
+    def main(self,
+             enable_word_wrap=False,
+             show_toolbar=False):
+        self.setup(enable_word_wrap, show_toolbar)
+        self.run_after_first_paint(self.enable_bracketed_paste)
+        try:
+            self.loop.run()
+        finally:
+            self.shutdown()
+            self.disable_bracketed_paste()
+
+    def enable_bracketed_paste(self):
+        self.loop.screen.write(BRACKETED_PASTE_ON)
+        self.loop.screen.flush()
+        self.bracketed_paste = True
+
+    def disable_bracketed_paste(self):
+        # the screen is stopped by now
+        if self.bracketed_paste:
+            sys.stdout.write(BRACKETED_PASTE_OFF)
+            sys.stdout.flush()
+            self.bracketed_paste = False
+
+    def shutdown(self):
+        # Stops the background tasks and lets pending saves finish; saves
+        # after this are written directly.
+        self.frames.cancel()
+        watchers = list(self.watchers.values())
+        if self.config_watcher is not None:
+            watchers.append(self.config_watcher)
+        for watcher in watchers:
+            watcher.stop()
+        for task in list(self.tasks):
+            task.cancel()
+        for skrevo in self.documents.open.values():
+            skrevo.saver.detach()
+            skrevo.on_saved = None
+        pending = set(self.tasks)
+        pending.update(watcher.poller for watcher in watchers if watcher.poller is not None)
+        if pending:
+            self.asyncio_loop.run_until_complete(asyncio.wait(pending))
+        self.executor.shutdown()
+        self.asyncio_loop.close()
+
+
+class LineWidget(urwid.WidgetWrap):
+    # One line of the document.  Typing is handled by the urwid.Edit inside;
+    # the change is then handed to the UI to be applied to the buffer.
+
+    def __init__(self, ui, line, text, wrapping='clip', border='no border'):
+        self.ui = ui
+        self.line = line
+        self.edit = LineEdit(ui, edit_text=text, wrap=wrapping, allow_tab=True, layout=ui.layout)
+        widget = urwid.LineBox(self.edit) if border == 'bordered' else self.edit
+        super(LineWidget, self).__init__(urwid.AttrMap(widget, 'plain'))
+
+    def keypress(self, size, key):
+        key_bindings = self.ui.key_bindings
+        if key_bindings.is_binded_to(key, 'edit-home'):
+            key = 'home'
+        elif key_bindings.is_binded_to(key, 'edit-end'):
+            key = 'end'
+
+        before = self.edit.edit_text
+        position = self.edit.edit_pos
+        if key == 'enter':
+            self.ui.split_line(self, position)
+            return None
+        if key == 'backspace' and position == 0:
+            self.ui.join_with_previous_line(self)
+            return None
+        if key == 'delete' and position == len(before):
+            self.ui.join_with_next_line(self)
+            return None
+
+        key = super(LineWidget, self).keypress(size, key)
+        if self.edit.edit_text != before:
+            self.ui.line_edited(self, before, self.edit.edit_text)
+        return key
+
+
+class LineEdit(urwid.Edit):
+    # Shows the misspelled words of its text once the spell checker has
+    # seen it.
+
+    def __init__(self, ui, **kwargs):
+        self.ui = ui
+        super(LineEdit, self).__init__(**kwargs)
+
+    def get_text(self):
+        text, attributes = super(LineEdit, self).get_text()
+        if self.ui.spelling is not None:
+            attributes = self.ui.spelling.marks(self.edit_text) or attributes
+        return text, attributes
+
+
+class OpenPrompt(urwid.Edit):
+    # Asks in the footer for the path of a document to open.
+
+    def __init__(self, ui):
+        self.ui = ui
+        super(OpenPrompt, self).__init__(('header_file', " Open: "))
+
+    def keypress(self, size, key):
+        if key == 'enter':
+            self.ui.open_path(self.edit_text.strip())
+            return None
+        if key == 'esc':
+            self.ui.open_path('')
+            return None
+        return super(OpenPrompt, self).keypress(size, key)
+
+
+class SearchPanel(urwid.WidgetWrap):
+    # A query line over the results of the last search.  search-end runs the
+    # query from the query line, or moves to the result in focus.
+
+    def __init__(self, ui):
+        self.ui = ui
+        self.query = urwid.Edit(('header_file', " Search: "))
+        self.results = urwid.SimpleFocusListWalker([])
+        self.pile = urwid.Pile([('pack', self.query), ('pack', urwid.Divider()), urwid.ListBox(self.results)])
+        super(SearchPanel, self).__init__(urwid.AttrMap(self.pile, 'help'))
+
+    def keypress(self, size, key):
+        if not self.ui.key_bindings.is_binded_to(key, 'search-end'):
+            return super(SearchPanel, self).keypress(size, key)
+        if self.pile.focus is self.query:
+            self.ui.start_task(self.ui.search(self.query.edit_text))
+        elif self.results and isinstance(self.results.get_focus()[0], SearchResult):
+            self.ui.start_task(self.ui.show_result(self.results.get_focus()[0].result))
+        return None
+
+    def show(self, results):
+        if not results:
+            self.results[:] = [urwid.Text(" No matches")]
+            return
+        self.results[:] = [SearchResult(result) for result in results]
+        self.results.set_focus(0)
+        self.pile.focus_position = 2
+
+
+class SearchResult(urwid.WidgetWrap):
+    # One search result: where and when it was saved, and the matching text
+    # with the terms highlighted.
+
+    def __init__(self, result):
+        from skrevo.search import MATCH_START, MATCH_END
+        self.result = result
+        markup = []
+        for part in ' '.join(result.snippet.split()).split(MATCH_START):
+            match, _, rest = part.rpartition(MATCH_END)
+            if match:
+                markup.append(('search_match', match))
+            if rest:
+                markup.append(rest)
+        where = "{0:%Y-%m-%d %H:%M}  {1}{2}".format(
+            result.saved, result.file, '' if result.current else ' (no longer in the file)')
+        text = urwid.Pile([urwid.Text(('header_file', ' ' + where)), urwid.Text([' '] + markup), urwid.Divider()])
+        super(SearchResult, self).__init__(urwid.AttrMap(text, None, 'search_selected'))
+
+    def selectable(self):
+        return True
+
+    def keypress(self, size, key):
+        return key
+
+
+class SkrevoWalker(urwid.ListWalker):
+    # List walker over the lines of the buffer.  Positions are line numbers;
+    # widgets are only created for the lines urwid asks for (the ones on
+    # screen) and the most recent ones are kept in a small LRU cache.
+
+    def __init__(self, ui, cache_size=256):
+        self.ui = ui
+        self.focus = 0
+        self.cache_size = cache_size
+        self.widgets = collections.OrderedDict()
+
+    def __len__(self):
+        return self.ui.skrevo.buffer.newlines() + 1
+
+    def widget(self, line):
+        widget = self.widgets.get(line)
+        if widget is not None:
+            self.widgets.move_to_end(line)
+            return widget
+        widget = LineWidget(self.ui, line, self.ui.skrevo.line(line),
+                            self.ui.wrapping[0], self.ui.border[0])
+        self.widgets[line] = widget
+        while len(self.widgets) > self.cache_size:
+            oldest = next(iter(self.widgets))
+            if oldest == self.focus:
+                # the focused widget holds the cursor
+                self.widgets.move_to_end(oldest)
+                oldest = next(iter(self.widgets))
+            del self.widgets[oldest]
+        return widget
+
+    def refresh(self):
+        # Lines were added or removed, or the display options changed.
+        self.widgets.clear()
+        self._modified()
+
+    def lines_replaced(self, line, old_lines, new_lines):
+        # Lines [line, line + old_lines) were replaced by new_lines lines:
+        # drop their widgets and renumber the ones below, keeping the rest.
+        end = line + old_lines
+        shift = new_lines - old_lines
+        widgets = collections.OrderedDict()
+        for position, widget in self.widgets.items():
+            if position >= end:
+                widget.line = position + shift
+                widgets[position + shift] = widget
+            elif position < line:
+                widgets[position] = widget
+        self.widgets = widgets
+        if self.focus >= end:
+            self.focus += shift
+        elif self.focus >= line:
+            self.focus = line
+        self._modified()
+
+    def get_focus(self):
+        return self.widget(self.focus), self.focus
+
+    def set_focus(self, position):
+        self.focus = position
+        self._modified()
+
+    def get_next(self, position):
+        if position + 1 >= len(self):
+            return None, None
+        return self.widget(position + 1), position + 1
+
+    def get_prev(self, position):
+        if position <= 0:
+            return None, None
+        return self.widget(position - 1), position - 1
+
+    def positions(self, reverse=False):
+        if reverse:
+            return range(len(self) - 1, -1, -1)
+        return range(len(self))
+
+
+class ViListBox(urwid.ListBox):
+
+    def __init__(self, key_bindings, *args, **kwargs):
+        self.key_bindings = key_bindings
+        super(ViListBox, self).__init__(*args, **kwargs)
+
+    def keypress(self, size, key):
+        if self.key_bindings.is_binded_to(key, 'down'):
+            key = 'down'
+        elif self.key_bindings.is_binded_to(key, 'up'):
+            key = 'up'
+        return super(ViListBox, self).keypress(size, key)
+
+
+class ViColumns(urwid.Columns):
+
+    def __init__(self, key_bindings, widget_list, **kwargs):
+        self.key_bindings = key_bindings
+        super(ViColumns, self).__init__(widget_list, **kwargs)
+
+    def keypress(self, size, key):
+        if self.key_bindings.is_binded_to(key, 'right'):
+            key = 'right'
+        elif self.key_bindings.is_binded_to(key, 'left'):
+            key = 'left'
+        return super(ViColumns, self).keypress(size, key)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# coding=utf-8
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+
+from skrevo.fileio import file_stamp
+
+# Notices when the content file is changed by another program.
+#
+# On Linux the directory of the file is watched with inotify (through ctypes,
+# the file descriptor is read by the asyncio loop); the directory and not the
+# file, because sync tools usually replace files by renaming a new one over
+# them.  Elsewhere, or if inotify can't be used, the size and mtime of the
+# file are polled.  Either way on_change is called on the loop once the
+# file has been quiet for SETTLE_DELAY; the caller decides whether the file
+# really changed.
+
+SETTLE_DELAY = 0.1
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCHED = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT = struct.Struct('iIII')
+
+
+def _inotify(directory):
+    # -> a non-blocking inotify file descriptor watching directory
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCHED) < 0:
+        error = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(error, "inotify_add_watch failed")
+    return fd
+
+
+class FileWatcher:
+
+    def __init__(self, file_path, on_change):
+        self.file_path = file_path
+        self.name = os.fsencode(os.path.basename(file_path))
+        self.on_change = on_change
+        self.loop = None
+        self.fd = None
+        self.poller = None
+        self.pending = None
+
+    def start(self, loop):
+        self.loop = loop
+        try:
+            self.fd = _inotify(os.path.dirname(self.file_path) or '.')
+            loop.add_reader(self.fd, self._read_events)
+        except (OSError, AttributeError, NotImplementedError):
+            # no inotify (not Linux, no libc, out of watches...)
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            self.poller = loop.create_task(self._poll())
+
+    def stop(self):
+        if self.pending is not None:
+            self.pending.cancel()
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        if self.poller is not None:
+            self.poller.cancel()
+
+    def _read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        position = 0
+        changed = False
+        while position + EVENT.size <= len(data):
+            _, mask, _, name_length = EVENT.unpack_from(data, position)
+            position += EVENT.size
+            name = data[position:position + name_length].rstrip(b'\0')
+            position += name_length
+            if name == self.name and mask & WATCHED:
+                changed = True
+        if changed:
+            self._settle()
+
+    def _settle(self):
+        # a write often comes as several events: wait for the last one
+        if self.pending is not None:
+            self.pending.cancel()
+        self.pending = self.loop.call_later(SETTLE_DELAY, self._changed)
+
+    def _changed(self):
+        self.pending = None
+        self.on_change()
+
+    async def _poll(self):
+        stamp = file_stamp(self.file_path)
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            current = file_stamp(self.file_path)
+            if current != stamp:
+                stamp = current
+                self._settle()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# coding=utf-8
+import pytest
+
+from skrevo.headless import FakeScreen
+from skrevo.keys import KeyBindings
+from skrevo.skrevo import Skrevo
+from skrevo.urwid_ui import UrwidUI
+
+
+@pytest.fixture
+def editor(tmp_path):
+    # editor(text) -> an UrwidUI on a FakeScreen showing a new file holding
+    # text, drawn once; editor(skrevo=...) shows a document the test opened.
+    # configure(ui) runs before setup(), for what setup() reads.  Editors the
+    # test didn't shut down are shut down after it.
+    uis = []
+
+    def start(text='', name='doc.txt', lazy=False, skrevo=None, configure=None):
+        if skrevo is None:
+            path = tmp_path / name
+            path.write_text(text)
+            skrevo = Skrevo('', str(path))
+            skrevo.load(lazy=lazy)
+        ui = UrwidUI(skrevo, KeyBindings({}))
+        if configure is not None:
+            configure(ui)
+        ui.setup(screen=FakeScreen())
+        ui.loop.draw_screen()
+        uis.append(ui)
+        return ui
+
+    yield start
+    for ui in uis:
+        if not ui.asyncio_loop.is_closed():
+            ui.shutdown()
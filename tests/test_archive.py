@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Sessions are cut from the piece stream: the chunks must be the ones cut
+# from the whole text, however the text comes in.
+import random
+
+from skrevo import archive
+from skrevo.archive import Archive, split_chunks, split_pieces
+
+
+def test_pieces_cut_like_the_whole_text(monkeypatch):
+    monkeypatch.setattr(archive, 'MIN_CHUNK', 40)
+    monkeypatch.setattr(archive, 'MAX_CHUNK', 100)
+    monkeypatch.setattr(archive, 'BOUNDARY_MASK', 1)
+    generator = random.Random(3)
+    for _ in range(3000):
+        alphabet = generator.choice([b'ab\n', b'abcdefghij \n', b'abcdefghijklmnopqrstuvwxyz' * 4 + b'\n'])
+        data = bytes(generator.choice(alphabet) for _ in range(generator.randint(0, 1500)))
+        cuts = sorted(generator.sample(range(len(data) + 1), min(len(data) + 1, generator.randint(0, 15))))
+        pieces = [data[start:end] for start, end in zip([0] + cuts, cuts + [len(data)])]
+        assert list(split_pieces(pieces)) == list(split_chunks(data))
+
+
+def test_store_from_small_pieces(tmp_path):
+    store = Archive(str(tmp_path))
+    text = ''.join('line {0} ação\n'.format(i) for i in range(20000))
+    pieces = [text[start:start + 7] for start in range(0, len(text), 7)]
+    name = store.store(pieces)
+    assert ''.join(store.restore(name)) == text
+    assert store.session_info(name)[1] == len(text.encode('utf-8'))
+    assert store.store([text]) is None
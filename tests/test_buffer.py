@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The piece table must read like the str it replaces, whatever the edits and
+# however the text is cut into pieces and blocks.
+import random
+
+import pytest
+
+from skrevo import buffer
+from skrevo.buffer import PieceTable
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(buffer, 'ADD_BLOCK_SIZE', 16)
+    monkeypatch.setattr(buffer, 'LOAD_PIECE_SIZE', 8)
+    monkeypatch.setattr(buffer, 'LINE_REGION', 4)
+
+
+def check(table, text):
+    assert str(table) == text
+    assert len(table) == len(text)
+    assert table.newlines() == text.count('\n')
+    for offset in range(len(text) + 1):
+        assert table.line_of(offset) == text.count('\n', 0, offset)
+    starts = [0] + [offset + 1 for offset, char in enumerate(text) if char == '\n']
+    for line, start in enumerate(starts):
+        assert table.line_start(line) == start
+    assert table.line_start(len(starts)) == len(text)
+    for start in range(0, len(text) + 1, 7):
+        for end in (start, start + 1, start + 10, len(text) + 1):
+            assert table.slice(start, end) == text[start:end]
+            assert ''.join(table.chunks(start, min(end, len(text)))) == text[start:end]
+
+
+def test_load_cuts_at_lines():
+    text = 'one\ntwo three\nfour\n\nfive six seven eight\nnine'
+    table = PieceTable(text)
+    check(table, text)
+    # at the last newline of each 8 characters, if there is one
+    assert [(start, length) for _, start, length in table.pieces()] == \
+        [(0, 4), (4, 8), (12, 8), (20, 8), (28, 8), (36, 5), (41, 4)]
+
+
+def test_random_edits():
+    rng = random.Random(1)
+    text = 'hello\nworld\n' * 3
+    table = PieceTable(text)
+    for _ in range(200):
+        offset = rng.randint(0, len(text))
+        if text and rng.random() < 0.4:
+            length = rng.randint(1, 6)
+            table.delete(offset, length)
+            text = text[:offset] + text[offset + length:]
+        else:
+            inserted = rng.choice(['a', 'b ', '\n', 'xy\nz', 'long inserted text\n'])
+            table.insert(offset, inserted)
+            text = text[:offset] + inserted + text[offset:]
+        check(table, text)
+
+
+def test_typing_and_backspace():
+    text = 'abc\n'
+    table = PieceTable(text)
+    for char in 'typed\nover the block size\n':
+        table.insert(len(text) - 1, char)
+        text = text[:-1] + char + text[-1]
+        check(table, text)
+    for _ in range(10):
+        table.delete(len(text) - 2, 1)
+        text = text[:-2] + text[-1]
+        check(table, text)
+    table.insert(len(text) - 1, 'again')
+    text = text[:-1] + 'again' + text[-1]
+    check(table, text)
+
+
+def test_snapshots_are_not_changed_by_edits():
+    table = PieceTable('first\nsecond\n')
+    snapshot = table.snapshot()
+    table.insert(6, 'inserted\n')
+    table.delete(0, 3)
+    assert ''.join(table.chunks(snapshot=snapshot)) == 'first\nsecond\n'
+    assert ''.join(text[start:start + length] for text, start, length in table.pieces(snapshot)) == \
+        'first\nsecond\n'
+    table.restore(snapshot)
+    check(table, 'first\nsecond\n')
+
+
+def test_line_index_of_a_source():
+    text = 'a\nbc\n\n\ndefgh\nijklmnop\nq'
+    newlines = [offset for offset, char in enumerate(text) if char == '\n']
+    lines = buffer._Lines(text)
+    for start in range(len(text)):
+        for end in range(start + 1, len(text) + 1):
+            assert lines.count(start, end) == text.count('\n', start, end)
+        after = [offset for offset in newlines if offset >= start]
+        for n, offset in enumerate(after, 1):
+            assert lines.find(start, n) == offset
+    # only the regions searched are indexed
+    assert len(buffer._Lines(text).regions) == 0
+    lines = buffer._Lines(text)
+    lines.count(0, 3)
+    assert sorted(lines.regions) == [0]
+
+
+def test_line_index_of_the_add_block():
+    lines = buffer._Lines(None)
+    added = ''
+    for text in ('ab\n', 'c', '\n\nde', 'fghij\nklm\n'):
+        lines.extend(len(added), text)
+        added += text
+    for start in range(len(added)):
+        assert lines.count(start, len(added)) == added.count('\n', start)
+    cut = added.index('d')
+    truncated = lines.truncated(cut)
+    assert truncated.count(0, cut) == added.count('\n', 0, cut)
+    truncated.extend(cut, 'x\ny\n')
+    assert truncated.find(cut, 2) == cut + 3
+    # the old pieces keep their offsets
+    assert lines.find(cut, 1) == added.index('\n', cut)
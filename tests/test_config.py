@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The compiled configuration must be the parsed one, and only be used while
+# it is for the same file content and skrevo version.
+import os
+
+import pytest
+
+import skrevo as SKR
+from skrevo import config
+from skrevo.config import load_config
+
+CONFIG = '[settings]\nwrap = off\n\n[keys]\nquit = ctrl x, f10\n'
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    # the configuration files parsed, in order
+    calls = []
+    parse_config = config.parse_config
+
+    def counted(data, config_path='<config>'):
+        calls.append(data)
+        return parse_config(data, config_path)
+    monkeypatch.setattr(config, 'parse_config', counted)
+    return calls
+
+
+def paths(tmp_path, text=CONFIG):
+    config_path = tmp_path / 'skrevorc'
+    config_path.write_text(text)
+    return str(config_path), str(tmp_path / 'cache' / 'config.cache')
+
+
+def check(loaded):
+    assert loaded.settings == {'wrap': 'off'}
+    assert loaded.key_bindings.getKeyBinding('quit') == ('ctrl x', 'f10')
+    assert loaded.key_bindings.actions_for('f10') == ('quit',)
+    assert loaded.key_bindings.getKeyBinding('reload') == ('ctrl r',)
+
+
+def test_snapshot_is_the_parsed_configuration(tmp_path, parsed):
+    config_path, cache_path = paths(tmp_path)
+    check(load_config(config_path, cache_path))
+    check(load_config(config_path, cache_path))
+    assert len(parsed) == 1
+
+
+def test_touched_file_is_not_parsed_again(tmp_path, parsed):
+    config_path, cache_path = paths(tmp_path)
+    load_config(config_path, cache_path)
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    check(load_config(config_path, cache_path))
+    check(load_config(config_path, cache_path))
+    assert len(parsed) == 1
+
+
+def test_changed_file_is_parsed_again(tmp_path, parsed):
+    config_path, cache_path = paths(tmp_path)
+    load_config(config_path, cache_path)
+    paths(tmp_path, CONFIG.replace('f10', 'f12'))
+    loaded = load_config(config_path, cache_path)
+    assert loaded.key_bindings.getKeyBinding('quit') == ('ctrl x', 'f12')
+    assert len(parsed) == 2
+
+
+def test_snapshot_of_another_version_or_file(tmp_path, parsed, monkeypatch):
+    config_path, cache_path = paths(tmp_path)
+    load_config(config_path, cache_path)
+    monkeypatch.setattr(SKR, 'version', SKR.version + '.dev')
+    check(load_config(config_path, cache_path))
+    other_path = tmp_path / 'other'
+    other_path.write_text(CONFIG)
+    check(load_config(str(other_path), cache_path))
+    assert len(parsed) == 3
+
+
+def test_damaged_snapshot_is_rebuilt(tmp_path, parsed):
+    config_path, cache_path = paths(tmp_path)
+    load_config(config_path, cache_path)
+    with open(cache_path, 'r+b') as cache_file:
+        cache_file.truncate(os.path.getsize(cache_path) - 3)
+    check(load_config(config_path, cache_path))
+    check(load_config(config_path, cache_path))
+    assert len(parsed) == 2
+
+
+def test_missing_file_has_no_settings(tmp_path):
+    loaded = load_config(str(tmp_path / 'missing'), str(tmp_path / 'config.cache'))
+    assert loaded.settings == {}
+    assert loaded.key_bindings.getKeyBinding('quit') == ('ctrl q',)
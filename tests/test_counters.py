@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Counts kept up to date edit by edit must equal counting the whole text.
+import random
+
+from skrevo.counters import Counters
+
+
+def counted(text):
+    return len(text.split()), text.count('\n')
+
+
+def test_reset_over_chunks():
+    text = 'one two\nthree  four\n\tfive'
+    for size in (1, 2, 3, 5, len(text)):
+        counters = Counters()
+        counters.reset(text[start:start + size] for start in range(0, len(text), size))
+        assert (counters.words, counters.newlines) == counted(text)
+
+
+def test_random_edits():
+    rng = random.Random(2)
+    text = 'some words\nand lines\n'
+    counters = Counters()
+    counters.reset([text])
+    for _ in range(500):
+        offset = rng.randint(0, len(text))
+        if text and rng.random() < 0.4:
+            removed = text[offset:offset + rng.randint(1, 5)]
+            if not removed:
+                continue
+            counters.deleted(text[offset - 1:offset], removed, text[offset + len(removed):][:1])
+            text = text[:offset] + text[offset + len(removed):]
+        else:
+            inserted = rng.choice(['a', ' ', 'b c', '\n', 'word ', ' x\n y'])
+            counters.inserted(text[offset - 1:offset], inserted, text[offset:offset + 1])
+            text = text[:offset] + inserted + text[offset:]
+        assert (counters.words, counters.newlines) == counted(text)
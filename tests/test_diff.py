@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Applying the line changes in the order given must turn the old text into
+# the new one, and touch only the lines that differ.
+import random
+
+from skrevo import diff
+from skrevo.diff import Change, line_changes
+
+
+def applied(old, changes):
+    text = old
+    for change in changes:
+        assert text.count('\n', 0, change.start) == change.line
+        assert text[change.start:change.end].count('\n') in (change.old_lines, change.old_lines - 1)
+        text = text[:change.start] + change.text + text[change.end:]
+    return text
+
+
+def test_same_text():
+    assert line_changes('a\nb\n', 'a\nb\n') == []
+    assert line_changes('', '') == []
+
+
+def test_one_line_changed():
+    assert line_changes('one\ntwo\nthree\n', 'one\n2\nthree\n') == \
+        [Change(1, 1, 1, 4, 8, '2\n')]
+
+
+def test_changes_come_last_first():
+    changes = line_changes('a\nb\nc\nd\ne\n', 'A\nb\nc\nd\nE\n')
+    assert [change.line for change in changes] == [4, 0]
+
+
+def test_last_line_without_newline():
+    assert applied('a\nb', line_changes('a\nb', 'a\nb\n')) == 'a\nb\n'
+    assert applied('a\nb\n', line_changes('a\nb\n', 'a\nb')) == 'a\nb'
+
+
+def test_random_edits():
+    rng = random.Random(3)
+    words = ['alpha\n', 'beta\n', 'gamma\n', 'delta', '\n']
+    for _ in range(200):
+        old = ''.join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+        new = ''.join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+        assert applied(old, line_changes(old, new)) == new
+
+
+def test_too_big_to_match_is_one_change(monkeypatch):
+    monkeypatch.setattr(diff, 'MATCH_LIMIT', 4)
+    old = 'head\n1\n2\n3\ntail\n'
+    new = 'head\n1\nx\n3\ny\ntail\n'
+    changes = line_changes(old, new)
+    assert changes == [Change(2, 2, 3, 7, 11, 'x\n3\ny\n')]
+    assert applied(old, changes) == new
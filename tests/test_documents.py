@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Closing a document saves it, unless that would write over someone else's
+# changes, and puts its journal, history and session away.
+import os
+
+from skrevo.archive import Archive
+from skrevo.documents import close_document, open_document
+from skrevo.search import SearchIndex
+from skrevo.skrevo import CONFLICT_SUFFIX
+
+
+def test_close_saves_and_archives(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello\n')
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    skrevo = open_document(str(path), journal=True, undo_memory=1024 * 1024, persist_undo=True,
+                           index=index)
+    skrevo.insert(0, 'well, ')
+    assert close_document(skrevo, persist_undo=True, archive_directory=str(tmp_path / 'archive')) is None
+    assert path.read_text() == 'well, hello\n'
+    assert not os.path.exists(str(path) + '.journal')
+    assert os.path.exists(str(path) + '.undo')
+    assert [result.text for result in index.search('well')] == ['well, hello']
+    archive = Archive(str(tmp_path / 'archive'))
+    assert [''.join(archive.restore(name)) for name in archive.sessions()] == ['well, hello\n']
+
+    skrevo = open_document(str(path), undo_memory=1024 * 1024, persist_undo=True)
+    assert skrevo.undo() == 0
+    assert skrevo.content == 'hello\n'
+
+
+def test_close_in_conflict_writes_a_copy(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello\n')
+    skrevo = open_document(str(path))
+    skrevo.insert(0, 'ours ')
+    path.write_text('theirs\n')
+    warning = close_document(skrevo)
+    assert warning == '{0} changed on disk; your version is in {0}{1}'.format(path, CONFLICT_SUFFIX)
+    assert path.read_text() == 'theirs\n'
+    assert (tmp_path / ('doc.txt' + CONFLICT_SUFFIX)).read_text() == 'ours hello\n'
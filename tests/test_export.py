@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Whatever the chunking and however the text is cut into chapters, an export
+# must hold the whole document, in order.
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from skrevo.export import chapters, chunk_lines, export
+
+XHTML = '{http://www.w3.org/1999/xhtml}'
+
+TEXT = ('Opening words before any heading.\n\n'
+        '# One\n\nFirst paragraph,\nstill the first.\n\n## Part\n\nSecond & <last>.\n\n'
+        '# Two\n\n' + 'A long paragraph line.\n' * 30 + '\n' + 'Another one.\n' * 30)
+
+
+def test_lines_of_any_chunking():
+    for size in (1, 2, 7, len(TEXT)):
+        chunks = [TEXT[start:start + size] for start in range(0, len(TEXT), size)]
+        assert list(chunk_lines(chunks)) == TEXT.splitlines(keepends=True)
+    assert list(chunk_lines(['no newline ', 'at the end'])) == ['no newline at the end']
+
+
+def test_chapters_start_at_headings_and_sources():
+    found = list(chapters([('notes', iter(TEXT.splitlines(True))), ('more', iter(['Last.\n']))]))
+    assert [(chapter.number, chapter.title) for chapter in found] == \
+        [(1, 'notes'), (2, 'One'), (3, 'Two'), (4, 'more')]
+    assert ''.join(line for chapter in found[:3] for line in chapter.lines) == TEXT
+
+
+def test_long_chapters_are_cut():
+    lines = TEXT.splitlines(True)
+    found = list(chapters([('notes', iter(lines))], limit=100))
+    assert ''.join(line for chapter in found for line in chapter.lines) == TEXT
+    assert len(found) > 3
+    longest = max(map(len, lines))
+    for previous, chapter in zip(found, found[1:]):
+        # at a heading, else at a paragraph break, or anywhere past four
+        # times the limit
+        size = sum(map(len, previous.lines))
+        assert size <= 4 * 100 + longest
+        first = chapter.lines[0]
+        assert first.startswith('# ') or (size > 100 and not first.strip()) or size > 4 * 100
+
+
+def test_markdown_round_trip():
+    output = io.StringIO()
+    assert export([('notes', iter(TEXT.splitlines(True)))], 'md', output, 'Notes', workers=2) == 3
+    markdown = output.getvalue()
+    output = io.StringIO()
+    export([('notes', iter(markdown.splitlines(True)))], 'md', output, 'Notes', workers=2)
+    assert output.getvalue() == markdown
+    assert re.sub(r'\s+', ' ', markdown).strip() == re.sub(r'\s+', ' ', TEXT).strip()
+
+
+def test_epub_round_trip(tmp_path):
+    path = str(tmp_path / 'notes.epub')
+    assert export([('notes', iter(TEXT.splitlines(True)))], 'epub', path, 'Notes & more',
+                  workers=2) == 3
+    with zipfile.ZipFile(path) as epub:
+        first = epub.infolist()[0]
+        assert (first.filename, first.compress_type) == ('mimetype', zipfile.ZIP_STORED)
+        assert epub.read('mimetype') == b'application/epub+zip'
+        package = ElementTree.fromstring(epub.read('OEBPS/content.opf'))
+        namespace = '{http://www.idpf.org/2007/opf}'
+        hrefs = {item.get('id'): item.get('href') for item in package.iter(namespace + 'item')}
+        spine = [hrefs[ref.get('idref')] for ref in package.iter(namespace + 'itemref')]
+        assert spine == ['chapter-1.xhtml', 'chapter-2.xhtml', 'chapter-3.xhtml']
+        titles = [ElementTree.fromstring(epub.read('OEBPS/' + name)).find(
+            XHTML + 'head/' + XHTML + 'title').text for name in spine]
+        assert titles == ['notes', 'One', 'Two']
+        text = ' '.join(''.join(ElementTree.fromstring(epub.read('OEBPS/' + name)).find(
+            XHTML + 'body').itertext()) for name in spine)
+        nav = ElementTree.fromstring(epub.read('OEBPS/nav.xhtml'))
+        assert [link.text for link in nav.iter(XHTML + 'a')] == titles
+    words = [word for word in TEXT.split() if not word.startswith('#')]
+    assert text.split() == words
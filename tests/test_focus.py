@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The cursor must land on the column UrwidUI.focus_line was given, and stay
+# there once the screen is drawn.
+
+
+def type_keys(ui, *batches):
+    for batch in batches:
+        ui.loop.process_input(batch)
+        ui.loop.draw_screen()
+
+
+def cursor(ui):
+    widget, line = ui.listbox.body.get_focus()
+    return line, widget.edit.edit_pos
+
+
+def test_enter_splits_at_the_cursor(editor):
+    ui = editor('hello world\n')
+    type_keys(ui, ['home', 'right', 'right'], ['enter'], ['X'])
+    assert ui.skrevo.content == 'he\nXllo world\n'
+
+
+def test_backspace_joins_at_the_end_of_the_previous_line(editor):
+    ui = editor('hello\nworld\n')
+    type_keys(ui, ['down'], ['home'], ['backspace'], ['X'])
+    assert ui.skrevo.content == 'helloXworld\n'
+
+
+def test_delete_joins_at_the_end_of_the_line(editor):
+    ui = editor('hello\nworld\n')
+    type_keys(ui, ['end'], ['delete'], ['X'])
+    assert ui.skrevo.content == 'helloXworld\n'
+
+
+def test_undo_moves_the_cursor_to_the_change(editor):
+    ui = editor('one\ntwo\nthree\n')
+    ui.skrevo.enable_history(1024 * 1024)
+    type_keys(ui, ['down', 'down', 'end'], list('!!'), ['up', 'home'], ['ctrl u'])
+    assert cursor(ui) == (2, 5)
+    type_keys(ui, ['X'])
+    assert ui.skrevo.content == 'one\ntwo\nthreeX\n'
+
+
+def test_far_focus_is_on_screen(editor):
+    ui = editor(''.join('line {0}\n'.format(i) for i in range(1000)))
+    ui.focus_line(700, 3)
+    ui.loop.draw_screen()
+    assert cursor(ui) == (700, 3)
+    assert any(row.rstrip() == b'line 700' for row in ui.loop.screen.text)
+
+
+def test_switching_documents_restores_the_cursor(editor, tmp_path):
+    ui = editor('first document\n')
+    other = tmp_path / 'other.txt'
+    other.write_text('second document\n')
+    type_keys(ui, ['home', 'right', 'right', 'right'])
+    ui.documents.add(str(other))
+    ui.asyncio_loop.run_until_complete(ui.show_document(str(other)))
+    ui.loop.draw_screen()
+    ui.asyncio_loop.run_until_complete(ui.show_document(ui.documents.paths[0]))
+    ui.loop.draw_screen()
+    type_keys(ui, ['X'])
+    assert ui.skrevo.content == 'firXst document\n'
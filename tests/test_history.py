@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Typing is undone in steps, within a memory cap, and undo steps saved on
+# exit must never be applied to other text than the one they were saved for.
+from skrevo.history import DELTA_OVERHEAD, MERGE_PAUSE, History
+from skrevo.skrevo import Skrevo
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def edited_document(text, memory_cap=1024 * 1024):
+    skrevo = Skrevo(text, 'unsaved.txt')
+    clock = Clock()
+    skrevo.history = History(memory_cap, clock)
+    return skrevo, clock
+
+
+def type_text(skrevo, offset, text):
+    for char in text:
+        skrevo.insert(offset, char)
+        offset += 1
+
+
+def test_typing_is_one_step():
+    skrevo, _ = edited_document('abc')
+    type_text(skrevo, 3, 'def')
+    skrevo.delete(5, 1)
+    skrevo.delete(4, 1)
+    type_text(skrevo, 4, 'xy')
+    assert skrevo.content == 'abcdxy'
+    assert skrevo.undo() == 4
+    assert skrevo.content == 'abcd'
+    assert skrevo.undo() == 6
+    assert skrevo.content == 'abcdef'
+    assert skrevo.undo() == 3
+    assert skrevo.content == 'abc'
+    assert skrevo.undo() is None
+    assert skrevo.redo() == 6
+    assert skrevo.content == 'abcdef'
+
+
+def test_steps_end_at_a_pause_a_newline_or_a_jump():
+    skrevo, clock = edited_document('')
+    type_text(skrevo, 0, 'one')
+    clock.now += MERGE_PAUSE
+    type_text(skrevo, 3, ' two\n')
+    type_text(skrevo, 8, 'three')
+    skrevo.insert(0, '>')
+    steps = []
+    while skrevo.undo() is not None:
+        steps.append(skrevo.content)
+    assert steps == ['one two\nthree', 'one two\n', 'one two', 'one', '']
+
+
+def test_forward_delete_is_one_step():
+    skrevo, _ = edited_document('abcdef')
+    for _ in range(3):
+        skrevo.delete(1, 1)
+    assert skrevo.content == 'aef'
+    assert skrevo.undo() == 4
+    assert skrevo.content == 'abcdef'
+
+
+def test_oldest_steps_go_over_the_cap():
+    skrevo, clock = edited_document('', memory_cap=3 * DELTA_OVERHEAD + 30)
+    for word in ('first', 'second', 'third', 'fourth', 'fifth'):
+        clock.now += MERGE_PAUSE
+        type_text(skrevo, len(skrevo.content), word)
+    assert skrevo.history.memory <= skrevo.history.memory_cap
+    while skrevo.undo() is not None:
+        pass
+    assert skrevo.content == 'firstsecond'
+
+
+def test_a_step_over_the_cap_is_kept():
+    skrevo, _ = edited_document('', memory_cap=DELTA_OVERHEAD)
+    skrevo.insert(0, 'x' * 1000)
+    assert skrevo.undo() == 0
+    assert skrevo.content == ''
+
+
+def open_document(path):
+    skrevo = Skrevo('', str(path))
+    skrevo.load()
+    skrevo.open_journal()
+    skrevo.enable_history(1024 * 1024, persist=True)
+    return skrevo
+
+
+def test_saved_history_is_not_loaded_over_a_replayed_journal(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello world\n')
+    skrevo = open_document(path)
+    skrevo.insert(6, 'big ')
+    skrevo.save()
+    skrevo.close_journal()
+    skrevo.save_history()
+
+    # a session that crashes with edits only in the journal
+    skrevo = open_document(path)
+    skrevo.insert(0, 'XXXXXXXX ')
+    skrevo.journal.flush()
+
+    skrevo = open_document(path)
+    assert skrevo.content == 'XXXXXXXX hello big world\n'
+    assert skrevo.undo() is None
+    assert skrevo.content == 'XXXXXXXX hello big world\n'
+
+
+def test_saved_history_is_loaded_for_the_same_file(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello world\n')
+    skrevo = open_document(path)
+    skrevo.insert(6, 'big ')
+    skrevo.save()
+    skrevo.close_journal()
+    skrevo.save_history()
+
+    skrevo = open_document(path)
+    assert skrevo.undo() == 6
+    assert skrevo.content == 'hello world\n'
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding=utf-8
+# After a crash the journal must bring the document back to what was typed,
+# and never apply records to another version of the content file.
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from skrevo.journal import Journal
+from skrevo.skrevo import Skrevo
+
+
+def open_document(path, persist_undo=False):
+    skrevo = Skrevo('', str(path))
+    skrevo.load()
+    replayed = skrevo.open_journal()
+    skrevo.enable_history(1024 * 1024, persist_undo)
+    return skrevo, replayed
+
+
+def crash(skrevo):
+    # what reached the disk before the process died
+    skrevo.journal.flush()
+
+
+def test_replay_after_a_crash(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello world\n')
+    skrevo, replayed = open_document(path)
+    assert replayed == 0
+    for char in 'big ':
+        skrevo.insert(6 + 'big '.index(char), char)
+    skrevo.delete(0, 1)
+    skrevo.insert(0, 'H')
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 3
+    assert skrevo.content == 'Hello big world\n'
+    assert skrevo.dirty and skrevo.modified()
+    assert path.read_text() == 'hello world\n'
+
+
+def test_backspace_over_unwritten_text_leaves_no_record(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    skrevo.insert(3, 'xyz')
+    skrevo.delete(5, 1)
+    skrevo.delete(4, 1)
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 1
+    assert skrevo.content == 'abcx\n'
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    skrevo.insert(0, 'one ')
+    skrevo.journal.flush()
+    skrevo.insert(0, 'two ')
+    crash(skrevo)
+    journal_path = str(path) + '.journal'
+    with open(journal_path, 'r+b') as journal_file:
+        journal_file.truncate(os.path.getsize(journal_path) - 2)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 1
+    assert skrevo.content == 'one abc\n'
+
+
+def test_journal_of_another_version_is_discarded(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    skrevo.insert(0, 'X')
+    crash(skrevo)
+    path.write_text('changed by someone else\n')
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 0
+    assert skrevo.content == 'changed by someone else\n'
+
+
+def test_save_keeps_only_later_records(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    skrevo.insert(0, 'saved ')
+    skrevo.save()
+    skrevo.insert(0, 'journaled ')
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 1
+    assert skrevo.content == 'journaled saved abc\n'
+
+
+def test_edits_typed_during_a_save_are_kept(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(1)
+    skrevo.saver.attach(loop, executor)
+    skrevo.insert(0, 'saved ')
+    skrevo.request_save()
+    # after the snapshot, before it is written and the journal rebased
+    skrevo.insert(0, 'typed ')
+    loop.run_until_complete(skrevo.saver.drain())
+    executor.shutdown()
+    loop.close()
+    assert path.read_text() == 'saved abc\n'
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 1
+    assert skrevo.content == 'typed saved abc\n'
+
+
+def test_clean_exit_removes_the_journal(tmp_path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    skrevo.insert(0, 'X')
+    skrevo.close_journal()
+    assert path.read_text() == 'Xabc\n'
+    assert not os.path.exists(str(path) + '.journal')
+
+
+def test_replayed_edits_with_a_saved_history(tmp_path):
+    # the saved undo steps are for the file, not for the replayed edits
+    path = tmp_path / 'doc.txt'
+    path.write_text('hello world\n')
+    skrevo, _ = open_document(path, persist_undo=True)
+    skrevo.insert(6, 'big ')
+    skrevo.close_journal()
+    skrevo.save_history()
+    skrevo, _ = open_document(path, persist_undo=True)
+    skrevo.insert(0, 'XXXXXXXX ')
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path, persist_undo=True)
+    assert replayed == 1
+    assert skrevo.undo() is None
+    skrevo.insert(0, '!')
+    assert skrevo.undo() == 0
+    assert skrevo.content == 'XXXXXXXX hello big world\n'
+    skrevo.close_journal()
+    assert path.read_text() == 'XXXXXXXX hello big world\n'
+
+
+def test_external_change_rewrites_the_journal_off_the_loop(editor, tmp_path, monkeypatch):
+    path = tmp_path / 'doc.txt'
+    path.write_text('abc\n')
+    skrevo, _ = open_document(path)
+    ui = editor(skrevo=skrevo)
+    written = []
+    write_journal = Journal._write_journal
+
+    def recorded(journal):
+        written.append(threading.current_thread() is threading.main_thread())
+        write_journal(journal)
+    monkeypatch.setattr(Journal, '_write_journal', recorded)
+    path.write_text('abc\nfrom elsewhere\n')
+    ui.asyncio_loop.run_until_complete(ui.reload())
+    ui.shutdown()
+    assert written == [False]
+    skrevo.insert(0, 'X')
+    crash(skrevo)
+
+    skrevo, replayed = open_document(path)
+    assert replayed == 1
+    assert skrevo.content == 'Xabc\nfrom elsewhere\n'
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding=utf-8
+# A lazily loaded document reads its text from the mapped file: once another
+# program writes into that file, only text we still hold may be saved as
+# "your version".
+import os
+
+from benchmarks.save_latency import SlowFileSystem
+from skrevo import mapped
+from skrevo.mapped import MappedText
+from skrevo.skrevo import CONFLICT_SUFFIX, Skrevo
+
+TEXT = ('plain ascii line\n' * 3 + 'ünïcödé wörds\n' + 'é' * 40 + '\n' +
+        'x' * 50 + ' tail without newline')
+
+
+def lazy_document(path, text):
+    path.write_text(text)
+    skrevo = Skrevo('', str(path))
+    skrevo.load(lazy=True)
+    return skrevo
+
+
+def write_in_place(path, text):
+    with open(str(path), 'r+') as content_file:
+        content_file.truncate(0)
+        content_file.write(text)
+
+
+def test_blocks_read_like_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapped, 'BLOCK_SIZE', 16)
+    path = tmp_path / 'doc.txt'
+    path.write_text(TEXT, encoding='utf-8')
+    text = MappedText(str(path))
+    blocks = [block for block, _, _ in text.pieces()]
+    assert len(blocks) > 5
+    assert ''.join(block[0:len(block)] for block in blocks) == TEXT
+    assert sum(text.newlines) == TEXT.count('\n')
+    assert text.words == len(TEXT.split())
+    for block in blocks:
+        whole = block[0:len(block)]
+        assert [block[i] for i in range(len(block))] == list(whole)
+        assert block[-1] == whole[-1]
+        assert block[2:5] == whole[2:5]
+        assert block.count('\n', 0, len(block)) == whole.count('\n')
+        assert block.count('\n', 1, 3) == whole.count('\n', 1, 3)
+
+
+def test_lazy_edits_match_a_loaded_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapped, 'BLOCK_SIZE', 16)
+    monkeypatch.setattr(mapped, 'DECODED_BLOCKS', 2)
+    path = tmp_path / 'doc.txt'
+    path.write_text(TEXT, encoding='utf-8')
+    lazy = Skrevo('', str(path))
+    lazy.load(lazy=True)
+    loaded = Skrevo('', str(path))
+    loaded.load()
+    for skrevo in (lazy, loaded):
+        skrevo.insert(60, 'inserted\n')
+        skrevo.delete(10, 30)
+    assert lazy.content == loaded.content
+    assert (lazy.word_count(), lazy.line_count()) == (loaded.word_count(), loaded.line_count())
+    lazy.save()
+    # saves end the last line
+    assert path.read_text(encoding='utf-8') == loaded.content + '\n'
+
+
+def test_rewritten_with_a_longer_text(tmp_path):
+    path = tmp_path / 'doc.txt'
+    skrevo = lazy_document(path, 'our line\n' * 1000)
+    skrevo.insert(0, 'edit ')
+    write_in_place(path, 'their longer line\n' * 1000)
+    assert skrevo.mapping_stale()
+    assert not skrevo.readable()
+    assert skrevo.remap() is None
+    assert not os.path.exists(str(path) + CONFLICT_SUFFIX)
+    assert skrevo.content == 'their longer line\n' * 1000
+
+
+def test_touched_in_place(tmp_path):
+    # the mapped text is unchanged: the edits can still be saved
+    path = tmp_path / 'doc.txt'
+    skrevo = lazy_document(path, 'our line\n' * 1000)
+    skrevo.insert(0, 'edit ')
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert skrevo.mapping_stale()
+    assert skrevo.readable()
+    copy_path = skrevo.remap()
+    with open(copy_path) as copy:
+        assert copy.read() == 'edit ' + 'our line\n' * 1000
+
+
+def test_replaced_text_is_ours(tmp_path):
+    # nothing of the document is read from the mapping any more
+    path = tmp_path / 'doc.txt'
+    skrevo = lazy_document(path, 'our line\n' * 1000)
+    skrevo.delete(0, len(skrevo))
+    skrevo.insert(0, 'all new\n')
+    write_in_place(path, 'short\n')
+    assert skrevo.readable()
+    with open(skrevo.remap()) as copy:
+        assert copy.read() == 'all new\n'
+    assert skrevo.content == 'short\n'
+
+
+def test_truncated_is_not_read(tmp_path):
+    path = tmp_path / 'doc.txt'
+    skrevo = lazy_document(path, 'our line\n' * 100000)
+    skrevo.insert(0, 'edit ')
+    write_in_place(path, 'short\n')
+    assert not skrevo.readable()
+    assert skrevo.remap() is None
+    assert skrevo.content == 'short\n'
+
+
+def test_reload_waits_for_a_save_in_progress(editor, tmp_path):
+    path = tmp_path / 'doc.txt'
+    ui = editor('our line\n' * 1000, lazy=True)
+    skrevo = ui.skrevo
+    skrevo.saver.fs = SlowFileSystem()
+    skrevo.insert(0, 'edit ')
+    skrevo.request_save()
+    write_in_place(path, 'their longer line\n' * 1000)
+    assert skrevo.mapping_stale() and skrevo.saver.task is not None
+    ui.asyncio_loop.run_until_complete(ui.reload())
+    assert skrevo.content == path.read_text()
+    assert not skrevo.modified() and skrevo.saver.task is None
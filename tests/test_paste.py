@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding=utf-8
+# A bracketed paste goes to the widget in focus, not always to the document.
+import pytest
+
+from skrevo.search import SearchIndex
+
+
+@pytest.fixture
+def ui(editor, tmp_path):
+    ui = editor('hello\n')
+    ui.skrevo.index = SearchIndex(str(tmp_path / 'search.db'))
+    return ui
+
+
+def paste(ui, text):
+    keys = ['enter' if char == '\n' else char for char in text]
+    ui.loop.process_input(['begin paste'] + keys + ['end paste'])
+    ui.loop.draw_screen()
+
+
+def test_paste_into_the_document(ui):
+    ui.focus_line(0, 0)
+    paste(ui, 'one\ntwo ')
+    assert ui.skrevo.content == 'one\ntwo hello\n'
+
+
+def test_paste_into_the_open_prompt(ui):
+    ui.prompt_open()
+    paste(ui, '/tmp/notes.txt\n')
+    assert ui.frame.footer.edit_text == '/tmp/notes.txt'
+    assert ui.skrevo.content == 'hello\n'
+
+
+def test_paste_into_the_search_query(ui):
+    ui.toggle_search_panel()
+    paste(ui, 'zebra\nstripes')
+    assert ui.search_panel.query.edit_text == 'zebra stripes'
+    assert ui.skrevo.content == 'hello\n'
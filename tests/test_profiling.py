@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The profiler must time the edits of every document shown, not only the
+# first one.
+from skrevo.profiling import Histogram, bucket_limit, percentiles
+
+
+def test_edits_are_timed_after_switching_documents(editor, tmp_path):
+    ui = editor('first document\n', name='first.txt', configure=lambda ui: ui.enable_profiling())
+    first = str(tmp_path / 'first.txt')
+    other = tmp_path / 'other.txt'
+    other.write_text('second document\n')
+    ui.documents.add(str(other))
+    for path in (str(other), first, str(other)):
+        ui.asyncio_loop.run_until_complete(ui.show_document(path))
+        ui.loop.draw_screen()
+        ui.loop.process_input(['X'])
+        assert ui.profiler.current['buffer'] > 0
+        ui.loop.draw_screen()
+    assert ui.skrevo.content.count('X') == 2
+
+
+def test_slow_samples_are_recorded():
+    histogram = Histogram()
+    for seconds in (0.001, 0.05, 0.5, 10 ** 7):
+        histogram.record(seconds)
+    (p25, p50, p75, p100), total = percentiles([histogram], (0.25, 0.5, 0.75, 1.0))
+    assert total == 4
+    assert 0.001 <= p25 < 0.0013
+    assert 0.05 <= p50 < 0.06
+    assert 0.5 <= p75 < 0.6
+    # beyond the last bucket
+    assert p100 == bucket_limit(len(histogram.counts) - 1)
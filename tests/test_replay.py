@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding=utf-8
+# A replay must end with the document the recorded session ended with,
+# undo steps included.
+import hashlib
+
+from skrevo import replay as replay_log
+from skrevo.keys import KeyBindings
+from skrevo.skrevo import Skrevo
+
+
+def write_log(log_path, content_path, events):
+    # events: (delay in seconds, keys)
+    skrevo = Skrevo('', str(content_path))
+    skrevo.load()
+    out = bytearray(replay_log.HEADER.pack(replay_log.MAGIC, 80, 24, 0, replay_log.document_hash(skrevo)))
+    for delay, keys in events:
+        replay_log._write_varint(out, int(delay * 1e6))
+        replay_log._write_varint(out, len(keys))
+        for key in keys:
+            out.append(replay_log.KEY)
+            replay_log._write_string(out, key)
+    log_path.write_bytes(bytes(out))
+
+
+def test_undo_steps_follow_the_recorded_pauses(tmp_path):
+    content = tmp_path / 'doc.txt'
+    content.write_text('\n')
+    log = tmp_path / 'session.log'
+    events = [(0.1, [key]) for key in 'hello']
+    # a long pause: ' wow' is a step of its own
+    events += [(2.0, [' '])] + [(0.1, [key]) for key in 'wow']
+    events += [(0.5, ['ctrl u']), (0.5, ['!'])]
+    write_log(log, content, events)
+
+    result = replay_log.replay(str(log), str(content), KeyBindings({}))
+
+    assert result['initial_hash_matches']
+    assert result['final_hash'] == hashlib.sha256(b'hello!\n').hexdigest()
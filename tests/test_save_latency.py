@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Keystrokes must be handled while a save is written to a slow disk, without
+# waiting for it (see benchmarks/save_latency.py for the numbers).
+import asyncio
+import time
+
+from benchmarks.save_latency import FSYNC_DELAY, SlowFileSystem
+
+# far below one fsync of the slow disk
+KEYSTROKE_BOUND = FSYNC_DELAY / 4
+
+
+def test_keystrokes_do_not_wait_for_a_save(editor, tmp_path):
+    ui = editor('some words to start with\n' * 20000)
+    skrevo = ui.skrevo
+    fs = SlowFileSystem()
+    skrevo.saver.fs = fs
+    ui.focus_line(0, 0)
+    ui.loop.draw_screen()
+    latencies = []
+    saving = None
+
+    async def type_while_saving():
+        nonlocal saving
+        before = time.perf_counter()
+        ui.loop.process_input(['x', 'ctrl s'])
+        saving = time.perf_counter() - before
+        assert skrevo.saver.task is not None
+        while skrevo.saver.task is not None:
+            before = time.perf_counter()
+            ui.loop.process_input(['y'])
+            ui.loop.draw_screen()
+            latencies.append(time.perf_counter() - before)
+            await asyncio.sleep(0.001)
+
+    ui.asyncio_loop.run_until_complete(type_while_saving())
+    assert fs.writes == 1
+    assert len(latencies) > 10
+    assert max(latencies) < KEYSTROKE_BOUND
+    assert saving < KEYSTROKE_BOUND
+    # the save wrote the document as it was when it was requested
+    assert (tmp_path / 'doc.txt').read_text().startswith('xsome')
+    assert skrevo.content.startswith('x' + 'y' * len(latencies) + 'some')
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Indexing reads the saved text chunk by chunk: the paragraphs must not
+# depend on where the chunks are cut.
+import random
+
+from skrevo import search
+from skrevo.search import SearchIndex, paragraphs
+
+
+def chunked(text, cuts):
+    cuts = sorted(cuts)
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_paragraphs_do_not_depend_on_chunks(monkeypatch):
+    monkeypatch.setattr(search, 'MAX_PARAGRAPH', 30)
+    generator = random.Random(7)
+    for _ in range(2000):
+        text = ''.join(generator.choice('ab  \n\n\tcdefgh') for _ in range(generator.randint(0, 200)))
+        whole = list(paragraphs([text]))
+        cuts = generator.sample(range(len(text) + 1), min(len(text) + 1, generator.randint(0, 10)))
+        assert list(paragraphs(chunked(text, cuts))) == whole
+        assert all(len(paragraph) <= 30 for paragraph in whole)
+
+
+def test_blank_lines_split_across_chunks():
+    assert list(paragraphs(['one\n', ' \n', '  two\n\n', '\nthree'])) == ['one', 'two', 'three']
+
+
+def test_update_reads_chunks(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    assert index.update('doc.txt', iter(['first para', 'graph\n\nsec', 'ond\n'])) == (2, 0)
+    assert index.update('doc.txt', iter(['first paragraph\n\n', 'third\n'])) == (1, 1)
+    assert [result.text for result in index.search('second')] == ['second']
+
+
+def test_update_keeps_rows_of_paragraphs_that_come_back(tmp_path):
+    path = str(tmp_path / 'search.db')
+    index = SearchIndex(path)
+    assert index.update('doc.txt', iter(['kept\n\nlost\n\nkept\n'])) == (2, 0)
+    assert index.update('doc.txt', iter(['kept\n'])) == (0, 1)
+    # read from the database this time
+    index = SearchIndex(path)
+    assert index.update('doc.txt', iter(['lost\n\nkept\n\nnew\n'])) == (1, 0)
+    assert [(result.text, result.current) for result in index.search('lost')] == [('lost', True)]
+    assert index.update('other.txt', iter(['kept\n'])) == (1, 0)
+    assert index.update('doc.txt', iter(['new\n'])) == (0, 2)
+    assert sorted((result.file, result.current) for result in index.search('kept')) == \
+        [('doc.txt', False), ('other.txt', True)]
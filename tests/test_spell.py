@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The compiled dictionary must know exactly the words of its list.
+from skrevo.spell import SpellChecker, load_dictionary
+
+WORDS = ['a', 'an', 'and', 'band', 'bands', 'can', "can't", 'cane', 'hand', 'hands',
+         'land', 'lands', 'sand', 'zebra', 'ýmir', 'öl']
+
+
+def compiled(tmp_path, words=WORDS):
+    word_list = tmp_path / 'words'
+    word_list.write_text('\n'.join(sorted(words)) + '\n', encoding='utf-8')
+    return load_dictionary(str(word_list), str(tmp_path / 'cache' / 'words.dawg'))
+
+
+def test_words_in_the_list(tmp_path):
+    dictionary = compiled(tmp_path)
+    for word in WORDS:
+        assert word in dictionary
+
+
+def test_words_not_in_the_list(tmp_path):
+    dictionary = compiled(tmp_path)
+    for word in ('', 'b', 'ban', 'bandss', 'andy', 'ands', 'canes', 'zebr', 'zebras',
+                 'Sand', 'öll', 'ø', 'handsand'):
+        assert word not in dictionary
+
+
+def test_cache_is_rebuilt_for_a_new_list(tmp_path):
+    dictionary = compiled(tmp_path)
+    assert 'zebra' in dictionary
+    dictionary.close()
+    dictionary = compiled(tmp_path, ['lion', 'zebu'])
+    assert 'zebu' in dictionary and 'zebra' not in dictionary
+
+
+def test_misspelled_words(tmp_path):
+    checker = SpellChecker(compiled(tmp_path))
+    text = 'Sand and hands, cant: can’t Zebra zebu 42'
+    assert [text[start:end] for start, end in checker.misspelled(text)] == ['cant', 'zebu']
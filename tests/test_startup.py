@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding=utf-8
+# The editor's first paint must not wait for what only the statistics, the
+# search panel or the archive need.
+import asyncio
+import os
+import subprocess
+import sys
+
+# runs the cli up to the start of the UI, then prints the modules imported
+SCRIPT = """
+import sys
+import skrevo.urwid_ui
+def main(self, *arguments):
+    print(' '.join(sorted(sys.modules)))
+    raise SystemExit(0)
+skrevo.urwid_ui.UrwidUI.main = main
+sys.argv = ['skrevo'] + sys.argv[1:]
+import skrevo.cli
+skrevo.cli.main()
+"""
+
+LATER = ('multiprocessing', 'sqlite3', 'concurrent.futures.process', 'skrevo.stats', 'skrevo.archive')
+
+
+def test_first_paint_imports(tmp_path):
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT, '--config', str(tmp_path / 'skrevorc'), '-o', str(tmp_path / 'doc.txt')],
+        stdout=subprocess.PIPE, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=dict(os.environ, HOME=str(tmp_path)))
+    modules = set(result.stdout.split())
+    assert 'urwid' in modules and 'skrevo.search' in modules
+    assert not modules & set(LATER)
+
+
+def test_statistics_are_made_when_the_panel_opens(editor, tmp_path):
+    from skrevo.stats import Statistics
+    made = []
+
+    def open_statistics():
+        made.append(Statistics(str(tmp_path / 'stats.cache'), workers=1))
+        return made[-1], None
+    ui = editor('Some words. More words here.\n')
+    ui.open_statistics = open_statistics
+    assert made == []
+    ui.toggle_stats_panel()
+    ui.asyncio_loop.run_until_complete(asyncio.gather(*ui.tasks))
+    assert len(made) == 1 and ui.statistics is made[0]
+    assert any('Words per day' in line.text for line in ui.stats_lines)
+    ui.toggle_stats_panel()
+    ui.toggle_stats_panel()
+    ui.asyncio_loop.run_until_complete(asyncio.gather(*ui.tasks))
+    assert len(made) == 1